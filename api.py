@@ -1,19 +1,124 @@
+import asyncio
+import hashlib
+import json
+import math
 import os
 import shutil
 import subprocess
 import tempfile
+import time
+import uuid
+from collections import deque
+from contextlib import asynccontextmanager
 from pathlib import Path
 import logging
 
-from fastapi import BackgroundTasks, FastAPI, UploadFile, File, Form, HTTPException, Header, Request
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi import BackgroundTasks, FastAPI, HTTPException, Header, Request
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
 
-# Import the upload function from your existing project
-# Adjust this import path if your project structure is different
-from tiktok_uploader.tiktok import upload_video as tiktok_upload_video
 from tiktok_uploader.Config import Config
+from tiktok_uploader.admission import AdmissionGate, AdmissionRejected
+from tiktok_uploader.bandwidth import PRIORITY_WEIGHTS
+from tiktok_uploader.form_ingest import FileRule, IngestedForm, IngestError, StagedFile, ingest_multipart
+from tiktok_uploader.http_transport import prewarm_in_background, shutdown_async, transport_stats
+from tiktok_uploader.job_queue import DONE, FINAL_STATES, JOB_WORKERS, QUEUED, AsyncJobWorkerPool, get_job_queue, spool_dir
+from tiktok_uploader.metrics import CONTENT_TYPE, Registry
+from tiktok_uploader.render_cache import RenderCache, cache_key
+
+# Seconds between database checks in an SSE stream; also the keep-alive interval.
+JOB_EVENTS_POLL_SECONDS = float(os.getenv("JOB_EVENTS_POLL_SECONDS", 15))
+
+
+class JobEvents:
+    """
+    Progress of the jobs this process runs, fanned out to SSE clients.
+
+    The worker pool reports from the event loop and from worker threads, so
+    events are handed to the loop thread-safely. The last events of each job
+    are kept for a while, so a client that connects late replays them first.
+    """
+
+    def __init__(self, history: int = 200, retention_seconds: float = 600) -> None:
+        self.history = history
+        self.retention_seconds = retention_seconds
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._events: dict[str, deque] = {}
+        self._subscribers: dict[str, set[asyncio.Queue]] = {}
+
+    def bind(self, loop: asyncio.AbstractEventLoop) -> None:
+        self._loop = loop
+
+    def publish(self, job_id: str, event: dict) -> None:
+        if self._loop is None:
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            self._publish(job_id, event)
+        else:
+            self._loop.call_soon_threadsafe(self._publish, job_id, event)
+
+    def _publish(self, job_id: str, event: dict) -> None:
+        self._events.setdefault(job_id, deque(maxlen=self.history)).append(event)
+        for queue in self._subscribers.get(job_id, ()):
+            queue.put_nowait(event)
+        if event["state"] in FINAL_STATES:
+            self._loop.call_later(self.retention_seconds, self._events.pop, job_id, None)
+
+    def subscribe(self, job_id: str) -> tuple[list, asyncio.Queue]:
+        queue: asyncio.Queue = asyncio.Queue()
+        self._subscribers.setdefault(job_id, set()).add(queue)
+        return list(self._events.get(job_id, ())), queue
+
+    def unsubscribe(self, job_id: str, queue: asyncio.Queue) -> None:
+        subscribers = self._subscribers.get(job_id)
+        if subscribers is not None:
+            subscribers.discard(queue)
+            if not subscribers:
+                del self._subscribers[job_id]
+
+
+job_events = JobEvents()
+# Idempotency keys of requests whose body is still arriving.
+receiving_keys: set[str] = set()
+# Fade-in renders in progress by cache key; concurrent misses for one key wait for the same render.
+fadein_renders: dict[str, asyncio.Task] = {}
+job_pool: AsyncJobWorkerPool | None = None
+
+
+def on_job_event(job, state: str, message: str | None) -> None:
+    job_events.publish(job.id, {"state": state, "message": message, "time": time.time()})
+    # An attempt ended: the job finished or went back to the queue for a retry.
+    if message is None and job.result is not None and state in FINAL_STATES + (QUEUED,):
+        observe_upload_attempt(job, state)
+    if state in FINAL_STATES and message is None:
+        stats = transport_stats()
+        logger.info(
+            "Job %s %s; HTTP transport: %d requests, %d reused connections, %d TLS handshakes",
+            job.id,
+            state,
+            stats["requests"],
+            stats["connections_reused"],
+            stats["tls_handshakes"],
+        )
+
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    global job_pool
+    # Open TLS connections to TikTok before the first upload needs them.
+    prewarm_in_background()
+    job_events.bind(asyncio.get_running_loop())
+    # Uploads run from the shared job queue on the async engine, including jobs left over from a restart.
+    job_pool = AsyncJobWorkerPool(get_job_queue(), listener=on_job_event).start()
+    yield
+    await job_pool.stop()
+    await shutdown_async()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # Basic logging so we can audit uploads; Cloudflare Worker can’t set headers to warn us otherwise.
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
@@ -41,12 +146,137 @@ ALLOWED_IMAGE_CONTENT_TYPES = {
 }
 DEFAULT_IMAGE_FADE_DURATION_SECONDS = float(os.getenv("DEFAULT_IMAGE_FADE_DURATION_SECONDS", 5.0))
 MAX_IMAGE_FADE_DURATION_SECONDS = float(os.getenv("MAX_IMAGE_FADE_DURATION_SECONDS", 60.0))
+FADEIN_FILTER = "format=yuv420p,fade=t=in:st=0:d={duration},fps=24,scale=ceil(iw/2)*2:ceil(ih/2)*2"
+# libx264 settings per encode profile; "fast" gives larger files in a fraction of the time.
+FADEIN_PROFILES = {
+    "standard": ["-preset", "medium"],
+    "fast": ["-preset", "veryfast", "-tune", "stillimage"],
+}
+# Admission limits per endpoint: requests running at once, requests waiting for a slot and how long
+# they may wait. Anything beyond is answered with 429 and Retry-After instead of slowing everyone down.
+FADEIN_MAX_CONCURRENT_RENDERS = int(os.getenv("FADEIN_MAX_CONCURRENT_RENDERS", 2))
+FADEIN_MAX_WAITING = int(os.getenv("FADEIN_MAX_WAITING", 4))
+FADEIN_QUEUE_TIMEOUT_SECONDS = float(os.getenv("FADEIN_QUEUE_TIMEOUT_SECONDS", 15))
+UPLOAD_MAX_CONCURRENT_INGESTS = int(os.getenv("UPLOAD_MAX_CONCURRENT_INGESTS", 4))
+UPLOAD_MAX_WAITING = int(os.getenv("UPLOAD_MAX_WAITING", 8))
+UPLOAD_QUEUE_TIMEOUT_SECONDS = float(os.getenv("UPLOAD_QUEUE_TIMEOUT_SECONDS", 10))
+# New uploads are refused while this many jobs wait for a worker (0: no limit).
+UPLOAD_MAX_QUEUED_JOBS = int(os.getenv("UPLOAD_MAX_QUEUED_JOBS", 100))
 UPLOAD_SECRET = os.getenv("UPLOAD_SECRET")
+# How long an Idempotency-Key or an identical upload maps to the job it started.
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", 24 * 3600))
+UPLOAD_FILES = {
+    "video_file": FileRule(MAX_VIDEO_BYTES, ALLOWED_VIDEO_CONTENT_TYPES, "video", "video.mp4"),
+    "session_file": FileRule(MAX_SESSION_BYTES, None, "session file", "session.cookie"),
+}
+IMAGE_FILES = {"image_file": FileRule(MAX_IMAGE_BYTES, ALLOWED_IMAGE_CONTENT_TYPES, "image", "image")}
 
 # Initialize Config (if needed by tiktok_upload_video, otherwise can be removed)
 # Ensure your Config class can be initialized without issues in an API context
 # For example, if it reads from a config.txt, make sure that file is accessible
 Config.get() 
+render_cache = RenderCache()
+upload_gate = AdmissionGate("upload", UPLOAD_MAX_CONCURRENT_INGESTS, UPLOAD_MAX_WAITING, UPLOAD_QUEUE_TIMEOUT_SECONDS)
+render_gate = AdmissionGate("fadein", FADEIN_MAX_CONCURRENT_RENDERS, FADEIN_MAX_WAITING, FADEIN_QUEUE_TIMEOUT_SECONDS)
+
+metrics = Registry()
+REQUESTS = metrics.counter("tiktok_api_requests_total", "HTTP requests handled, by endpoint, method and status.", ("endpoint", "method", "status"))
+REQUESTS_IN_FLIGHT = metrics.gauge("tiktok_api_requests_in_flight", "HTTP requests being handled.", ("endpoint",))
+REQUEST_SECONDS = metrics.histogram("tiktok_api_request_duration_seconds", "Time to handle an HTTP request.", ("endpoint",))
+BYTES_RECEIVED = metrics.counter("tiktok_api_received_bytes_total", "Request body bytes received.", ("endpoint",))
+UPLOAD_ATTEMPTS = metrics.counter("tiktok_upload_attempts_total", "Upload attempts by outcome (done, failed, retried).", ("outcome",))
+UPLOAD_SECONDS = metrics.histogram("tiktok_upload_duration_seconds", "Duration of an upload attempt.")
+UPLOAD_PHASE_SECONDS = metrics.histogram("tiktok_upload_phase_duration_seconds", "Duration of each upload phase.", ("phase",))
+UPLOAD_QUEUE_SECONDS = metrics.histogram("tiktok_upload_queue_wait_seconds", "Time from submitting an upload job until a worker started it.")
+UPLOAD_BYTES_SENT = metrics.counter("tiktok_upload_sent_bytes_total", "Video bytes sent to TikTok, retried parts included.")
+JOBS = metrics.gauge("tiktok_job_queue_jobs", "Jobs in the upload queue by state.", ("state",))
+TIKTOK_REQUESTS = metrics.counter("tiktok_http_requests_total", "HTTP requests sent to TikTok and its upload hosts.")
+TIKTOK_ERRORS = metrics.counter("tiktok_http_errors_total", "Responses from TikTok and its upload hosts with an HTTP error status.", ("status_code",))
+TIKTOK_API_ERRORS = metrics.counter("tiktok_api_errors_total", "TikTok replies whose JSON status_code reports an error, by upload step and status code.", ("step", "status_code"))
+FADEIN_RENDER_SECONDS = metrics.histogram("tiktok_fadein_encode_duration_seconds", "ffmpeg time per fade-in render.", ("profile",))
+FADEIN_CACHE = metrics.counter("tiktok_fadein_cache_requests_total", "Fade-in requests by render cache result.", ("result",))
+ADMISSION_ACTIVE = metrics.gauge("tiktok_api_admission_active", "Requests holding an admission slot.", ("gate",))
+ADMISSION_WAITING = metrics.gauge("tiktok_api_admission_waiting", "Requests waiting for an admission slot.", ("gate",))
+ADMISSION_REJECTED = metrics.counter("tiktok_api_admission_rejected_total", "Requests rejected with 429 by an admission gate.", ("gate",))
+_ENDPOINTS = {"/upload", "/fadein-from-image", "/queue", "/metrics"}
+
+
+def endpoint_label(path: str) -> str:
+    # Job ids are collapsed so the number of label values stays fixed.
+    if path in _ENDPOINTS:
+        return path
+    if path.startswith("/jobs/"):
+        return "/jobs/{job_id}/events" if path.endswith("/events") else "/jobs/{job_id}"
+    return "other"
+
+
+def collect_metrics() -> None:
+    for state, count in get_job_queue().stats()["states"].items():
+        JOBS.set(count, state)
+    stats = transport_stats()
+    TIKTOK_REQUESTS.set(stats["requests"])
+    for status_code, count in stats["http_errors"].items():
+        TIKTOK_ERRORS.set(count, str(status_code))
+    for step, codes in stats["api_errors"].items():
+        for status_code, count in codes.items():
+            TIKTOK_API_ERRORS.set(count, step, status_code)
+    for gate in (upload_gate, render_gate):
+        ADMISSION_ACTIVE.set(gate.active, gate.name)
+        ADMISSION_WAITING.set(gate.waiting, gate.name)
+        ADMISSION_REJECTED.set(gate.rejected, gate.name)
+
+
+metrics.on_collect(collect_metrics)
+
+
+def observe_upload_attempt(job, state: str) -> None:
+    trace = job.result or {}
+    UPLOAD_ATTEMPTS.inc(state if state in FINAL_STATES else "retried")
+    if trace.get("duration_ms") is not None:
+        UPLOAD_SECONDS.observe(trace["duration_ms"] / 1000)
+    for span in trace.get("phases", ()):
+        UPLOAD_PHASE_SECONDS.observe(span["duration_ms"] / 1000, span["name"])
+    UPLOAD_BYTES_SENT.inc(amount=trace.get("bytes_sent", 0))
+    if state in FINAL_STATES and job.started_at:
+        UPLOAD_QUEUE_SECONDS.observe(job.started_at - job.created_at)
+
+
+class MetricsMiddleware:
+    """Counts, timings and body bytes of every HTTP request (plain ASGI, nothing is buffered)."""
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        endpoint = endpoint_label(scope["path"])
+        status = 500
+
+        async def counting_receive():
+            message = await receive()
+            if message["type"] == "http.request":
+                BYTES_RECEIVED.inc(endpoint, amount=len(message.get("body", b"")))
+            return message
+
+        async def status_send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.inc(endpoint)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, counting_receive, status_send)
+        finally:
+            REQUESTS_IN_FLIGHT.dec(endpoint)
+            REQUESTS.inc(endpoint, scope["method"], str(status))
+            REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint)
+
+
+app.add_middleware(MetricsMiddleware)
 
 
 def validate_secret_token(token: str | None) -> None:
@@ -59,32 +289,61 @@ def validate_secret_token(token: str | None) -> None:
         raise HTTPException(status_code=401, detail="Unauthorized.")
 
 
-def enforce_file_size(path: Path, limit: int, name: str) -> int:
-    size = path.stat().st_size
-    if size > limit:
-        logger.warning("Rejected %s because size %d > %d.", name, size, limit)
-        raise HTTPException(status_code=413, detail=f"{name} exceeds size limit.")
-    return size
+async def receive_form(request: Request, directory: Path, rules: dict[str, FileRule]) -> IngestedForm:
+    """Stream the multipart body into ``directory``, turning a rejected body into an HTTP error."""
+    try:
+        return await ingest_multipart(request.headers, request.stream(), directory, rules)
+    except IngestError as exc:
+        client_ip = request.client.host if request.client else "unknown"
+        logger.warning("Rejected request from %s: %s", client_ip, exc.detail)
+        raise HTTPException(status_code=exc.status_code, detail=exc.detail)
+
+
+def required_file(form: IngestedForm, name: str) -> StagedFile:
+    if name not in form.files:
+        raise HTTPException(status_code=422, detail=f"{name} is required.")
+    return form.files[name]
+
+
+def form_int(form: IngestedForm, name: str, default: int) -> int:
+    value = form.fields.get(name, "").strip()
+    if not value:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise HTTPException(status_code=422, detail=f"{name} must be an integer.")
 
 
-def ensure_content_type(content_type: str | None) -> None:
-    if content_type not in ALLOWED_VIDEO_CONTENT_TYPES:
-        logger.warning("Rejected upload because of content type %s.", content_type)
-        raise HTTPException(status_code=400, detail="Unsupported video type.")
+def too_busy(detail: str, retry_after: int) -> HTTPException:
+    return HTTPException(status_code=429, detail=detail, headers={"Retry-After": str(retry_after)})
 
 
-def ensure_image_content_type(content_type: str | None) -> None:
-    if content_type not in ALLOWED_IMAGE_CONTENT_TYPES:
-        logger.warning("Rejected image because of content type %s.", content_type)
-        raise HTTPException(status_code=400, detail="Unsupported image type.")
+async def admit(gate: AdmissionGate, client_ip: str) -> float:
+    """Take a slot of ``gate`` (see AdmissionGate); returns the seconds spent waiting for it."""
+    try:
+        return await gate.acquire()
+    except AdmissionRejected as exc:
+        logger.warning("Rejected %s request from %s: %s (%d running, %d waiting).", gate.name, client_ip, exc.reason, gate.active, gate.waiting)
+        raise too_busy(f"Server busy ({exc.reason}), retry later.", exc.retry_after)
+
+
+def check_job_backlog(queue) -> None:
+    if not UPLOAD_MAX_QUEUED_JOBS:
+        return
+    depth = queue.depth()
+    if depth >= UPLOAD_MAX_QUEUED_JOBS:
+        average = queue.stats()["avg_duration_s"] or 60
+        logger.warning("Rejected upload: %d jobs queued.", depth)
+        raise too_busy("Upload queue is full, retry later.", math.ceil((depth - UPLOAD_MAX_QUEUED_JOBS + 1) * average / JOB_WORKERS))
 
 
 def cleanup_directory(path: str | Path) -> None:
     shutil.rmtree(path, ignore_errors=True)
 
 
-def generate_fadein_video_with_ffmpeg(image_path: Path, output_path: Path, duration: float) -> None:
-    fade_filter = f"format=yuv420p,fade=t=in:st=0:d={duration},fps=24,scale=ceil(iw/2)*2:ceil(ih/2)*2"
+def generate_fadein_video_with_ffmpeg(image_path: Path, output_path: Path, duration: float, profile: str = "standard") -> None:
+    fade_filter = FADEIN_FILTER.format(duration=duration)
     cmd = [
         "ffmpeg",
         "-y",
@@ -98,159 +357,367 @@ def generate_fadein_video_with_ffmpeg(image_path: Path, output_path: Path, durat
         str(duration),
         "-c:v",
         "libx264",
-        "-preset",
-        "medium",
+        *FADEIN_PROFILES[profile],
         "-an",
         "-threads",
         "2",
+        "-f",
+        "mp4",
         str(output_path),
     ]
     subprocess.run(cmd, check=True, capture_output=True, text=True)
 
+def job_accepted(job, replayed: bool = False, queue_wait: float | None = None) -> JSONResponse:
+    """202 with the job handle, or 200 with the trace when a repeated request finds the job done."""
+    headers = {"Location": f"/jobs/{job.id}"}
+    if queue_wait is not None:
+        headers["X-Queue-Wait-Ms"] = str(round(queue_wait * 1000))
+    if replayed:
+        headers["Idempotent-Replayed"] = "true"
+    if job.state == DONE:
+        return JSONResponse(
+            status_code=200,
+            headers=headers,
+            content={"message": "Video already uploaded.", "job_id": job.id, "state": job.state, "trace": job.result},
+        )
+    return JSONResponse(
+        status_code=202,
+        headers=headers,
+        content={
+            "message": "Video already queued for upload." if replayed else "Video queued for upload.",
+            "job_id": job.id,
+            "state": job.state,
+            "status_url": f"/jobs/{job.id}",
+            "events_url": f"/jobs/{job.id}/events",
+        },
+    )
+
+
+def content_key(form: IngestedForm) -> str:
+    """Same video, session and form fields -> same key, however the request was retried."""
+    digest = hashlib.sha256()
+    for name in sorted(form.files):
+        digest.update(f"{name}={form.files[name].sha256}\n".encode())
+    digest.update(json.dumps(form.fields, sort_keys=True).encode())
+    return f"sha256:{digest.hexdigest()}"
+
+
 @app.post("/upload")
 async def upload_tiktok_video(
     request: Request,
-    video_file: UploadFile = File(...),
-    session_file: UploadFile = File(...),
-    caption: str = Form(...),
-    schedule_time: int = Form(0),
-    allow_comment: int = Form(1),
-    allow_duet: int = Form(0),
-    allow_stitch: int = Form(0),
-    visibility_type: int = Form(0),
-    brand_organic_type: int = Form(0),
-    branded_content_type: int = Form(0),
-    ai_label: int = Form(0),
-    proxy: str = Form(None),
-    datacenter: str = Form(None),
     auth_token: str = Header(None, alias="X-Upload-Auth"),
+    idempotency_key: str = Header(None, alias="Idempotency-Key"),
 ):
+    # The form is read by hand (see receive_form) so the secret is checked before any of the body is.
     client_ip = request.client.host if request.client else "unknown"
     validate_secret_token(auth_token)
-    ensure_content_type(video_file.content_type)
 
-    temp_dir = None
-    video_path = None
-    session_path = None
+    queue = get_job_queue()
+    request_key = None
+    if idempotency_key:
+        if len(idempotency_key) > 255:
+            raise HTTPException(status_code=400, detail="Idempotency-Key is too long.")
+        request_key = f"key:{idempotency_key}"
+        # A retry of a request we already have is answered without reading its body again.
+        existing = await asyncio.to_thread(queue.find_by_key, request_key, IDEMPOTENCY_TTL_SECONDS)
+        if existing is not None:
+            logger.info("Idempotency-Key of %s matches job %s (%s)", client_ip, existing.id, existing.state)
+            return job_accepted(existing, replayed=True)
+        if request_key in receiving_keys:
+            raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still being received.")
+        # Claimed before the next await, so a concurrent request with the same key gets the 409.
+        receiving_keys.add(request_key)
+
+    job_id = uuid.uuid4().hex
+    job_dir = None
+    submitted = False
+    admitted_at = None
 
     try:
-        # Create a temporary directory for this upload
-        temp_dir = tempfile.mkdtemp()
-        
-        # Save the uploaded video file
-        video_path = Path(temp_dir) / video_file.filename
-        with open(video_path, "wb") as buffer:
-            shutil.copyfileobj(video_file.file, buffer)
-
-        video_size = enforce_file_size(video_path, MAX_VIDEO_BYTES, "video")
-
-        # Save the uploaded session file
-        session_path = Path(temp_dir) / session_file.filename
-        with open(session_path, "wb") as buffer:
-            shutil.copyfileobj(session_file.file, buffer)
-
-        enforce_file_size(session_path, MAX_SESSION_BYTES, "session file")
+        # Backpressure before the body is read: a full job queue or too many bodies arriving at once.
+        await asyncio.to_thread(check_job_backlog, queue)
+        queue_wait = await admit(upload_gate, client_ip)
+        admitted_at = time.monotonic()
+
+        # Files live in the job's spool directory until the queue is done with them.
+        job_dir = await asyncio.to_thread(spool_dir, job_id)
+        form = await receive_form(request, job_dir, UPLOAD_FILES)
+        video_file = required_file(form, "video_file")
+        session_file = required_file(form, "session_file")
+        caption = form.fields.get("caption")
+        if caption is None:
+            raise HTTPException(status_code=422, detail="caption is required.")
+        priority = form.fields.get("priority") or None
+        if priority and priority not in PRIORITY_WEIGHTS:
+            raise HTTPException(status_code=400, detail=f"priority must be one of {', '.join(PRIORITY_WEIGHTS)}.")
 
         logger.info(
             "Upload request from %s: %s (%d bytes)",
             client_ip,
             video_file.filename,
-            video_size,
+            video_file.size,
         )
 
-        # Call the existing upload function
-        # The upload_video function needs to be adapted to accept the session_path directly
-        # instead of a session_user string. This will be the next step.
-        success = tiktok_upload_video(
-            session_file_path=str(session_path), # Pass the path to the session file
-            video=str(video_path),
-            title=caption,
-            schedule_time=schedule_time,
-            allow_comment=allow_comment,
-            allow_duet=allow_duet,
-            allow_stitch=allow_stitch,
-            visibility_type=visibility_type,
-            brand_organic_type=brand_organic_type,
-            branded_content_type=branded_content_type,
-            ai_label=ai_label,
-            proxy=proxy,
-            datacenter=datacenter
+        keys = [content_key(form)] + ([request_key] if request_key else [])
+        # One transaction: identical requests can't both get through.
+        job, submitted = await asyncio.to_thread(
+            queue.submit_unless_known,
+            {
+                "session_file": str(session_file.path),
+                "video": str(video_file.path),
+                "title": caption,
+                "schedule_time": form_int(form, "schedule_time", 0),
+                "allow_comment": form_int(form, "allow_comment", 1),
+                "allow_duet": form_int(form, "allow_duet", 0),
+                "allow_stitch": form_int(form, "allow_stitch", 0),
+                "visibility_type": form_int(form, "visibility_type", 0),
+                "brand_organic_type": form_int(form, "brand_organic_type", 0),
+                "branded_content_type": form_int(form, "branded_content_type", 0),
+                "ai_label": form_int(form, "ai_label", 0),
+                "proxy": form.fields.get("proxy") or None,
+                "datacenter": form.fields.get("datacenter") or None,
+                "priority": priority,
+                "cleanup_dir": str(job_dir),
+            },
+            source="api",
+            keys=keys,
+            max_age=IDEMPOTENCY_TTL_SECONDS,
+            priority=priority,
+            job_id=job_id,
         )
+        if not submitted:
+            logger.info("Upload from %s has the same content as job %s (%s)", client_ip, job.id, job.state)
+            return job_accepted(job, replayed=True, queue_wait=queue_wait)
+        job_pool.notify()
+        logger.info("Queued upload job %s for %s from %s", job_id, video_file.filename, client_ip)
+        # The upload runs in the background; clients follow it through the status URL or the event stream.
+        return job_accepted(job, queue_wait=queue_wait)
 
-        if success:
-            logger.info("Upload completed for %s from %s", video_file.filename, client_ip)
-            return JSONResponse(status_code=200, content={"message": "Video uploaded successfully!"})
-        else:
-            raise HTTPException(status_code=500, detail="Failed to upload video to TikTok.")
-
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error during upload: {e}")
         raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
     finally:
-        # Clean up the temporary directory
-        if temp_dir and os.path.exists(temp_dir):
-            shutil.rmtree(temp_dir)
+        # Once queued, the worker removes the spool directory when the job ends.
+        if not submitted and job_dir is not None:
+            cleanup_directory(job_dir)
+        receiving_keys.discard(request_key)
+        if admitted_at is not None:
+            upload_gate.release(time.monotonic() - admitted_at)
+
+
+async def _load_job(job_id: str):
+    job = await asyncio.to_thread(get_job_queue().get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job.")
+    return job
+
+
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str, auth_token: str = Header(None, alias="X-Upload-Auth")):
+    validate_secret_token(auth_token)
+    job = await _load_job(job_id)
+    # `result` holds the upload trace once the job has ended.
+    return job.to_dict()
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.get("/jobs/{job_id}/events")
+async def job_event_stream(job_id: str, request: Request, auth_token: str = Header(None, alias="X-Upload-Auth")):
+    validate_secret_token(auth_token)
+    await _load_job(job_id)
+
+    async def stream():
+        history, queue = job_events.subscribe(job_id)
+        try:
+            # Loaded after subscribing, so no event falls between the two.
+            current = await asyncio.to_thread(get_job_queue().get, job_id)
+            for event in history:
+                yield _sse("progress", event)
+            if not history and not current.finished:
+                yield _sse("progress", {"state": current.state, "message": current.message, "time": current.updated_at})
+            while not current.finished:
+                try:
+                    event = await asyncio.wait_for(queue.get(), JOB_EVENTS_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        return
+                    # Jobs run by another process (cli.py worker) only show up in the database.
+                    latest = await asyncio.to_thread(get_job_queue().get, job_id)
+                    if latest is None:
+                        return
+                    if (latest.state, latest.message) != (current.state, current.message):
+                        yield _sse("progress", {"state": latest.state, "message": latest.message, "time": latest.updated_at})
+                    else:
+                        yield ": keep-alive\n\n"
+                    current = latest
+                    continue
+                yield _sse("progress", event)
+                if event["state"] in FINAL_STATES:
+                    current = await asyncio.to_thread(get_job_queue().get, job_id)
+            yield _sse("end", current.to_dict())
+        finally:
+            job_events.unsubscribe(job_id, queue)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/queue")
+async def queue_status(auth_token: str = Header(None, alias="X-Upload-Auth")):
+    validate_secret_token(auth_token)
+    queue = get_job_queue()
+    stats, jobs = await asyncio.gather(asyncio.to_thread(queue.stats), asyncio.to_thread(queue.list_jobs, limit=20))
+    return {
+        "stats": stats,
+        "jobs": [job.to_dict(include_result=False) for job in jobs],
+    }
+
+
+async def render_fadein(key: str, image_path: Path, duration: float, profile: str, temp_dir: str | None) -> Path:
+    """Render into the cache (or ``temp_dir`` when it is off); the caller holds a ``render_gate`` slot."""
+    output = render_cache.staging_path(key) if render_cache.enabled else Path(temp_dir) / "fadein.mp4"
+    try:
+        # ffmpeg runs in a thread so uploads and other requests keep being served meanwhile.
+        started = time.monotonic()
+        await asyncio.to_thread(generate_fadein_video_with_ffmpeg, image_path, output, duration, profile)
+        FADEIN_RENDER_SECONDS.observe(time.monotonic() - started, profile)
+    except BaseException:
+        output.unlink(missing_ok=True)
+        raise
+    return render_cache.commit(key, output) if render_cache.enabled else output
+
+
+async def admitted_render(key: str, image_path: Path, duration: float, profile: str, temp_dir: str | None, client_ip: str) -> tuple[Path, float]:
+    """``render_fadein`` once a ``render_gate`` slot is free; returns the video and the seconds spent waiting."""
+    queue_wait = await admit(render_gate, client_ip)
+    started = time.monotonic()
+    try:
+        return await render_fadein(key, image_path, duration, profile, temp_dir), queue_wait
+    finally:
+        render_gate.release(time.monotonic() - started)
+
+
+async def shared_render(key: str, staged_image: Path, duration: float, profile: str, client_ip: str) -> tuple[Path, float]:
+    """``admitted_render`` into the cache from an input staged with ``stage_input``, which it removes when done."""
+    try:
+        return await admitted_render(key, staged_image, duration, profile, None, client_ip)
+    finally:
+        staged_image.unlink(missing_ok=True)
+
+
+@app.get("/metrics")
+async def prometheus_metrics(
+    auth_token: str = Header(None, alias="X-Upload-Auth"),
+    authorization: str = Header(None),
+):
+    # Prometheus can send the secret as a bearer token (`authorization` in the scrape config).
+    if not auth_token and authorization and authorization.lower().startswith("bearer "):
+        auth_token = authorization[7:].strip()
+    validate_secret_token(auth_token)
+    body = await asyncio.to_thread(metrics.expose)
+    return Response(content=body, media_type=CONTENT_TYPE)
 
 
 @app.post("/fadein-from-image")
 async def create_fadein_video_from_image(
     request: Request,
     background_tasks: BackgroundTasks,
-    image_file: UploadFile = File(...),
-    duration: float = Form(DEFAULT_IMAGE_FADE_DURATION_SECONDS),
     auth_token: str = Header(None, alias="X-Upload-Auth"),
 ):
     client_ip = request.client.host if request.client else "unknown"
     validate_secret_token(auth_token)
-    ensure_image_content_type(image_file.content_type)
-
-    if duration <= 0 or duration > MAX_IMAGE_FADE_DURATION_SECONDS:
-        raise HTTPException(
-            status_code=400,
-            detail=f"Duration must be between 0 and {MAX_IMAGE_FADE_DURATION_SECONDS} seconds.",
-        )
 
     temp_dir = tempfile.mkdtemp()
+    image_name = None
+    # Set once the response owns temp_dir; until then (errors, a client going away) it is removed here.
+    handed_off = False
     try:
-        uploaded_basename = Path(image_file.filename or "image").name or "image"
-        image_path = Path(temp_dir) / uploaded_basename
-        with open(image_path, "wb") as buffer:
-            shutil.copyfileobj(image_file.file, buffer)
-
-        enforce_file_size(image_path, MAX_IMAGE_BYTES, "image")
-
-        video_path = Path(temp_dir) / f"{Path(uploaded_basename).stem or 'image'}_fadein.mp4"
-        generate_fadein_video_with_ffmpeg(image_path, video_path, duration)
-
+        form = await receive_form(request, Path(temp_dir), IMAGE_FILES)
+        image_file = required_file(form, "image_file")
+        image_name = image_file.filename
+        try:
+            duration = float(form.fields.get("duration") or DEFAULT_IMAGE_FADE_DURATION_SECONDS)
+        except ValueError:
+            raise HTTPException(status_code=422, detail="duration must be a number.")
+        if duration <= 0 or duration > MAX_IMAGE_FADE_DURATION_SECONDS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Duration must be between 0 and {MAX_IMAGE_FADE_DURATION_SECONDS} seconds.",
+            )
+        profile = form.fields.get("profile") or "standard"
+        if profile not in FADEIN_PROFILES:
+            raise HTTPException(status_code=422, detail=f"profile must be one of {', '.join(FADEIN_PROFILES)}.")
+
+        # Same image, duration and encoder settings -> same video.
+        key = cache_key(image_file.sha256, duration, FADEIN_FILTER, FADEIN_PROFILES[profile])
+        video_path = render_cache.get(key)
+        cache_status = "hit"
+        queue_wait = 0.0
+        if video_path is None and not render_cache.enabled:
+            cache_status = "miss"
+            video_path, queue_wait = await admitted_render(key, image_file.path, duration, profile, temp_dir, client_ip)
+        elif video_path is None:
+            # Only renders need a slot; cached videos are served right away, and a request for a
+            # video that is being rendered waits for that render instead of starting another one.
+            render = fadein_renders.get(key)
+            if render is None:
+                # Other requests may wait for this render after this one is gone: it reads its own copy of the image.
+                staged_image = await asyncio.to_thread(render_cache.stage_input, key, image_file.path)
+                render = fadein_renders.get(key)
+                if render is not None:
+                    staged_image.unlink(missing_ok=True)
+            if render is None:
+                cache_status = "miss"
+                render = asyncio.ensure_future(shared_render(key, staged_image, duration, profile, client_ip))
+                fadein_renders[key] = render
+                render.add_done_callback(lambda _: fadein_renders.pop(key, None))
+            else:
+                cache_status = "shared"
+            # Shielded: one client going away must not cancel the render others are waiting for.
+            video_path, queue_wait = await asyncio.shield(render)
+
+        FADEIN_CACHE.inc(cache_status)
         background_tasks.add_task(cleanup_directory, temp_dir)
+        handed_off = True
         logger.info(
-            "Generated fade-in video for %s from %s (%.2f seconds) at %s",
+            "Fade-in video for %s from %s (%.2f seconds, %s, cache %s) at %s",
             client_ip,
-            image_file.filename,
+            image_name,
             duration,
+            profile,
+            cache_status,
             video_path,
         )
         return FileResponse(
             str(video_path),
             media_type="video/mp4",
-            filename=video_path.name,
+            filename=f"{Path(image_name).stem or 'image'}_fadein.mp4",
+            headers={"X-Render-Cache": cache_status, "X-Queue-Wait-Ms": str(round(queue_wait * 1000))},
         )
 
     except HTTPException:
-        cleanup_directory(temp_dir)
         raise
     except subprocess.CalledProcessError as exc:
-        cleanup_directory(temp_dir)
         logger.exception(
             "FFmpeg failed to create fade-in video from %s: %s",
-            image_file.filename,
+            image_name,
             exc.stderr or exc,
         )
         raise HTTPException(status_code=500, detail="Failed to render fade-in video.")
     except Exception as exc:
-        cleanup_directory(temp_dir)
-        logger.exception("Failed to create fade-in video from %s: %s", image_file.filename, exc)
+        logger.exception("Failed to create fade-in video from %s: %s", image_name, exc)
         raise HTTPException(status_code=500, detail=f"Failed to create fade-in video: {exc}")
+    finally:
+        if not handed_off:
+            cleanup_directory(temp_dir)
 
 if __name__ == "__main__":
     import uvicorn
@@ -1,8 +1,11 @@
 import argparse
-from tiktok_uploader import tiktok, Video
+from tiktok_uploader import tiktok
 from tiktok_uploader.basics import eprint
+from tiktok_uploader.batch import BATCH_WORKERS, BatchItem, ManifestError, check_item, load_manifest, run_batch, summarize
+from tiktok_uploader.job_queue import JOB_WORKERS, JobWorkerPool, get_job_queue
 from tiktok_uploader.Config import Config
-import sys, os
+from tiktok_uploader.http_transport import prewarm_in_background
+import sys, os, json, time
 
 if __name__ == "__main__":
     _ = Config.load("./config.txt")
@@ -31,6 +34,22 @@ if __name__ == "__main__":
     upload_parser.add_argument("-p", "--proxy", default="")
     upload_parser.add_argument("-dc", "--datacenter", default="", help="Override TikTok datacenter (e.g., useast5)")
 
+    # Batch upload subcommand.
+    batch_parser = subparsers.add_parser("upload-batch", help="Upload every video of a CSV/JSONL manifest in one process")
+    batch_parser.add_argument("manifest", help="CSV with a header row or JSON lines: video, caption, account, schedule, privacy, comment, duet, stitch, ...")
+    batch_parser.add_argument("-u", "--users", help="Cookie name for rows without an account column")
+    batch_parser.add_argument("-w", "--workers", type=int, default=BATCH_WORKERS, help=f"Uploads running at the same time (default: {BATCH_WORKERS})")
+    batch_parser.add_argument("-r", "--results", help="Write one JSON line per upload to this file")
+    batch_parser.add_argument("-q", "--quiet", action="store_true", help="Only print results, not upload progress")
+    batch_parser.add_argument("--dry-run", action="store_true", help="Check the manifest and exit")
+
+    # Queue worker and status.
+    worker_parser = subparsers.add_parser("worker", help="Run queued uploads (from CLI, GUI or API) until stopped with Ctrl-C")
+    worker_parser.add_argument("-w", "--workers", type=int, default=JOB_WORKERS, help=f"Uploads running at the same time (default: {JOB_WORKERS})")
+    queue_parser = subparsers.add_parser("queue", help="Show queue depth, throughput and recent jobs")
+    queue_parser.add_argument("-n", "--limit", type=int, default=10, help="Recent jobs to list")
+    queue_parser.add_argument("--prune-days", type=float, help="Delete finished jobs older than this many days")
+
     # Show cookies
     show_parser = subparsers.add_parser("show", help="Show users and videos available for system.")
     show_parser.add_argument("-u", "--users", action='store_true', help="Shows all available cookie names")
@@ -48,6 +67,8 @@ if __name__ == "__main__":
         tiktok.login(login_name)
 
     elif args.subcommand == "upload":
+        # Warm up TikTok connections while the source video is checked and prepared.
+        prewarm_in_background()
         # Obtain session id from the cookie name.
         if not hasattr(args, 'users') or args.users is None:
             parser.error("The 'cookie' argument is required for the 'upload' subcommand.")
@@ -60,12 +81,7 @@ if __name__ == "__main__":
             eprint("Both -v and -yt flags cannot be used together.")
             sys.exit(1)
 
-        if args.youtube:
-            video_obj = Video(args.youtube, args.title)
-            video_obj.is_valid_file_format()
-            video = video_obj.source_ref
-            args.video = video
-        else:
+        if args.video and not args.youtube:
             if not os.path.exists(os.path.join(os.getcwd(), Config.get().videos_dir, args.video)) and args.video:
                 print("[-] Video does not exist")
                 print("Video Names Available: ")
@@ -74,26 +90,115 @@ if __name__ == "__main__":
                     print(f'[-] {name}')
                 sys.exit(1)
 
+        # The upload goes through the job queue, so an interrupted run is finished by the next worker.
+        item = BatchItem(
+            line=0,
+            video=args.youtube or args.video,
+            title=args.title,
+            account=args.users,
+            schedule=args.schedule,
+            visibility=args.visibility,
+            comment=args.comment,
+            duet=args.duet,
+            stitch=args.stitch,
+            brand_organic=args.brandorganic,
+            branded_content=args.brandcontent,
+            ai_label=args.ailabel,
+            proxy=args.proxy or None,
+            datacenter=args.datacenter or None,
+        )
         try:
-            tiktok.upload_video(
-                args.users,
-                args.video,
-                args.title,
-                args.schedule,
-                args.comment,
-                args.duet,
-                args.stitch,
-                args.visibility,
-                args.brandorganic,
-                args.brandcontent,
-                args.ailabel,
-                args.proxy or None,
-                args.datacenter or None,
-            )
-        except RuntimeError as exc:
-            eprint(str(exc))
+            result = run_batch([item], workers=1, status_callback=lambda _item, message: print(message))[0]
+        except KeyboardInterrupt:
+            eprint("[-] Interrupted: the upload stays queued; run 'python cli.py worker' to finish it")
+            sys.exit(130)
+        if not result.ok:
+            eprint(result.error or "[-] Upload failed")
             sys.exit(1)
 
+    elif args.subcommand == "upload-batch":
+        try:
+            items = load_manifest(args.manifest, default_account=args.users)
+        except ManifestError as exc:
+            eprint(f"[-] {exc}")
+            sys.exit(2)
+        if args.dry_run:
+            problems = 0
+            for item in items:
+                error = check_item(item)
+                problems += bool(error)
+                print(f"[line {item.line}] {item.video} -> {item.account}: {error or 'OK'}")
+            print(f"{len(items) - problems}/{len(items)} uploads OK")
+            sys.exit(1 if problems else 0)
+
+        prewarm_in_background()
+        results_file = open(args.results, "a", encoding="utf-8") if args.results else None
+
+        def _progress(item, message):
+            if not args.quiet:
+                print(f"[line {item.line}] {message}")
+
+        def _done(result):
+            status = "[+] done" if result.ok else f"[-] failed: {result.error}"
+            print(f"[line {result.line}] {result.video} ({result.account}) {status} in {result.duration_s:.1f}s")
+            if results_file:
+                results_file.write(json.dumps(result.to_dict()) + "\n")
+                results_file.flush()
+
+        started = time.monotonic()
+        try:
+            results = run_batch(items, workers=args.workers, status_callback=_progress, result_callback=_done)
+        except KeyboardInterrupt:
+            eprint("[-] Interrupted: unfinished uploads stay queued; run 'python cli.py worker' to finish them")
+            sys.exit(130)
+        finally:
+            if results_file:
+                results_file.close()
+
+        summary = summarize(results, time.monotonic() - started)
+        print(f"{summary['succeeded']}/{summary['total']} uploads succeeded in {summary['elapsed_s']:.1f}s")
+        for result in results:
+            if not result.ok:
+                print(f"[-] line {result.line}: {result.video}: {result.error}")
+        sys.exit(0 if summary["failed"] == 0 else 1)
+
+    elif args.subcommand == "worker":
+        prewarm_in_background()
+        queue = get_job_queue()
+
+        def _job_event(job, state, message):
+            print(f"[job {job.id[:8]}] {message or state}")
+
+        pool = JobWorkerPool(queue, workers=args.workers, listener=_job_event).start()
+        print(f"Worker running ({args.workers} at a time) on {queue.path}; Ctrl-C to stop.")
+        try:
+            while True:
+                time.sleep(60)
+        except KeyboardInterrupt:
+            print("Stopping: waiting for running uploads to finish (Ctrl-C again to abort)...")
+            pool.stop(wait=True)
+
+    elif args.subcommand == "queue":
+        queue = get_job_queue()
+        if args.prune_days is not None:
+            print(f"Pruned {queue.prune(args.prune_days * 86400)} finished jobs.")
+        stats = queue.stats()
+        states = stats["states"]
+        print(
+            f"Queued: {stats['depth']}  running: {stats['running']} (preparing {states['preparing']}, "
+            f"transferring {states['transferring']}, publishing {states['publishing']})  "
+            f"done: {states['done']}  failed: {states['failed']}"
+        )
+        print(
+            f"Last hour: {stats['done']} done, {stats['failed']} failed"
+            + (f", {stats['avg_duration_s']}s per upload" if stats["avg_duration_s"] is not None else "")
+            + (f"; oldest queued job waiting {stats['oldest_queued_s']:.0f}s" if stats["oldest_queued_s"] is not None else "")
+        )
+        for job in queue.list_jobs(limit=args.limit):
+            updated = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(job.updated_at))
+            detail = job.error if job.state == "failed" else job.message
+            print(f"[-] {job.id[:8]} {job.state:<12} {job.source:<4} {updated} {os.path.basename(job.payload.get('video', ''))} {detail or ''}")
+
     elif args.subcommand == "show":
         # if flag is c then show cookie names
         if args.users:
@@ -114,4 +219,4 @@ if __name__ == "__main__":
             print("No flag provided. Use -c (show all cookies) or -v (show all videos).")
 
     else:
-        eprint("Invalid subcommand. Use 'login' or 'upload' or 'show'.")
+        eprint("Invalid subcommand. Use 'login', 'upload', 'upload-batch', 'worker', 'queue' or 'show'.")
@@ -1,6 +1,7 @@
 
 import os
 import platform
+import re
 import threading
 import tkinter as tk
 from datetime import datetime
@@ -11,11 +12,16 @@ from zoneinfo import ZoneInfo
 from tkcalendar import DateEntry
 
 from tiktok_uploader import tiktok
-from tiktok_uploader.Video import Video
+from tiktok_uploader.cookies import load_cookies_from_file
 from tiktok_uploader.gemini_caption import GeminiCaptionError, GeminiCaptionService
-from tiktok_uploader.videotoolbox_upscale import upscale_video_with_videotoolbox
+from tiktok_uploader.hashtag_index import get_hashtag_index
+from tiktok_uploader.http_transport import create_session
+from tiktok_uploader.job_queue import ACTIVE_STATES, DONE, FINAL_STATES, QUEUED, JobWorkerPool, get_job_queue
+from tiktok_uploader.upload_journal import journaled_videos
 
 US_EASTERN = ZoneInfo("America/New_York")
+# Hashtag being typed directly before the caption cursor.
+HASHTAG_PREFIX_PATTERN = re.compile(r"#(\w+)$")
 
 class TiktokUploaderGUI(tk.Tk):
     def __init__(self):
@@ -46,8 +52,13 @@ class TiktokUploaderGUI(tk.Tk):
             os.path.join(os.getcwd(), "TikTok Algo Guide.pdf"),
         ]
         self._caption_thread: Optional[threading.Thread] = None
-        self._upload_thread: Optional[threading.Thread] = None
         self._active_tasks = 0
+        self.hashtag_index = get_hashtag_index()
+        self._hashtag_sessions = {}
+        # Uploads go through the shared job queue; the pool also finishes jobs left over from earlier runs.
+        self.job_queue = get_job_queue()
+        self._own_jobs = set()
+        self.job_pool = JobWorkerPool(self.job_queue, listener=self._on_job_event).start()
 
         self.create_upload_tab()
         self.create_users_tab()
@@ -114,6 +125,17 @@ class TiktokUploaderGUI(tk.Tk):
         self.caption_scrollbar.grid(row=0, column=1, padx=(0, 10), pady=10, sticky="ns")
         self.caption_text.configure(yscrollcommand=self.caption_scrollbar.set)
 
+        # Hashtag autocomplete, answered from the local index while typing.
+        self.hashtag_listbox = tk.Listbox(caption_frame, height=6, exportselection=False)
+        self.caption_text.bind("<KeyRelease>", self._on_caption_key_release)
+        self.caption_text.bind("<Tab>", self._accept_hashtag_suggestion)
+        self.caption_text.bind("<Down>", self._focus_hashtag_suggestions)
+        self.caption_text.bind("<Escape>", lambda _event: self._hide_hashtag_suggestions())
+        self.hashtag_listbox.bind("<Return>", self._accept_hashtag_suggestion)
+        self.hashtag_listbox.bind("<Tab>", self._accept_hashtag_suggestion)
+        self.hashtag_listbox.bind("<Double-Button-1>", self._accept_hashtag_suggestion)
+        self.hashtag_listbox.bind("<Escape>", lambda _event: self._hide_hashtag_suggestions())
+
         caption_actions = ttk.Frame(caption_frame)
         caption_actions.grid(row=1, column=0, columnspan=2, padx=10, pady=(0, 10), sticky="ew")
         caption_actions.columnconfigure(0, weight=1)
@@ -266,6 +288,10 @@ class TiktokUploaderGUI(tk.Tk):
         self.status_scrollbar.grid(row=1, column=1, padx=(0, 10), pady=(0, 10), sticky="ns")
         self.status_text.configure(yscrollcommand=self.status_scrollbar.set)
 
+        self.queue_status_var = tk.StringVar(value="")
+        ttk.Label(status_frame, textvariable=self.queue_status_var).grid(row=2, column=0, padx=10, pady=(0, 10), sticky="w")
+        self._refresh_queue_status()
+
     def create_users_tab(self):
         users_tab = ttk.Frame(self.notebook)
         self.notebook.add(users_tab, text="Users")
@@ -386,11 +412,6 @@ class TiktokUploaderGUI(tk.Tk):
                 self.video_listbox.insert(tk.END, video)
 
     def upload_video(self):
-        if self._upload_thread and self._upload_thread.is_alive():
-            self._report_status("Upload läuft bereits; bitte warten.")
-            messagebox.showinfo("Upload läuft", "Es wird bereits ein Upload ausgeführt.")
-            return
-
         user = self.user_combobox.get()
         source = self.source_entry.get().strip()
         caption = self.caption_text.get("1.0", tk.END).strip()
@@ -428,10 +449,17 @@ class TiktokUploaderGUI(tk.Tk):
                 self._report_status(f"Upload abgebrochen: Video nicht gefunden ({source_reference}).")
                 return
 
-        job = {
-            "user": user,
-            "source": source_reference if upload_type == "local" else source,
-            "caption": caption,
+        session_file_path = os.path.join(self.cookies_dir, f"tiktok_session-{user}.cookie")
+        if not os.path.exists(session_file_path):
+            messagebox.showerror("Missing cookie", f"Cookie-Datei für Nutzer {user} nicht gefunden.")
+            self._report_status(f"Upload abgebrochen: Cookie-Datei für Nutzer {user} nicht gefunden.")
+            return
+
+        payload = {
+            "session_file": session_file_path,
+            "video": source_reference if upload_type == "local" else source,
+            "youtube": upload_type == "youtube",
+            "title": caption,
             "schedule_time": schedule_time,
             "allow_comment": allow_comment,
             "allow_duet": allow_duet,
@@ -443,14 +471,13 @@ class TiktokUploaderGUI(tk.Tk):
             "proxy": proxy or None,
             "datacenter": datacenter,
             "upscale_with_videotoolbox": bool(self.upscale_with_vt_var.get()),
-            "upload_type": upload_type,
         }
 
-        self._set_upload_in_progress(True)
+        job_id = self.job_queue.submit(payload, source="gui")
+        self._own_jobs.add(job_id)
         self._begin_task()
-        self._report_status("Starte Upload-Vorbereitung.")
-        self._upload_thread = threading.Thread(target=self._upload_worker, args=(job,), daemon=True)
-        self._upload_thread.start()
+        self._report_status(f"Upload in die Warteschlange gestellt (Job {job_id[:8]}).")
+        self._refresh_queue_status(reschedule=False)
 
     def _resolve_schedule_seconds(self) -> int:
         raw_seconds = self.schedule_entry.get().strip()
@@ -578,99 +605,159 @@ class TiktokUploaderGUI(tk.Tk):
         self._end_task()
         messagebox.showerror("Generate caption", message)
 
-    def _upload_worker(self, job):
-        try:
-            if job["upload_type"] == "youtube":
-                self._report_status("Lade YouTube-Video herunter.")
-                video_obj = Video(job["source"], job["caption"], status_callback=self._report_status)
-                try:
-                    video_obj.is_valid_file_format()
-                except SystemExit as exc:
-                    raise RuntimeError(str(exc)) from None
-                video_path = video_obj.source_ref
-                if not video_path or not os.path.exists(video_path):
-                    raise RuntimeError("YouTube-Download fehlgeschlagen; keine Videodatei gefunden.")
-                self._report_status("YouTube-Download abgeschlossen.")
-            else:
-                video_path = job["source"]
-
-            if job.get("upscale_with_videotoolbox"):
-                self._report_status("Upscale des Videos auf 4K über VideoToolbox Super Resolution.")
-                video_path = upscale_video_with_videotoolbox(video_path)
+    def _current_hashtag_prefix(self) -> Optional[str]:
+        match = HASHTAG_PREFIX_PATTERN.search(self.caption_text.get("insert linestart", "insert"))
+        return match.group(1) if match else None
 
-            self._report_status("Starte Upload zu TikTok.")
-            session_file_path = os.path.join(self.cookies_dir, f"tiktok_session-{job['user']}.cookie")
+    def _hashtag_session(self):
+        user = self.user_combobox.get()
+        if not user:
+            return None
+        if user not in self._hashtag_sessions:
+            session_file_path = os.path.join(self.cookies_dir, f"tiktok_session-{user}.cookie")
             if not os.path.exists(session_file_path):
-                raise RuntimeError(f"Cookie-Datei für Nutzer {job['user']} nicht gefunden.")
-
-            success = tiktok.upload_video(
-                session_file_path,
-                video_path,
-                job["caption"],
-                schedule_time=job["schedule_time"],
-                allow_comment=job["allow_comment"],
-                allow_duet=job["allow_duet"],
-                allow_stitch=job["allow_stitch"],
-                visibility_type=job["visibility_type"],
-                brand_organic_type=job["brand_organic_type"],
-                branded_content_type=job["branded_content_type"],
-                ai_label=job["ai_label"],
-                proxy=job["proxy"],
-                datacenter=job["datacenter"],
-                status_callback=self._report_status,
-            )
-        except RuntimeError as err:
-            err_msg = str(err)
-            self.after(0, lambda msg=err_msg: self._on_upload_error(msg))
-        except Exception as exc:
-            exc_msg = str(exc)
-            self.after(0, lambda msg=exc_msg: self._on_upload_error(msg))
+                return None
+            session = create_session()
+            for cookie in load_cookies_from_file(session_file_path):
+                session.cookies.set(cookie["name"], cookie["value"], domain=cookie.get("domain", ".tiktok.com"))
+            self._hashtag_sessions[user] = session
+        return self._hashtag_sessions[user]
+
+    def _on_caption_key_release(self, event):
+        if event.keysym in ("Up", "Down", "Tab", "Return", "Escape"):
+            return
+        prefix = self._current_hashtag_prefix()
+        if not prefix:
+            self._hide_hashtag_suggestions()
+            return
+        self._show_hashtag_suggestions(self.hashtag_index.search(prefix))
+
+        # Only prefixes the index has never seen go to TikTok, in the background.
+        session = self._hashtag_session() if len(prefix) >= 2 else None
+        if session is not None:
+            future = self.hashtag_index.fetch_in_background(session, prefix)
+            if future is not None:
+                future.add_done_callback(lambda _future: self.after(0, self._refresh_hashtag_suggestions))
+
+    def _refresh_hashtag_suggestions(self):
+        prefix = self._current_hashtag_prefix()
+        if prefix and self.focus_get() in (self.caption_text, self.hashtag_listbox):
+            self._show_hashtag_suggestions(self.hashtag_index.search(prefix))
+
+    def _show_hashtag_suggestions(self, names):
+        if not names:
+            self._hide_hashtag_suggestions()
+            return
+        self.hashtag_listbox.delete(0, tk.END)
+        for name in names:
+            self.hashtag_listbox.insert(tk.END, f"#{name}")
+        self.hashtag_listbox.selection_set(0)
+        self.hashtag_listbox.configure(height=min(len(names), 6))
+        bbox = self.caption_text.bbox("insert")
+        if bbox:
+            x, y, _, height = bbox
+            self.hashtag_listbox.place(in_=self.caption_text, x=x, y=y + height)
+            self.hashtag_listbox.lift()
+
+    def _hide_hashtag_suggestions(self):
+        self.hashtag_listbox.place_forget()
+
+    def _focus_hashtag_suggestions(self, _event):
+        if not self.hashtag_listbox.winfo_ismapped():
+            return None
+        self.hashtag_listbox.focus_set()
+        self.hashtag_listbox.activate(0)
+        return "break"
+
+    def _accept_hashtag_suggestion(self, _event):
+        if not self.hashtag_listbox.winfo_ismapped():
+            return None
+        prefix = self._current_hashtag_prefix()
+        selection = self.hashtag_listbox.curselection()
+        if prefix:
+            name = self.hashtag_listbox.get(selection[0] if selection else 0)
+            self.caption_text.delete(f"insert - {len(prefix) + 1}c", "insert")
+            self.caption_text.insert("insert", f"{name} ")
+        self._hide_hashtag_suggestions()
+        self.caption_text.focus_set()
+        return "break"
+
+    def _on_job_event(self, job, state, message):
+        # Called from the queue's worker threads.
+        if message:
+            self._report_status(message)
+            return
+        if state not in FINAL_STATES or job.id not in self._own_jobs:
+            return
+        if state == DONE:
+            self.after(0, self._on_upload_success)
         else:
-            if success:
-                self.after(0, self._on_upload_success)
-            else:
-                self.after(0, lambda: self._on_upload_failure("TikTok hat den Upload ohne Erfolg beendet."))
+            error = self.job_queue.get(job.id).error or "TikTok hat den Upload ohne Erfolg beendet."
+            self.after(0, lambda msg=error: self._on_upload_failure(msg))
+        self._own_jobs.discard(job.id)
 
     def _on_upload_success(self):
         self._report_status("Upload erfolgreich abgeschlossen.")
-        self._set_upload_in_progress(False)
-        self._upload_thread = None
         self._end_task()
+        self._refresh_queue_status(reschedule=False)
         messagebox.showinfo("Upload", "Video erfolgreich hochgeladen.")
 
     def _on_upload_failure(self, message: str):
-        self._report_status(message)
-        self._set_upload_in_progress(False)
-        self._upload_thread = None
-        self._end_task()
-        messagebox.showerror("Upload fehlgeschlagen", message)
-
-    def _on_upload_error(self, message: str):
         self._report_status(f"Upload fehlgeschlagen: {message}")
-        self._set_upload_in_progress(False)
-        self._upload_thread = None
         self._end_task()
+        self._refresh_queue_status(reschedule=False)
         messagebox.showerror("Upload fehlgeschlagen", message)
 
-    def _set_upload_in_progress(self, in_progress: bool):
-        if in_progress:
-            self.upload_button.state(["disabled"])
-        else:
-            self.upload_button.state(["!disabled"])
+    def _refresh_queue_status(self, reschedule: bool = True):
+        try:
+            stats = self.job_queue.stats()
+        except Exception:
+            stats = None
+        if stats:
+            self.queue_status_var.set(
+                f"Warteschlange: {stats['depth']} wartend, {stats['running']} aktiv, "
+                f"{stats['done']} fertig / {stats['failed']} fehlgeschlagen in der letzten Stunde"
+            )
+        if reschedule:
+            self.after(5000, self._refresh_queue_status)
 
     def _on_close(self):
+        if self.job_pool.busy and not messagebox.askyesno(
+            "Uploads laufen",
+            "Es laufen noch Uploads. Jetzt beenden? Sie werden beim nächsten Start fortgesetzt.",
+        ):
+            return
+        # Running jobs keep their lease until it expires, then the next start resumes them.
+        self.job_pool.stop(wait=False)
         self._cleanup_video_subfolder_files()
         self.destroy()
 
+    def _files_in_use(self):
+        """Videos that queued or running jobs and resumable uploads still need."""
+        in_use = journaled_videos()
+        for job in self.job_queue.list_jobs(states=(QUEUED,) + ACTIVE_STATES, limit=None):
+            video = job.payload.get("video")
+            if video:
+                in_use.add(os.path.abspath(video))
+                in_use.add(os.path.abspath(os.path.join(self.video_dir, video)))
+        return in_use
+
     def _cleanup_video_subfolder_files(self):
         if not os.path.isdir(self.video_dir):
             return
+        try:
+            in_use = self._files_in_use()
+        except Exception:
+            # Without knowing which files are still needed, keep them all.
+            return
         for root, _, files in os.walk(self.video_dir):
             if os.path.abspath(root) == os.path.abspath(self.video_dir):
                 continue
             # Remove every file in the video subdirectories but keep directory structure.
             for file_name in files:
                 file_path = os.path.join(root, file_name)
+                if os.path.abspath(file_path) in in_use:
+                    continue
                 try:
                     os.remove(file_path)
                 except OSError:
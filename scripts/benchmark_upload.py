@@ -0,0 +1,247 @@
+"""
+End-to-end upload benchmark against the offline mock TikTok server.
+
+Every file size is uploaded through ``upload_video`` (or ``upload_video_async``)
+in a fresh child process, so the reported peak RSS belongs to that upload
+alone. The mock server runs in this process; see tiktok_uploader/mock_server.py.
+
+Two local steps are replaced because they cannot run offline and are not part
+of the network hot path: the ffmpeg metadata pass returns the input file
+unchanged, and the Node/Chromium request signer returns a fixed signature.
+
+    python scripts/benchmark_upload.py --sizes 1M,10M,100M,1G --output bench.json
+    python scripts/benchmark_upload.py --baseline bench.json --max-regression 0.15
+
+``--record`` stores every exchange in a cassette (tiktok_uploader/http_cassette.py);
+``--replay`` answers from it instead of the mock server, and ``--replay-speed 0``
+drops the recorded latencies so only the uploader's own CPU time is measured.
+
+    python scripts/benchmark_upload.py --sizes 10M --record upload.cassette
+    python scripts/benchmark_upload.py --sizes 10M,100M --replay upload.cassette --replay-speed 0
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from tiktok_uploader.bandwidth import parse_rate
+from tiktok_uploader.mock_server import MockBehaviour, MockTikTokServer
+
+
+DEFAULT_SIZES = "1M,10M,100M,1G"
+_FILL_BLOCK = 1024 * 1024
+_MOCK_SIGNATURE = json.dumps({"data": {"x-bogus": "mock-x-bogus", "signature": "mock-signature"}})
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes.
+    return round(peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024, 1)
+
+
+def write_sample(path: str, size: int) -> None:
+    block = os.urandom(_FILL_BLOCK)
+    with open(path, "wb") as f:
+        remaining = size
+        while remaining > 0:
+            f.write(block[:min(remaining, _FILL_BLOCK)])
+            remaining -= _FILL_BLOCK
+
+
+def prepare_offline_uploader(endpoint: str, workdir: str) -> str:
+    """
+    Point the uploader at the mock server at ``endpoint`` and return a session file for it.
+
+    Replaces the ffmpeg pass and the Node signer in ``tiktok`` (see module docstring).
+    """
+    from tiktok_uploader import tiktok
+    from tiktok_uploader.Config import Config
+    from tiktok_uploader.cookies import save_cookies_to_file
+    from tiktok_uploader.http_transport import set_endpoint_override
+
+    Config.get()
+    set_endpoint_override(endpoint)
+    tiktok.prepare_video_for_upload = lambda video_path: video_path
+    tiktok.subprocess_jsvmp = lambda js, user_agent, url: _MOCK_SIGNATURE
+
+    cookies = [
+        {"name": "sessionid", "value": "benchmark-" + os.urandom(8).hex(), "domain": ".tiktok.com"},
+        {"name": "tt-target-idc", "value": "useast2a", "domain": ".tiktok.com"},
+    ]
+    save_cookies_to_file(cookies, "tiktok_session-benchmark", cookies_path=workdir)
+    return os.path.join(workdir, "tiktok_session-benchmark.cookie")
+
+
+def run_one(args) -> None:
+    """Child process: upload one file against the mock server and print a JSON result."""
+    from tiktok_uploader import tiktok
+    from tiktok_uploader.upload_trace import UploadTrace
+
+    session_file = prepare_offline_uploader(args.endpoint, os.getcwd())
+    if args.record or args.replay:
+        from tiktok_uploader.http_transport import set_cassette
+        if args.record:
+            set_cassette(args.record, "record")
+        else:
+            set_cassette(args.replay, "replay", args.replay_speed)
+
+    options = {"transfer_concurrency": args.concurrency, "pipelined": not args.sequential}
+    trace = UploadTrace(args.file, trace_file="")
+    started = time.monotonic()
+    if args.engine == "async":
+        from tiktok_uploader.tiktok_async import upload_video_async
+        ok = asyncio.run(upload_video_async(session_file, args.file, "benchmark", trace=trace, **options))
+    else:
+        ok = tiktok.upload_video(session_file, args.file, "benchmark", trace=trace, **options)
+    elapsed = time.monotonic() - started
+
+    size = os.path.getsize(args.file)
+    phases = {}
+    for span in trace.phases:
+        phases[span["name"]] = round(phases.get(span["name"], 0) + span["duration_ms"], 1)
+    transfer_ms = phases.get("transfer")
+    print(json.dumps({
+        "size": size,
+        "engine": args.engine,
+        "ok": bool(ok),
+        "duration_s": round(elapsed, 3),
+        "mb_per_s": round(size / 1024 / 1024 / elapsed, 2),
+        "transfer_mb_per_s": round(size / 1024 / 1024 / (transfer_ms / 1000), 2) if transfer_ms else None,
+        "phases_ms": phases,
+        "parts": len(trace.parts),
+        "part_retries": sum(part["retries"] for part in trace.parts),
+        "peak_rss_mb": _peak_rss_mb(),
+        "cpu_s": round(time.process_time(), 3),
+    }))
+
+
+def _run_child(args, path: str, endpoint: str, workdir: str) -> dict:
+    command = [
+        sys.executable, os.path.abspath(__file__), "--run-one",
+        "--file", path, "--endpoint", endpoint, "--engine", args.engine,
+    ]
+    if args.concurrency:
+        command += ["--concurrency", str(args.concurrency)]
+    if args.sequential:
+        command.append("--sequential")
+    if args.record:
+        command += ["--record", os.path.abspath(args.record)]
+    if args.replay:
+        command += ["--replay", os.path.abspath(args.replay), "--replay-speed", str(args.replay_speed)]
+    proc = subprocess.run(command, cwd=workdir, capture_output=True, text=True)
+    lines = [line for line in proc.stdout.splitlines() if line.startswith("{")]
+    if proc.returncode != 0 or not lines:
+        raise RuntimeError(f"benchmark run failed ({proc.returncode}):\n{proc.stderr[-2000:]}")
+    return json.loads(lines[-1])
+
+
+def _best(runs):
+    ok_runs = [run for run in runs if run["ok"]] or runs
+    best = max(ok_runs, key=lambda run: run["mb_per_s"])
+    return dict(best, runs=len(runs), failures=sum(not run["ok"] for run in runs))
+
+
+def _compare(results, baseline, max_regression) -> list:
+    previous = {entry["size"]: entry for entry in baseline.get("results", [])}
+    regressions = []
+    for result in results:
+        before = previous.get(result["size"])
+        if not before:
+            continue
+        if result["mb_per_s"] < before["mb_per_s"] * (1 - max_regression):
+            regressions.append(f"{result['size']} B: {before['mb_per_s']} -> {result['mb_per_s']} MB/s")
+        if result["peak_rss_mb"] > before["peak_rss_mb"] * (1 + max_regression):
+            regressions.append(f"{result['size']} B: peak RSS {before['peak_rss_mb']} -> {result['peak_rss_mb']} MB")
+        if not result["ok"]:
+            regressions.append(f"{result['size']} B: upload failed")
+    return regressions
+
+
+def _print_table(results) -> None:
+    print(f"{'size':>10} {'MB/s':>8} {'xfer MB/s':>10} {'total s':>8} {'CPU s':>8} {'RSS MB':>8} {'retries':>8}  slowest phases")
+    for result in results:
+        phases = sorted(result["phases_ms"].items(), key=lambda item: -item[1])[:3]
+        slowest = ", ".join(f"{name} {ms:.0f}ms" for name, ms in phases)
+        print(
+            f"{result['size']:>10} {result['mb_per_s']:>8} {result['transfer_mb_per_s'] or '-':>10} "
+            f"{result['duration_s']:>8} {result.get('cpu_s', '-'):>8} {result['peak_rss_mb']:>8} {result['part_retries']:>8}  {slowest}"
+        )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark upload_video against the offline mock TikTok server")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help=f"Comma separated file sizes (default: {DEFAULT_SIZES})")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per size; the fastest successful run is reported")
+    parser.add_argument("--engine", choices=("sync", "async"), default="sync")
+    parser.add_argument("--concurrency", type=int, default=None, help="Parts in flight (default: TIKTOK_UPLOAD_CONCURRENCY)")
+    parser.add_argument("--sequential", action="store_true", help="Disable the pipelined pre-upload steps")
+    parser.add_argument("--latency", type=float, default=0.0, help="Mock server latency per response in seconds")
+    parser.add_argument("--bandwidth", default="", help="Mock server inbound bandwidth, e.g. 50M")
+    parser.add_argument("--part-failure-rate", type=float, default=0.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--record", help="Append every HTTP exchange to this cassette")
+    parser.add_argument("--replay", help="Answer every request from this cassette instead of the mock server")
+    parser.add_argument("--replay-speed", type=float, default=1.0, help="Scale of the recorded latencies on replay (0: none)")
+    parser.add_argument("--output", help="Write the results as JSON")
+    parser.add_argument("--baseline", help="Results JSON of a previous run to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.15, help="Allowed MB/s drop / RSS growth (default: 0.15)")
+    parser.add_argument("--run-one", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--file", help=argparse.SUPPRESS)
+    parser.add_argument("--endpoint", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.record and args.replay:
+        parser.error("--record and --replay are mutually exclusive")
+
+    if args.run_one:
+        run_one(args)
+        return 0
+
+    behaviour = MockBehaviour(args.latency, parse_rate(args.bandwidth), args.part_failure_rate, args.failure_rate, args.seed)
+    sizes = [int(parse_rate(size)) for size in args.sizes.split(",") if size.strip()]
+    results = []
+    with tempfile.TemporaryDirectory(prefix="tiktok-bench-") as workdir, MockTikTokServer(behaviour=behaviour) as server:
+        for size in sizes:
+            path = os.path.join(workdir, f"sample_{size}.mp4")
+            write_sample(path, size)
+            try:
+                runs = [_run_child(args, path, server.base_url, workdir) for _ in range(args.repeat)]
+            finally:
+                os.remove(path)
+            results.append(_best(runs))
+        server_stats = server.stats.snapshot()
+
+    _print_table(results)
+    report = {
+        "engine": args.engine,
+        "replay": args.replay,
+        "behaviour": vars(behaviour),
+        "results": results,
+        "server": server_stats,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = _compare(results, json.load(f), args.max_regression)
+        if regressions:
+            print("Regressions against baseline:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print("No regressions against baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
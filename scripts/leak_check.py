@@ -0,0 +1,279 @@
+"""
+Resource leak harness for long-running API and GUI processes.
+
+Runs upload, render and caption cycles in this process against local
+stand-ins and samples RSS, open file descriptors, threads and child processes
+after every cycle. After the warm-up cycles the first sample is the baseline;
+the run fails when the last sample grew past the thresholds.
+
+    upload   upload_video (or the API's async engine) against the mock TikTok server
+    render   the API's ffmpeg fade-in render, then open/close the result as a Video
+    caption  hashtag suggestions, @mention lookups and convert_tags against the mock server
+
+    python scripts/leak_check.py --cycles 200 --kinds upload,caption --output leaks.json
+
+Uploads use the same offline setup as benchmark_upload.py; rendering needs ffmpeg.
+"""
+import argparse
+import asyncio
+import gc
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from benchmark_upload import prepare_offline_uploader, write_sample
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+_CAPTION = "Leak check #fyp #coding #python with @alice and @bob"
+
+
+def _quiet(message):
+    pass
+
+
+def _proc_children(pid: int):
+    children = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # The command name may contain spaces; the parent pid follows the closing parenthesis.
+                fields = f.read().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        if int(fields[1]) == pid:
+            children.append(int(entry))
+    return children
+
+
+def sample(exclude_pids=()) -> dict:
+    """RSS, open descriptors, threads and live child processes of this process."""
+    gc.collect()
+    if psutil is not None:
+        proc = psutil.Process()
+        rss = proc.memory_info().rss
+        fds = proc.num_fds() if hasattr(proc, "num_fds") else proc.num_handles()
+        threads = proc.num_threads()
+        children = [child.pid for child in proc.children(recursive=True)]
+    else:
+        with open("/proc/self/statm") as f:
+            rss = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        fds = len(os.listdir("/proc/self/fd"))
+        with open("/proc/self/status") as f:
+            threads = next(int(line.split()[1]) for line in f if line.startswith("Threads:"))
+        children = _proc_children(os.getpid())
+    return {
+        "time": round(time.time(), 3),
+        "rss_mb": round(rss / 1024 / 1024, 1),
+        "fds": fds,
+        "threads": threads,
+        "python_threads": threading.active_count(),
+        "children": len([pid for pid in children if pid not in exclude_pids]),
+    }
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _start_mock_server(args):
+    port = _free_port()
+    command = [
+        sys.executable, "-m", "tiktok_uploader.mock_server", "--port", str(port),
+        "--latency", str(args.latency), "--part-failure-rate", str(args.part_failure_rate),
+    ]
+    server = subprocess.Popen(command, cwd=REPO_ROOT, stdout=subprocess.DEVNULL)
+    deadline = time.monotonic() + 15
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+            return server, f"http://127.0.0.1:{port}"
+        except OSError:
+            time.sleep(0.1)
+    server.kill()
+    raise RuntimeError("mock server did not start")
+
+
+class UploadCycle:
+    def __init__(self, args, endpoint, workdir):
+        from tiktok_uploader import tiktok
+
+        self.tiktok = tiktok
+        self.engine = args.engine
+        self.session_file = prepare_offline_uploader(endpoint, workdir)
+        self.video = os.path.join(workdir, "leak_check.mp4")
+        write_sample(self.video, args.video_size)
+        # The API serves every upload from one long-lived event loop.
+        self.loop = asyncio.new_event_loop() if self.engine == "async" else None
+
+    def run(self) -> bool:
+        if self.loop is not None:
+            from tiktok_uploader.tiktok_async import upload_video_async
+            return self.loop.run_until_complete(upload_video_async(self.session_file, self.video, "leak check", status_callback=_quiet))
+        return self.tiktok.upload_video(self.session_file, self.video, "leak check", status_callback=_quiet)
+
+    def close(self):
+        if self.loop is not None:
+            from tiktok_uploader.http_transport import shutdown_async
+            self.loop.run_until_complete(shutdown_async())
+            self.loop.close()
+
+
+class RenderCycle:
+    def __init__(self, args, endpoint, workdir):
+        if not shutil.which("ffmpeg"):
+            raise RuntimeError("the render cycle needs ffmpeg on PATH (or leave it out with --kinds)")
+        from api import generate_fadein_video_with_ffmpeg
+        from tiktok_uploader.Video import Video
+
+        self.render = generate_fadein_video_with_ffmpeg
+        self.Video = Video
+        self.workdir = Path(workdir)
+        self.image = self.workdir / "leak_check.png"
+        subprocess.run(
+            ["ffmpeg", "-y", "-f", "lavfi", "-i", "color=c=steelblue:s=320x240", "-frames:v", "1", str(self.image)],
+            check=True, capture_output=True,
+        )
+
+    def run(self) -> bool:
+        output = self.workdir / "leak_check_fadein.mp4"
+        self.render(self.image, output, 1.0)
+        with self.Video(str(output), "") as video:
+            ok = video.clip.duration > 0
+        output.unlink()
+        return ok
+
+    def close(self):
+        pass
+
+
+class CaptionCycle:
+    def __init__(self, args, endpoint, workdir):
+        from tiktok_uploader.bot_utils import convert_tags, extract_mentions
+        from tiktok_uploader.hashtag_index import HashtagIndex, extract_hashtags
+        from tiktok_uploader.http_transport import create_session, set_endpoint_override
+        from tiktok_uploader.mention_resolver import MentionResolver
+
+        set_endpoint_override(endpoint)
+        self.convert_tags = convert_tags
+        self.create_session = create_session
+        self.mentions = extract_mentions(_CAPTION)
+        self.hashtags = extract_hashtags(_CAPTION)
+        # A zero TTL sends every cycle through the network path instead of the caches.
+        self.index = HashtagIndex(Path(workdir) / "hashtags.json", ttl_seconds=0)
+        self.resolver = MentionResolver(Path(workdir) / "mentions.json", ttl_seconds=0)
+
+    def run(self) -> bool:
+        session = self.create_session()
+        session.cookies.set("sessionid", "leak-check", domain=".tiktok.com")
+        failed = self.index.fetch(session, self.hashtags)
+        user_ids = self.resolver.resolve(session, self.mentions)
+        self.convert_tags(_CAPTION, session, user_ids=user_ids)
+        return not failed and len(user_ids) == len(set(self.mentions))
+
+    def close(self):
+        pass
+
+
+CYCLES = {"upload": UploadCycle, "render": RenderCycle, "caption": CaptionCycle}
+
+
+def _growth(first: dict, last: dict) -> dict:
+    return {key: round(last[key] - first[key], 1) for key in ("rss_mb", "fds", "threads", "children")}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Detect RSS, file descriptor, thread and child process leaks")
+    parser.add_argument("--kinds", default="upload,render,caption", help="Cycles to run, comma separated")
+    parser.add_argument("--cycles", type=int, default=50, help="Measured rounds (each runs every kind once)")
+    parser.add_argument("--warmup", type=int, default=5, help="Rounds before the baseline sample")
+    parser.add_argument("--engine", choices=("sync", "async"), default="sync")
+    parser.add_argument("--video-size", type=int, default=8 * 1024 * 1024, help="Bytes per uploaded video")
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--part-failure-rate", type=float, default=0.0)
+    parser.add_argument("--max-rss-growth-mb", type=float, default=64.0)
+    parser.add_argument("--max-fd-growth", type=int, default=8)
+    parser.add_argument("--max-thread-growth", type=int, default=4)
+    parser.add_argument("--max-children", type=int, default=0, help="Child processes allowed to outlive a cycle")
+    parser.add_argument("--report-every", type=int, default=10)
+    parser.add_argument("--output", help="Write every sample as JSON")
+    args = parser.parse_args()
+
+    kinds = [kind.strip() for kind in args.kinds.split(",") if kind.strip()]
+    unknown = set(kinds) - set(CYCLES)
+    if unknown:
+        parser.error(f"unknown cycle kinds: {', '.join(sorted(unknown))}")
+
+    server, endpoint = _start_mock_server(args)
+    workdir = tempfile.mkdtemp(prefix="tiktok-leaks-")
+    previous_cwd = os.getcwd()
+    # State files (journals, caches, msTokens) land in the scratch directory.
+    os.chdir(workdir)
+    cycles = {}
+    samples = []
+    failures = 0
+    try:
+        cycles = {kind: CYCLES[kind](args, endpoint, workdir) for kind in kinds}
+        for round_number in range(args.warmup + args.cycles):
+            for kind, cycle in cycles.items():
+                if not cycle.run():
+                    failures += 1
+                    print(f"round {round_number}: {kind} cycle failed")
+            if round_number + 1 >= args.warmup:
+                samples.append(dict(sample(exclude_pids=(server.pid,)), round=round_number + 1))
+                measured = round_number + 1 - args.warmup
+                if args.report_every and measured and measured % args.report_every == 0:
+                    print(f"round {round_number + 1}: {json.dumps(samples[-1])}")
+    finally:
+        for cycle in cycles.values():
+            cycle.close()
+        os.chdir(previous_cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+        server.terminate()
+        server.wait()
+
+    growth = _growth(samples[0], samples[-1])
+    limits = {
+        "rss_mb": args.max_rss_growth_mb,
+        "fds": args.max_fd_growth,
+        "threads": args.max_thread_growth,
+    }
+    exceeded = [f"{key} grew by {growth[key]} (limit {limit})" for key, limit in limits.items() if growth[key] > limit]
+    if samples[-1]["children"] > args.max_children:
+        exceeded.append(f"{samples[-1]['children']} child processes still running (limit {args.max_children})")
+
+    print(f"baseline: {json.dumps(samples[0])}")
+    print(f"final:    {json.dumps(samples[-1])}")
+    print(f"growth over {args.cycles} rounds: {json.dumps(growth)}; failed cycles: {failures}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"kinds": kinds, "engine": args.engine, "growth": growth, "samples": samples}, f, indent=2)
+
+    if exceeded:
+        print("Leak thresholds exceeded:")
+        for line in exceeded:
+            print(f"  {line}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,24 @@
+import pytest
+
+from tiktok_uploader.Config import Config
+
+
+@pytest.fixture
+def state_dir(tmp_path, monkeypatch):
+    """Point ``Config.state_dir`` at a fresh temporary directory."""
+    config = Config.__new__(Config)
+    config.path = None
+    config._options = dict(Config._DEFAULT_OPTIONS, STATE_DIR=str(tmp_path / "state"))
+    monkeypatch.setattr(Config, "_instance", config)
+    return tmp_path / "state"
+
+
+@pytest.fixture
+def mock_tiktok(monkeypatch):
+    """Offline TikTok (``MockTikTokServer``) that every new HTTP session and client talks to."""
+    from tiktok_uploader import http_transport
+    from tiktok_uploader.mock_server import MockTikTokServer
+
+    with MockTikTokServer() as server:
+        monkeypatch.setattr(http_transport, "_endpoint_override", server.base_url)
+        yield server
@@ -0,0 +1,57 @@
+import asyncio
+
+import pytest
+
+from tiktok_uploader.admission import AdmissionGate, AdmissionRejected
+
+
+def test_requests_beyond_the_wait_queue_are_rejected_at_once():
+    gate = AdmissionGate("render", concurrency=1, max_queue=1, timeout=5)
+
+    async def main():
+        assert await gate.acquire() == 0.0
+        waiting = asyncio.ensure_future(gate.acquire())
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected) as rejected:
+            await gate.acquire()
+        gate.release(0.1)
+        await waiting
+        return rejected.value
+
+    rejected = asyncio.run(main())
+
+    assert (rejected.gate, rejected.reason) == ("render", "busy")
+    assert (gate.active, gate.waiting, gate.rejected) == (1, 0, 1)
+
+
+def test_waiting_past_the_deadline_is_rejected():
+    gate = AdmissionGate("upload", concurrency=1, max_queue=4, timeout=0.05)
+
+    async def main():
+        await gate.acquire()
+        with pytest.raises(AdmissionRejected) as rejected:
+            await gate.acquire()
+        return rejected.value
+
+    rejected = asyncio.run(main())
+
+    assert rejected.reason == "queue deadline passed"
+    assert gate.waiting == 0
+
+
+def test_retry_after_follows_recent_service_times():
+    gate = AdmissionGate("render", concurrency=2)
+    assert gate.retry_after() == 5
+
+    async def main():
+        for _ in range(2):
+            await gate.acquire()
+        gate.release(3.0)
+        gate.release(5.0)
+        for _ in range(2):
+            await gate.acquire()
+
+    asyncio.run(main())
+
+    # Both slots are busy with requests taking 4 s on average.
+    assert gate.retry_after() == 4
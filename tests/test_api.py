@@ -0,0 +1,158 @@
+import asyncio
+import threading
+import time
+
+import httpx
+import pytest
+
+from tiktok_uploader import job_queue
+from tiktok_uploader.admission import AdmissionGate
+from tiktok_uploader.job_queue import AsyncJobWorkerPool, JobQueue
+from tiktok_uploader.render_cache import RenderCache
+
+
+_SECRET = "test-secret"
+
+
+@pytest.fixture
+def api(state_dir, tmp_path, monkeypatch):
+    import api
+
+    monkeypatch.setattr(api, "UPLOAD_SECRET", _SECRET)
+    monkeypatch.setattr(api, "render_cache", RenderCache(tmp_path / "render_cache"))
+    queue = JobQueue(tmp_path / "jobs.sqlite3")
+    monkeypatch.setattr(job_queue, "_queue", queue)
+    # A pool that is never started: queued jobs stay queued.
+    monkeypatch.setattr(api, "job_pool", AsyncJobWorkerPool(queue))
+    return api
+
+
+def _client(api):
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=api.app), base_url="http://api", headers={"X-Upload-Auth": _SECRET})
+
+
+def test_concurrent_fadein_misses_share_one_render(api, monkeypatch):
+    renders = []
+
+    def fake_ffmpeg(image_path, output_path, duration, profile="standard"):
+        renders.append(image_path)
+        time.sleep(0.2)
+        output_path.write_bytes(b"rendered")
+
+    monkeypatch.setattr(api, "generate_fadein_video_with_ffmpeg", fake_ffmpeg)
+
+    async def main():
+        async with _client(api) as client:
+            def request():
+                return client.post("/fadein-from-image", files={"image_file": ("still.png", b"\x89PNG image", "image/png")}, data={"duration": "2"})
+
+            responses = await asyncio.gather(*(request() for _ in range(3)))
+            return responses, await request()
+
+    responses, later = asyncio.run(main())
+
+    assert [response.status_code for response in responses] == [200, 200, 200]
+    assert sorted(response.headers["X-Render-Cache"] for response in responses) == ["miss", "shared", "shared"]
+    assert all(response.content == b"rendered" for response in responses)
+    assert later.headers["X-Render-Cache"] == "hit"
+    assert len(renders) == 1
+    assert renders[0].parent == api.render_cache.directory / "inputs"
+    assert list(renders[0].parent.iterdir()) == []
+    assert api.fadein_renders == {}
+
+
+def test_fadein_request_cleans_up_when_the_client_goes_away(api, tmp_path, monkeypatch):
+    render_started = threading.Event()
+    temp_dirs = []
+
+    def fake_ffmpeg(image_path, output_path, duration, profile="standard"):
+        render_started.set()
+        time.sleep(0.3)
+        output_path.write_bytes(b"rendered")
+
+    def mkdtemp():
+        temp_dirs.append(tmp_path / f"request-{len(temp_dirs)}")
+        temp_dirs[-1].mkdir()
+        return str(temp_dirs[-1])
+
+    monkeypatch.setattr(api, "generate_fadein_video_with_ffmpeg", fake_ffmpeg)
+    monkeypatch.setattr(api.tempfile, "mkdtemp", mkdtemp)
+
+    async def main():
+        async with _client(api) as client:
+            request = asyncio.ensure_future(client.post("/fadein-from-image", files={"image_file": ("still.png", b"\x89PNG image", "image/png")}))
+            while not render_started.is_set():
+                await asyncio.sleep(0.01)
+            request.cancel()
+            # The render carries on for whoever asks next.
+            await asyncio.sleep(0.5)
+            return await client.post("/fadein-from-image", files={"image_file": ("still.png", b"\x89PNG image", "image/png")})
+
+    later = asyncio.run(main())
+
+    assert not temp_dirs[0].exists()
+    assert later.headers["X-Render-Cache"] == "hit"
+
+
+def _upload(client, caption="queued upload", video=b"\x00" * 64, headers=None):
+    return client.post(
+        "/upload",
+        files={"video_file": ("clip.mp4", video, "video/mp4"), "session_file": ("session.cookie", b"[]", "application/octet-stream")},
+        data={"caption": caption},
+        headers=headers,
+    )
+
+
+def test_repeated_upload_is_answered_with_the_first_job(api):
+    async def main():
+        async with _client(api) as client:
+            first = await _upload(client, headers={"Idempotency-Key": "retry-1"})
+            same_key = await _upload(client, caption="edited", headers={"Idempotency-Key": "retry-1"})
+            same_content = await _upload(client)
+            different = await _upload(client, caption="another upload")
+            return first, same_key, same_content, different
+
+    first, same_key, same_content, different = asyncio.run(main())
+
+    assert first.status_code == 202
+    assert "Idempotent-Replayed" not in first.headers
+    for replayed in (same_key, same_content):
+        assert replayed.status_code == 202
+        assert replayed.headers["Idempotent-Replayed"] == "true"
+        assert replayed.json()["job_id"] == first.json()["job_id"]
+    assert different.json()["job_id"] != first.json()["job_id"]
+    assert job_queue.get_job_queue().depth() == 2
+
+
+def test_upload_is_rejected_while_the_gate_is_full(api, monkeypatch):
+    monkeypatch.setattr(api, "upload_gate", AdmissionGate("upload", concurrency=1))
+
+    async def main():
+        await api.upload_gate.acquire()
+        async with _client(api) as client:
+            return await _upload(client)
+
+    response = asyncio.run(main())
+
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "5"
+    assert job_queue.get_job_queue().depth() == 0
+
+
+def test_concurrent_requests_with_one_idempotency_key_read_one_body(api, monkeypatch):
+    check_job_backlog = api.check_job_backlog
+
+    def slow_check(queue):
+        time.sleep(0.1)
+        check_job_backlog(queue)
+
+    monkeypatch.setattr(api, "check_job_backlog", slow_check)
+
+    async def main():
+        async with _client(api) as client:
+            return await asyncio.gather(*(_upload(client, headers={"Idempotency-Key": "retry-1"}) for _ in range(2)))
+
+    responses = asyncio.run(main())
+
+    assert sorted(response.status_code for response in responses) == [202, 409]
+    assert api.receiving_keys == set()
@@ -0,0 +1,89 @@
+import types
+
+import pytest
+
+from tiktok_uploader import bandwidth
+from tiktok_uploader.bandwidth import BandwidthLimiter, TokenBucket, parse_rate
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Manual clock for the bandwidth module; ``sleep`` advances it."""
+    clock = types.SimpleNamespace(now=100.0)
+    clock.monotonic = lambda: clock.now
+    clock.sleep = lambda seconds: setattr(clock, "now", clock.now + seconds)
+    monkeypatch.setattr(bandwidth, "time", clock)
+    return clock
+
+
+@pytest.mark.parametrize("text, rate", [
+    ("2500000", 2500000),
+    ("512K", 512 * 1024),
+    ("8MB/s", 8 * 1024 ** 2),
+    ('"1g"', 1024 ** 3),
+    ("", None),
+    ("off", None),
+    ("0", None),
+    (None, None),
+])
+def test_parse_rate(text, rate):
+    assert parse_rate(text) == rate
+
+
+def test_bucket_allows_a_burst_then_paces(clock):
+    bucket = TokenBucket(rate=1000)
+
+    assert bucket.reserve(1000) == 0.0
+    assert bucket.reserve(500) == pytest.approx(0.5)
+    # The debt is paid off over time.
+    clock.sleep(1.5)
+    assert bucket.reserve(1000) == 0.0
+
+
+def test_bucket_refill_is_capped_at_the_burst(clock):
+    bucket = TokenBucket(rate=1000, burst=2000)
+    clock.sleep(60)
+
+    assert bucket.reserve(2000) == 0.0
+    assert bucket.reserve(1000) == pytest.approx(1.0)
+
+
+def test_no_limits_yield_no_throttle():
+    with BandwidthLimiter().throttle() as throttle:
+        assert throttle is None
+
+
+def test_unknown_priority_is_rejected():
+    with pytest.raises(ValueError):
+        with BandwidthLimiter(global_rate=1000).throttle("urgent"):
+            pass
+
+
+def test_global_rate_is_shared_by_priority_weight(clock):
+    limiter = BandwidthLimiter(global_rate=7000)
+    with limiter.throttle("high") as high, limiter.throttle("normal") as normal, limiter.throttle("background") as background:
+        assert high._bucket.rate == pytest.approx(4000)
+        assert normal._bucket.rate == pytest.approx(2000)
+        assert background._bucket.rate == pytest.approx(1000)
+    with limiter.throttle("background") as alone:
+        assert alone._bucket.rate == pytest.approx(7000)
+
+
+def test_per_upload_rate_caps_the_share(clock):
+    limiter = BandwidthLimiter(global_rate=10000, per_upload_rate=3000)
+    with limiter.throttle() as throttle:
+        assert throttle._bucket.rate == 3000
+
+
+def test_throttled_body_is_sent_in_paced_blocks(clock):
+    limiter = BandwidthLimiter(per_upload_rate=64 * 1024)
+    data = memoryview(bytes(3 * 64 * 1024 + 10))
+    with limiter.throttle() as throttle:
+        body = throttle.body(data)
+        blocks = list(body)
+
+    assert len(body) == data.nbytes
+    assert b"".join(blocks) == data.tobytes()
+    assert len(blocks) == 4
+    # The first block fits the burst; the rest go out at 64 KiB per second.
+    assert clock.now - 100.0 == pytest.approx(2 + 10 / (64 * 1024), rel=0.01)
@@ -0,0 +1,60 @@
+import json
+
+import pytest
+
+from tiktok_uploader.batch import ManifestError, check_item, load_manifest
+
+
+def test_csv_manifest_accepts_the_cli_column_names(tmp_path):
+    manifest = tmp_path / "batch.csv"
+    manifest.write_text("file,caption,users,privacy,duet,schedule\nclip.mp4,first #tag,alice,private,no,900\n\n", encoding="utf-8")
+
+    [item] = load_manifest(str(manifest))
+
+    assert (item.line, item.video, item.title, item.account) == (2, "clip.mp4", "first #tag", "alice")
+    assert item.visibility == 1
+    assert item.duet == 0
+    assert item.schedule == 900
+
+
+def test_jsonl_manifest_uses_the_default_account(tmp_path):
+    manifest = tmp_path / "batch.jsonl"
+    manifest.write_text("# uploads\n" + json.dumps({"video": "clip.mp4", "title": "first"}) + "\n", encoding="utf-8")
+
+    [item] = load_manifest(str(manifest), default_account="bob")
+
+    assert (item.line, item.account) == (2, "bob")
+
+
+@pytest.mark.parametrize("content, message", [
+    ("video,caption,account,colour\nclip.mp4,a,alice,red\n", "line 2: unknown column 'colour'"),
+    ("video,caption,account,privacy\nclip.mp4,a,alice,friends\n", "line 2: privacy must be"),
+    ("video,caption\nclip.mp4,a\n", "line 2: account is required"),
+    ("video,caption,account\n", "manifest has no uploads"),
+])
+def test_malformed_manifest_is_rejected(tmp_path, content, message):
+    manifest = tmp_path / "batch.csv"
+    manifest.write_text(content, encoding="utf-8")
+
+    with pytest.raises(ManifestError, match=message):
+        load_manifest(str(manifest))
+
+
+def test_check_item_reports_what_would_fail(tmp_path, state_dir):
+    video = tmp_path / "clip.mp4"
+    video.write_bytes(b"\x00")
+    cookie = tmp_path / "tiktok_session-alice.cookie"
+    manifest = tmp_path / "batch.jsonl"
+    rows = [
+        {"video": str(video), "title": "ok", "account": str(cookie)},
+        {"video": str(tmp_path / "missing.mp4"), "title": "no video", "account": str(cookie)},
+        {"video": str(video), "title": "too soon", "account": str(cookie), "schedule": 60},
+    ]
+    manifest.write_text("".join(json.dumps(row) + "\n" for row in rows), encoding="utf-8")
+    ok, missing_video, too_soon = load_manifest(str(manifest))
+
+    assert "No saved session" in check_item(ok)
+    cookie.write_text("[]", encoding="utf-8")
+    assert check_item(ok) is None
+    assert "Video does not exist" in check_item(missing_video)
+    assert check_item(too_soon) is not None
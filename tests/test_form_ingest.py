@@ -0,0 +1,95 @@
+import asyncio
+import hashlib
+import threading
+
+import pytest
+
+from tiktok_uploader import form_ingest
+from tiktok_uploader.form_ingest import FileRule, IngestError, ingest_multipart
+
+
+_BOUNDARY = "test-boundary"
+_RULES = {"video": FileRule(max_bytes=1024, content_types={"video/mp4"}, label="Video")}
+
+
+def _multipart(fields=(), files=()):
+    parts = [f'--{_BOUNDARY}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode("utf-8") for name, value in fields]
+    for name, filename, content_type, content in files:
+        header = f'--{_BOUNDARY}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\nContent-Type: {content_type}\r\n\r\n'
+        parts.append(header.encode("utf-8") + content + b"\r\n")
+    return b"".join(parts) + f"--{_BOUNDARY}--\r\n".encode("utf-8")
+
+
+def _ingest(directory, body, headers=None, chunk_size=100):
+    received = []
+
+    async def stream():
+        for start in range(0, len(body), chunk_size):
+            received.append(start)
+            yield body[start:start + chunk_size]
+
+    headers = dict({"content-type": f"multipart/form-data; boundary={_BOUNDARY}"}, **(headers or {}))
+    try:
+        return asyncio.run(ingest_multipart(headers, stream(), directory, _RULES)), len(received)
+    except IngestError as exc:
+        return exc, len(received)
+
+
+def test_files_are_written_to_the_directory_with_their_hash(tmp_path):
+    content = b"\x00\x01" * 300
+    body = _multipart([("title", "hello")], [("video", "../clip.mp4", "video/mp4", content)])
+
+    form, _ = _ingest(tmp_path, body)
+
+    staged = form.files["video"]
+    assert form.fields == {"title": "hello"}
+    assert staged.path == tmp_path / "clip.mp4"
+    assert staged.path.read_bytes() == content
+    assert (staged.size, staged.sha256) == (len(content), hashlib.sha256(content).hexdigest())
+
+
+def test_declared_length_over_the_limit_is_rejected_unread(tmp_path):
+    error, chunks = _ingest(tmp_path, _multipart(), headers={"content-length": str(10 * 1024 * 1024)})
+
+    assert error.status_code == 413
+    assert chunks == 0
+
+
+def test_oversized_file_is_cut_off_while_streaming(tmp_path, monkeypatch):
+    monkeypatch.setattr(form_ingest, "_FLUSH_BYTES", 200)
+    body = _multipart(files=[("video", "clip.mp4", "video/mp4", b"\x00" * 4096)])
+
+    error, chunks = _ingest(tmp_path, body)
+
+    assert (error.status_code, error.detail) == (413, "Video exceeds size limit.")
+    assert chunks < len(body) // 100
+
+
+@pytest.mark.parametrize("body, headers, status", [
+    (_multipart(files=[("video", "clip.gif", "image/gif", b"GIF")]), None, 400),
+    (_multipart(files=[("other", "clip.mp4", "video/mp4", b"\x00")]), None, 400),
+    (b"{}", {"content-type": "application/json"}, 415),
+])
+def test_unexpected_parts_are_rejected(tmp_path, body, headers, status):
+    error, _ = _ingest(tmp_path, body, headers)
+
+    assert isinstance(error, IngestError)
+    assert error.status_code == status
+
+
+def test_files_are_written_off_the_event_loop(tmp_path, monkeypatch):
+    writers = []
+    on_part_data = form_ingest._FormWriter.on_part_data
+
+    def recording(self, data, start, end):
+        writers.append(threading.current_thread())
+        on_part_data(self, data, start, end)
+
+    monkeypatch.setattr(form_ingest._FormWriter, "on_part_data", recording)
+    monkeypatch.setattr(form_ingest, "_FLUSH_BYTES", 200)
+    content = b"\x00" * 800
+
+    form, _ = _ingest(tmp_path, _multipart(files=[("video", "clip.mp4", "video/mp4", content)]))
+
+    assert form.files["video"].path.read_bytes() == content
+    assert writers and threading.main_thread() not in writers
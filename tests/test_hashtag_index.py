@@ -0,0 +1,49 @@
+from tiktok_uploader.hashtag_index import HashtagIndex, extract_hashtags, parse_suggestions
+from tiktok_uploader.http_transport import create_session
+
+
+def test_prefix_search_ranks_used_tags_first(tmp_path):
+    index = HashtagIndex(tmp_path / "hashtags.json")
+    index.add_suggestions("foo", [{"name": "football", "views": 900}, {"name": "food", "views": 100}, {"name": "fox", "views": 5}])
+    index.record_caption("match day #Football #foodie #bar")
+
+    assert index.search("#fo") == ["football", "foodie", "food", "fox"]
+    assert index.search("FOO", limit=2) == ["football", "foodie"]
+    assert index.search("zzz") == []
+
+
+def test_index_is_persisted(tmp_path):
+    path = tmp_path / "hashtags.json"
+    index = HashtagIndex(path)
+    index.add_suggestions("cat", [{"name": "cats", "views": 10}])
+    index.save()
+
+    reloaded = HashtagIndex(path)
+    assert reloaded.search("ca") == ["cats"]
+    assert reloaded.is_known("#Cat")
+    assert reloaded.top_suggestion("cat") == "cats"
+    assert not HashtagIndex(path, ttl_seconds=-1).is_known("cat")
+
+
+def test_only_unseen_keywords_are_fetched(tmp_path, mock_tiktok):
+    index = HashtagIndex(tmp_path / "hashtags.json")
+    session = create_session()
+
+    def lookups():
+        return mock_tiktok.stats.snapshot()["requests"].get("challenge_sug", 0)
+
+    before = lookups()
+    assert index.fetch(session, ["travel", "#Travel", "food"]) == set()
+    assert index.fetch(session, ["food"]) == set()
+
+    assert lookups() - before == 2
+    assert index.search("trav") == ["travel"]
+
+
+def test_parsing_helpers():
+    assert extract_hashtags("#one two #three @four") == ["one", "three"]
+    assert parse_suggestions({"sug_list": [{"cha_name": "a", "view_count": "12"}, {"cha_name": ""}, "junk", {"cha_name": "b", "view_count": None}]}) == [
+        {"name": "a", "views": 12},
+        {"name": "b", "views": 0},
+    ]
+    assert parse_suggestions([]) == []
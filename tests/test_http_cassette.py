@@ -0,0 +1,51 @@
+import json
+
+import requests
+
+from tiktok_uploader.http_cassette import REDACTED, Cassette, RecordingHTTPAdapter, ReplayHTTPAdapter, match_key
+
+
+def test_recorded_secrets_are_redacted(tmp_path):
+    cassette = Cassette(str(tmp_path / "cassette.jsonl"))
+    cassette.record(
+        "GET", "https://www.tiktok.com/api/v1/web/project/create/?msToken=secret-token&aid=1988",
+        [("Cookie", "sessionid=secret-session"), ("X-Bogus", "secret-bogus")], None,
+        200, [("Content-Type", "application/json"), ("Set-Cookie", "msToken=secret-token; Path=/")],
+        json.dumps({"data": {"session_token": "secret-credential", "region": "us"}}).encode("utf-8"), 0.01,
+    )
+
+    text = (tmp_path / "cassette.jsonl").read_text()
+    entry = json.loads(text)
+
+    assert "secret" not in text
+    assert entry["response_body"]["json"] == {"data": {"session_token": REDACTED, "region": "us"}}
+    assert ["Set-Cookie", f"msToken={REDACTED}; Path=/"] in entry["response_headers"]
+    assert not any(name == "Cookie" for name, _ in entry["request_headers"])
+
+
+def test_part_transfers_match_by_phase_only():
+    first = match_key("post", "https://upload-a.example/store/1?phase=transfer&part_number=1")
+    second = match_key("POST", "https://upload-b.example/store/2?phase=transfer&part_number=2")
+
+    assert first == second == "POST <upload> phase=transfer"
+
+
+def test_replay_returns_the_recording_with_the_sent_crc(tmp_path, mock_tiktok):
+    cassette_path = str(tmp_path / "cassette.jsonl")
+    recorder = requests.Session()
+    recorder.mount("http://", RecordingHTTPAdapter(Cassette(cassette_path), requests.adapters.HTTPAdapter()))
+    recorded = recorder.get(f"{mock_tiktok.base_url}/api/v1/web/project/create/").json()
+
+    cassette = Cassette(cassette_path)
+    cassette.record("POST", "https://upload.example/store?phase=transfer", [("Content-Crc32", "0badc0de")], b"part", 200, [("Content-Type", "application/json")], b'{"data": {"crc32": "0badc0de"}}', 0.01)
+    replayer = requests.Session()
+    replayer.mount("http://", ReplayHTTPAdapter(Cassette(cassette_path), speed=0))
+    replayer.mount("https://", ReplayHTTPAdapter(Cassette(cassette_path), speed=0))
+    before = mock_tiktok.stats.snapshot()["requests"]
+
+    replayed = replayer.get(f"{mock_tiktok.base_url}/api/v1/web/project/create/").json()
+    part = replayer.post("https://upload.example/store?phase=transfer", data=b"other", headers={"Content-Crc32": "feedface"}).json()
+
+    assert replayed == recorded
+    assert part == {"data": {"crc32": "feedface"}}
+    assert mock_tiktok.stats.snapshot()["requests"] == before
@@ -0,0 +1,39 @@
+from tiktok_uploader.http_transport import _redirect_url, create_session, record_api_status, transport_stats
+
+
+def test_redirect_keeps_path_and_query():
+    assert _redirect_url("https://www.tiktok.com/api/v1/x?a=1", "http://127.0.0.1:8901") == "http://127.0.0.1:8901/api/v1/x?a=1"
+
+
+def test_sessions_share_pooled_connections(mock_tiktok):
+    before = transport_stats()
+    for _ in range(3):
+        session = create_session()
+        assert session.get("https://www.tiktok.com/").status_code == 200
+        session.close()
+    after = transport_stats()
+    assert after["requests"] - before["requests"] == 3
+    assert after["connections_opened"] - before["connections_opened"] <= 1
+
+
+class _Reply:
+    def __init__(self, payload):
+        self.payload = payload
+
+    def json(self):
+        if isinstance(self.payload, Exception):
+            raise self.payload
+        return self.payload
+
+
+def test_tiktok_status_codes_in_json_replies_are_counted():
+    def publish_errors():
+        return transport_stats()["api_errors"].get("publish", {}).get("2009", 0)
+
+    before = publish_errors()
+    record_api_status("publish", _Reply({"status_code": 2009, "status_msg": "posting too fast"}))
+    record_api_status("publish", _Reply({"status_code": 0}))
+    record_api_status("publish", _Reply(ValueError("not JSON")))
+    record_api_status("publish", _Reply(["not", "an", "object"]))
+
+    assert publish_errors() - before == 1
@@ -0,0 +1,205 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from tiktok_uploader.job_queue import DONE, FAILED, QUEUED, AsyncJobWorkerPool, JobQueue, _Execution, run_upload_job
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return JobQueue(tmp_path / "jobs.sqlite3")
+
+
+def _payload(**fields):
+    return dict({"session_file": "tiktok_session-test", "video": "clip.mp4", "title": "queued upload"}, **fields)
+
+
+def test_scheduled_job_keeps_the_minimum_lead_time(queue, monkeypatch):
+    from tiktok_uploader import tiktok
+
+    seen = {}
+
+    def upload_video(session_file, video, title, **kwargs):
+        seen.update(kwargs)
+        return tiktok._validate_upload_params(title, kwargs["schedule_time"], 0) is None
+
+    monkeypatch.setattr(tiktok, "upload_video", upload_video)
+    queue.submit(_payload(schedule_time=900), "test")
+
+    # The job only starts a few seconds after it was submitted.
+    submitted = time.time()
+    monkeypatch.setattr(time, "time", lambda: submitted + 5)
+    job = queue.claim("worker")
+    execution = _Execution(queue, job, "worker", None)
+    ok = run_upload_job(job, execution.trace, execution.report)
+
+    assert execution.finish(ok, None) == DONE
+    assert seen["schedule_time"] == 900
+
+
+def _run(queue, runner):
+    job = queue.claim("worker")
+    execution = _Execution(queue, job, "worker", None)
+    try:
+        ok, error = runner(execution.trace), None
+    except Exception as exc:
+        ok, error = False, exc
+    return execution.finish(ok, error), queue.get(job.id)
+
+
+def test_exception_before_publish_is_retried(queue):
+    queue.submit(_payload(), "test")
+
+    def runner(trace):
+        trace.begin("transfer")
+        raise ConnectionError("connection reset")
+
+    state, job = _run(queue, runner)
+
+    assert state == QUEUED
+    assert job.error == "connection reset"
+
+
+def test_exception_after_publish_was_sent_is_not_retried(queue):
+    queue.submit(_payload(), "test")
+
+    def runner(trace):
+        trace.begin("publish")
+        raise ConnectionError("connection reset")
+
+    state, job = _run(queue, runner)
+
+    assert state == FAILED
+    assert job.attempts == 1
+    assert "check TikTok before retrying" in job.error
+
+
+def test_async_pool_writes_progress_off_the_event_loop(queue, monkeypatch):
+    writers = []
+    update = queue.update
+
+    def recording_update(*args, **kwargs):
+        writers.append(threading.current_thread())
+        update(*args, **kwargs)
+
+    monkeypatch.setattr(queue, "update", recording_update)
+
+    async def runner(job, trace, report):
+        trace.begin("transfer")
+        report("halfway there")
+        trace.begin("publish")
+        return True
+
+    async def main():
+        pool = AsyncJobWorkerPool(queue, workers=1, runner=runner).start()
+        job_id = queue.submit(_payload(), "test")
+        pool.notify()
+        try:
+            return await asyncio.wait_for(pool.wait(job_id, poll_seconds=0.05), 10)
+        finally:
+            await pool.stop()
+
+    job = asyncio.run(main())
+
+    assert job.state == DONE
+    assert job.message == "halfway there"
+    assert len(writers) == 3
+    assert threading.main_thread() not in writers
+
+
+def test_submit_unless_known_returns_the_job_of_a_known_key(queue):
+    job, created = queue.submit_unless_known(_payload(), "api", ["sha256:abc"], max_age=60)
+    again, created_again = queue.submit_unless_known(_payload(), "api", ["sha256:abc", "key:retry-1"], max_age=60)
+
+    assert created and not created_again
+    assert again.id == job.id
+    assert queue.find_by_key("key:retry-1", max_age=60).id == job.id
+    assert queue.depth() == 1
+
+
+def test_submit_unless_known_queues_again_after_the_job_failed(queue):
+    job, _ = queue.submit_unless_known(_payload(), "api", ["sha256:abc"], max_age=60)
+    queue.claim("worker")
+    queue.fail(job.id, "worker", "rejected")
+
+    retry, created = queue.submit_unless_known(_payload(), "api", ["sha256:abc"], max_age=60)
+
+    assert created
+    assert retry.id != job.id
+
+
+def test_urgent_jobs_are_claimed_first(queue):
+    background = queue.submit(_payload(), "test", priority="background")
+    normal = queue.submit(_payload(), "test")
+    high = queue.submit(_payload(), "test", priority="high")
+
+    assert [queue.claim("worker").id for _ in range(3)] == [high, normal, background]
+    assert queue.claim("worker") is None
+
+
+def test_expired_lease_is_queued_again_until_attempts_run_out(queue):
+    job_id = queue.submit(_payload(), "test", max_attempts=2)
+    assert queue.claim("crashed", lease_seconds=-1).id == job_id
+
+    retried = queue.claim("worker", lease_seconds=-1)
+    assert (retried.id, retried.attempts) == (job_id, 2)
+    assert not queue.renew(job_id, "crashed")
+
+    assert queue.claim("worker") is None
+    job = queue.get(job_id)
+    assert (job.state, job.error) == (FAILED, "worker lease expired")
+
+
+def test_renewed_lease_keeps_the_job(queue):
+    job_id = queue.submit(_payload(), "test")
+    queue.claim("worker", lease_seconds=-1)
+
+    assert queue.renew(job_id, "worker")
+    assert queue.claim("other") is None
+
+
+def test_retried_job_waits_for_its_backoff(queue, monkeypatch):
+    from tiktok_uploader import job_queue
+
+    monkeypatch.setattr(job_queue, "JOB_RETRY_BASE_DELAY_SECONDS", 60)
+    job_id = queue.submit(_payload(), "test", max_attempts=2)
+    queue.claim("worker")
+
+    assert queue.fail(job_id, "worker", "connection reset", retry=True) == QUEUED
+    assert queue.claim("worker") is None
+
+    later = time.time() + 61
+    monkeypatch.setattr(time, "time", lambda: later)
+    queue.claim("worker")
+    assert queue.fail(job_id, "worker", "connection reset", retry=True) == FAILED
+
+
+def test_permanent_error_is_not_retried(queue):
+    queue.submit(_payload(), "test")
+
+    def runner(trace):
+        raise RuntimeError("Session cookie has no sessionid")
+
+    state, job = _run(queue, runner)
+
+    assert state == FAILED
+    assert job.attempts == 1
+    assert job.error == "Session cookie has no sessionid"
+
+
+def test_server_errors_are_retried(queue):
+    from tiktok_uploader.upload_transfer import UploadSessionRejected, UploadTransferError
+
+    queue.submit(_payload(), "test", max_attempts=5)
+    states = []
+    for error in (UploadTransferError("upload host failed", 503), UploadSessionRejected("session expired", 403)):
+        queue._connect().execute("UPDATE jobs SET not_before = 0")
+
+        def runner(trace):
+            raise error
+
+        states.append(_run(queue, runner)[0])
+
+    assert states == [QUEUED, FAILED]
@@ -0,0 +1,55 @@
+import asyncio
+import json
+
+import httpx
+
+from tiktok_uploader.http_transport import create_async_client, create_session
+from tiktok_uploader.mention_resolver import MentionResolver
+
+
+def _profile_lookups(server):
+    return server.stats.snapshot()["requests"].get("profile", 0)
+
+
+def test_mentions_are_resolved_once_and_cached(tmp_path, mock_tiktok):
+    path = tmp_path / "mentions.json"
+    resolver = MentionResolver(path)
+    session = create_session()
+    before = _profile_lookups(mock_tiktok)
+
+    first = resolver.resolve(session, ["alice", "bob", "alice"])
+    again = MentionResolver(path).resolve(session, ["Alice", "bob"])
+
+    assert set(first) == {"alice", "bob"}
+    assert again == {"Alice": first["alice"], "bob": first["bob"]}
+    assert _profile_lookups(mock_tiktok) - before == 2
+    assert set(json.loads(path.read_text())) == {"alice", "bob"}
+
+
+def test_expired_entries_are_looked_up_again(tmp_path, mock_tiktok):
+    path = tmp_path / "mentions.json"
+    session = create_session()
+    MentionResolver(path).resolve(session, ["alice"])
+    before = _profile_lookups(mock_tiktok)
+
+    MentionResolver(path, ttl_seconds=-1).resolve(session, ["alice"])
+
+    assert _profile_lookups(mock_tiktok) - before == 1
+
+
+def test_async_resolution_matches_the_sync_one(tmp_path, mock_tiktok):
+    expected = MentionResolver(tmp_path / "sync.json").resolve(create_session(), ["alice", "bob"])
+
+    async def resolve():
+        async with create_async_client() as client:
+            return await MentionResolver(tmp_path / "async.json").resolve_async(client, ["alice", "bob"], network_errors=(httpx.HTTPError,))
+
+    assert asyncio.run(resolve()) == expected
+
+
+def test_unresolvable_names_are_left_out(tmp_path):
+    class Unreachable:
+        def get(self, url, headers=None):
+            raise ConnectionError("offline")
+
+    assert MentionResolver(tmp_path / "mentions.json").resolve(Unreachable(), ["alice"]) == {}
@@ -0,0 +1,52 @@
+import math
+
+from tiktok_uploader.metrics import Registry, _format_value
+
+
+def test_values_use_the_prometheus_text_format():
+    assert _format_value(3.0) == "3"
+    assert _format_value(0.25) == "0.25"
+    assert _format_value(math.inf) == "+Inf"
+    assert _format_value(-math.inf) == "-Inf"
+    assert _format_value(math.nan) == "NaN"
+
+
+def test_exposition_of_counters_and_labels():
+    registry = Registry()
+    errors = registry.counter("errors_total", "Errors.", ("step", "status_code"))
+    errors.inc("publish", "2009")
+    errors.inc("publish", "2009")
+    errors.set(math.nan, "sign", 'quote"d')
+
+    assert registry.expose().splitlines() == [
+        "# HELP errors_total Errors.",
+        "# TYPE errors_total counter",
+        'errors_total{step="publish",status_code="2009"} 2',
+        'errors_total{step="sign",status_code="quote\\"d"} NaN',
+    ]
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = Registry()
+    latency = registry.histogram("latency_seconds", "Latency.", buckets=(0.1, 1.0))
+    latency.observe(0.05)
+    latency.observe(0.5)
+    latency.observe(5)
+
+    lines = registry.expose().splitlines()[2:]
+
+    assert lines == [
+        'latency_seconds_bucket{le="0.1"} 1',
+        'latency_seconds_bucket{le="1"} 2',
+        'latency_seconds_bucket{le="+Inf"} 3',
+        "latency_seconds_sum 5.55",
+        "latency_seconds_count 3",
+    ]
+
+
+def test_collectors_run_before_exposition():
+    registry = Registry()
+    depth = registry.gauge("depth", "Queue depth.")
+    registry.on_collect(lambda: depth.set(7))
+
+    assert "depth 7" in registry.expose()
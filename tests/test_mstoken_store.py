@@ -0,0 +1,40 @@
+import json
+import os
+
+from tiktok_uploader.cookies import MsTokenStore
+
+
+def test_token_round_trip(tmp_path):
+    store = MsTokenStore(str(tmp_path / "account.mstoken"))
+    assert store.load() is None
+
+    store.save("token-1")
+    assert store.load() == "token-1"
+
+    store.clear()
+    store.clear()
+    assert store.load() is None
+
+
+def test_expired_or_unreadable_tokens_are_ignored(tmp_path):
+    path = tmp_path / "account.mstoken"
+    store = MsTokenStore(str(path), ttl_seconds=60)
+
+    path.write_text(json.dumps({"msToken": "old", "saved_at": 0}))
+    assert store.load() is None
+    path.write_text("[]")
+    assert store.load() is None
+    path.write_text("{")
+    assert store.load() is None
+
+
+def test_session_files_outside_the_cookies_dir_use_the_state_dir(state_dir, tmp_path):
+    session_file = str(tmp_path / "upload" / "session.cookie")
+
+    store = MsTokenStore.for_session(session_file, "session-id")
+    other = MsTokenStore.for_session(session_file, "other-session-id")
+
+    assert os.path.dirname(store.path) == str(state_dir / "mstokens")
+    assert store.path != other.path
+    store.save("token")
+    assert MsTokenStore.for_session(str(tmp_path / "copy.cookie"), "session-id").load() == "token"
@@ -0,0 +1,82 @@
+import os
+import time
+
+from tiktok_uploader.render_cache import RenderCache
+
+
+def _render(cache, key, size):
+    staged = cache.staging_path(key)
+    staged.write_bytes(b"v" * size)
+    return cache.commit(key, staged)
+
+
+def _age(path, seconds):
+    past = time.time() - seconds
+    os.utime(path, (past, past))
+
+
+def test_least_recently_used_renders_are_evicted(tmp_path):
+    cache = RenderCache(tmp_path, max_bytes=250)
+    first = _render(cache, "first", 100)
+    second = _render(cache, "second", 100)
+    _age(first, 20)
+    _age(second, 10)
+    assert cache.get("first") == first
+
+    _render(cache, "third", 100)
+
+    assert cache.get("second") is None
+    assert cache.get("first") == first
+    assert cache.get("third") is not None
+
+
+def test_renders_in_progress_count_towards_the_limit(tmp_path):
+    cache = RenderCache(tmp_path, max_bytes=250)
+    first = _render(cache, "first", 100)
+    _age(first, 10)
+    running = cache.staging_path("running")
+    running.write_bytes(b"v" * 100)
+
+    _render(cache, "second", 100)
+
+    assert cache.get("first") is None
+    assert running.exists()
+
+
+def test_stale_staging_files_are_removed(tmp_path):
+    cache = RenderCache(tmp_path, max_bytes=1000, stale_part_seconds=60)
+    abandoned = cache.staging_path("crashed")
+    abandoned.write_bytes(b"v" * 100)
+    _age(abandoned, 120)
+    running = cache.staging_path("running")
+    running.write_bytes(b"v" * 100)
+
+    _render(cache, "done", 100)
+
+    assert not abandoned.exists()
+    assert running.exists()
+
+
+def test_leftovers_are_cleared_on_startup(tmp_path):
+    abandoned = tmp_path / "crashed.0123.part"
+    abandoned.write_bytes(b"v")
+    _age(abandoned, 120)
+
+    RenderCache(tmp_path, stale_part_seconds=60)
+
+    assert not abandoned.exists()
+
+
+def test_stale_staged_inputs_are_removed(tmp_path):
+    cache = RenderCache(tmp_path / "cache", max_bytes=1000, stale_part_seconds=60)
+    image = tmp_path / "still.png"
+    image.write_bytes(b"\x89PNG")
+    abandoned = cache.stage_input("crashed", image)
+    _age(abandoned, 120)
+    running = cache.stage_input("running", image)
+
+    _render(cache, "done", 100)
+
+    assert running.suffix == ".png" and running.read_bytes() == b"\x89PNG"
+    assert not abandoned.exists()
+    assert running.exists()
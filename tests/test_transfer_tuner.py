@@ -0,0 +1,64 @@
+from tiktok_uploader.transfer_tuner import (
+    MAX_CONCURRENCY,
+    MIN_CHUNK_SIZE,
+    MIN_CONCURRENCY,
+    TransferSettings,
+    TransferTuner,
+)
+from tiktok_uploader.upload_transfer import PartResult, UploadSessionRejected, UploadTransferError
+
+_MIB = 1024 * 1024
+
+
+def _parts(count, size=4 * _MIB, attempts=1):
+    return [PartResult(number, size, "00000000", attempts, 0.1) for number in range(1, count + 1)]
+
+
+def test_unknown_host_gets_defaults(tmp_path):
+    tuner = TransferTuner(tmp_path / "tuning.json")
+    assert tuner.settings_for("host") == TransferSettings().clamped()
+
+
+def test_clean_transfers_grow_additively(tmp_path):
+    tuner = TransferTuner(tmp_path / "tuning.json")
+    settings = TransferSettings(4 * _MIB, 4)
+    grown = tuner.record("host", settings, _parts(10), elapsed=1.0)
+    assert grown == TransferSettings(5 * _MIB, 5)
+    assert tuner.settings_for("host") == grown
+    assert tuner.settings_for("other") == TransferSettings().clamped()
+
+
+def test_retries_and_failures_halve(tmp_path):
+    tuner = TransferTuner(tmp_path / "tuning.json")
+    settings = TransferSettings(8 * _MIB, 8)
+    assert tuner.record("host", settings, _parts(10, attempts=2), elapsed=1.0) == TransferSettings(4 * _MIB, 4)
+    assert tuner.record("host", settings, [], elapsed=1.0, failed=True) == TransferSettings(4 * _MIB, 4)
+
+
+def test_rejected_session_keeps_the_settings(tmp_path):
+    tuner = TransferTuner(tmp_path / "tuning.json")
+    settings = TransferSettings(8 * _MIB, 8)
+
+    assert tuner.record("host", settings, _parts(2), elapsed=1.0, failed=True, error=UploadSessionRejected("session expired", 404)) == settings
+    assert tuner.record("host", settings, [], elapsed=1.0, failed=True, error=UploadTransferError("forbidden", 403)) == settings
+    assert tuner.record("host", settings, [], elapsed=1.0, failed=True, error=UploadTransferError("server error", 500)) == TransferSettings(4 * _MIB, 4)
+
+
+def test_slower_transfer_stops_growth(tmp_path):
+    tuner = TransferTuner(tmp_path / "tuning.json")
+    settings = TransferSettings(4 * _MIB, 4)
+    tuner.record("host", settings, _parts(10), elapsed=1.0)
+    assert tuner.record("host", settings, _parts(10), elapsed=4.0) == TransferSettings(4 * _MIB, 3)
+
+
+def test_settings_stay_within_bounds(tmp_path):
+    tuner = TransferTuner(tmp_path / "tuning.json")
+    shrunk = tuner.record("host", TransferSettings(MIN_CHUNK_SIZE, MIN_CONCURRENCY), [], elapsed=1.0, failed=True)
+    assert shrunk == TransferSettings(MIN_CHUNK_SIZE, MIN_CONCURRENCY)
+    assert TransferSettings(3 * _MIB + 1, MAX_CONCURRENCY + 5).clamped() == TransferSettings(3 * _MIB, MAX_CONCURRENCY)
+
+
+def test_settings_are_remembered_across_processes(tmp_path):
+    path = tmp_path / "tuning.json"
+    grown = TransferTuner(path).record("host", TransferSettings(4 * _MIB, 4), _parts(10), elapsed=1.0)
+    assert TransferTuner(path).settings_for("host") == grown
@@ -0,0 +1,61 @@
+import json
+
+import pytest
+
+from tiktok_uploader import upload_auth
+from tiktok_uploader.upload_auth import UploadCredentialCache, is_auth_failure
+
+
+_CREDENTIALS = {"access_key_id": "AK", "secret_acess_key": "SK", "session_token": "ST"}
+
+
+@pytest.fixture
+def now(monkeypatch):
+    clock = {"now": 1_700_000_000.0}
+    monkeypatch.setattr(upload_auth.time, "time", lambda: clock["now"])
+    return clock
+
+
+def test_credentials_are_reused_until_the_ttl(now):
+    cache = UploadCredentialCache(ttl_seconds=600)
+    cache.put("session", _CREDENTIALS)
+
+    assert cache.get("session") is _CREDENTIALS
+    assert cache.get("other") is None
+    # Handed out until shortly before they expire, so running uploads can finish.
+    now["now"] += 600 - 61
+    assert cache.get("session") is _CREDENTIALS
+    now["now"] += 2
+    assert cache.get("session") is None
+
+
+def test_expiry_from_tiktok_wins_when_it_is_sooner(now):
+    cache = UploadCredentialCache(ttl_seconds=600)
+    cache.put("session", dict(_CREDENTIALS, expired_time=int((now["now"] + 120) * 1000)))
+
+    now["now"] += 59
+    assert cache.get("session") is not None
+    now["now"] += 2
+    assert cache.get("session") is None
+
+
+def test_invalidate_and_missing_sessions(now):
+    cache = UploadCredentialCache()
+    cache.put(None, _CREDENTIALS)
+    cache.put("session", _CREDENTIALS)
+    cache.invalidate("session")
+
+    assert cache.get("session") is None
+    assert cache.get(None) is None
+
+
+@pytest.mark.parametrize("status_code, body, expected", [
+    (403, b"", True),
+    (401, b"anything", True),
+    (400, json.dumps({"ResponseMetadata": {"Error": {"Code": "SignatureDoesNotMatch"}}}).encode(), True),
+    (400, json.dumps({"ResponseMetadata": {"Error": {"Code": "InvalidParameter"}}}).encode(), False),
+    (200, b"[]", False),
+    (500, b"<html>", False),
+])
+def test_auth_failures_are_recognised(status_code, body, expected):
+    assert is_auth_failure(status_code, body) is expected
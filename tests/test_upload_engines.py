@@ -0,0 +1,97 @@
+import asyncio
+import json
+
+import pytest
+
+from tiktok_uploader import mention_resolver, tiktok, upload_auth
+from tiktok_uploader.cookies import save_cookies_to_file
+from tiktok_uploader.mention_resolver import MentionResolver
+from tiktok_uploader.tiktok_async import upload_video_async
+from tiktok_uploader.upload_trace import UploadTrace
+from tiktok_uploader.upload_transfer import DEFAULT_CHUNK_SIZE
+
+
+_MOCK_SIGNATURE = json.dumps({"data": {"x-bogus": "mock-x-bogus", "signature": "mock-signature"}})
+_TITLE = "parity check #mock @alice @bob"
+
+
+@pytest.fixture
+def offline_upload(state_dir, mock_tiktok, tmp_path, monkeypatch):
+    """Run one upload with either engine against the mock server; returns (ok, requests, phases)."""
+    monkeypatch.setattr(tiktok, "prepare_video_for_upload", lambda video_path: video_path)
+    monkeypatch.setattr(tiktok, "subprocess_jsvmp", lambda js, user_agent, url: _MOCK_SIGNATURE)
+    monkeypatch.setattr(upload_auth, "_cache", upload_auth.UploadCredentialCache())
+    video = tmp_path / "clip.mp4"
+    video.write_bytes(b"\x00" * (2 * DEFAULT_CHUNK_SIZE + 17))
+
+    def run(engine):
+        # A session (and mention cache) per engine, so neither reuses what the other cached.
+        cookies = [
+            {"name": "sessionid", "value": f"parity-{engine}", "domain": ".tiktok.com"},
+            {"name": "tt-target-idc", "value": "useast2a", "domain": ".tiktok.com"},
+        ]
+        save_cookies_to_file(cookies, f"tiktok_session-{engine}", cookies_path=str(tmp_path))
+        session_file = str(tmp_path / f"tiktok_session-{engine}.cookie")
+        monkeypatch.setattr(mention_resolver, "_resolver", MentionResolver(path=tmp_path / f"mentions-{engine}.json"))
+
+        trace = UploadTrace(str(video), trace_file="")
+        options = {"status_callback": lambda message: None, "adaptive_transfer": False, "transfer_concurrency": 2, "trace": trace}
+        before = mock_tiktok.stats.snapshot()["requests"]
+        if engine == "async":
+            ok = asyncio.run(upload_video_async(session_file, str(video), _TITLE, **options))
+        else:
+            ok = tiktok.upload_video(session_file, str(video), _TITLE, **options)
+        after = mock_tiktok.stats.snapshot()["requests"]
+        requests = {endpoint: count - before.get(endpoint, 0) for endpoint, count in after.items() if count != before.get(endpoint, 0)}
+        return ok, requests, sorted({span["name"] for span in trace.phases})
+
+    return run
+
+
+def test_engines_send_the_same_requests(offline_upload):
+    sync = offline_upload("sync")
+    async_ = offline_upload("async")
+
+    assert sync[0] is True
+    assert async_ == sync
+    assert sync[1]["part_transfer"] == 3
+    assert sync[1]["profile"] == 2
+    assert sync[1]["project_post"] == 1
+
+
+def test_engines_look_up_mentions_when_the_resolver_fails(offline_upload, monkeypatch):
+    def broken(*args, **kwargs):
+        raise RuntimeError("resolver down")
+
+    async def broken_async(*args, **kwargs):
+        raise RuntimeError("resolver down")
+
+    monkeypatch.setattr(MentionResolver, "resolve", broken)
+    monkeypatch.setattr(MentionResolver, "resolve_async", broken_async)
+
+    sync = offline_upload("sync")
+    async_ = offline_upload("async")
+
+    assert sync[0] is True
+    assert async_ == sync
+    assert sync[1]["profile"] == 2
+
+
+@pytest.mark.parametrize("engine", ["sync", "async"])
+def test_second_upload_reuses_the_upload_credentials(offline_upload, engine):
+    first = offline_upload(engine)
+    second = offline_upload(engine)
+
+    assert first[0] is True and second[0] is True
+    assert first[1]["upload_auth"] == 1
+    assert "upload_auth" not in second[1]
+
+
+def test_pipelining_is_off_unless_configured(state_dir, monkeypatch):
+    monkeypatch.delenv("TIKTOK_UPLOAD_PIPELINED", raising=False)
+    assert not tiktok._pipelined_preupload()
+    assert tiktok._pipelined_preupload(True)
+
+    monkeypatch.setenv("TIKTOK_UPLOAD_PIPELINED", "1")
+    assert tiktok._pipelined_preupload()
+    assert not tiktok._pipelined_preupload(False)
@@ -0,0 +1,84 @@
+import json
+import time
+
+from tiktok_uploader.upload_journal import TransferJournal, journaled_videos, prune_expired_journals
+
+
+def _processed(tmp_path, size=100):
+    sanitized = tmp_path / "sanitized"
+    sanitized.mkdir(exist_ok=True)
+    path = sanitized / "video.mp4"
+    path.write_bytes(b"x" * size)
+    return path
+
+
+def _start(state_dir, tmp_path):
+    journal = TransferJournal.for_upload("session", str(tmp_path / "source.mp4"))
+    journal.start(str(_processed(tmp_path)), "creation", "project")
+    journal.record_upload_session(upload_id="upload", store_uri="tos://store")
+    return journal
+
+
+def test_journal_survives_a_restart(state_dir, tmp_path):
+    journal = _start(state_dir, tmp_path)
+    journal.confirm_part(1, "0000abcd")
+    journal.confirm_part(3, "1234abcd")
+
+    reloaded = TransferJournal.for_upload("session", str(tmp_path / "source.mp4"))
+    assert reloaded.path == journal.path
+    assert reloaded.is_resumable()
+    assert reloaded.confirmed_parts == {1: "0000abcd", 3: "1234abcd"}
+    assert reloaded.get("project_id") == "project"
+
+
+def test_journal_is_not_resumable_when_the_processed_video_changed(state_dir, tmp_path):
+    journal = _start(state_dir, tmp_path)
+    _processed(tmp_path, size=50)
+    assert not TransferJournal(journal.path).is_resumable()
+    assert not TransferJournal(journal.path, ttl_seconds=-1).is_resumable()
+
+
+def test_journals_are_keyed_by_account_and_source(state_dir, tmp_path):
+    journal = _start(state_dir, tmp_path)
+    assert TransferJournal.for_upload("other", str(tmp_path / "source.mp4")).path != journal.path
+    assert TransferJournal.for_upload("session", str(tmp_path / "source.mp4"), resume_key="job").path != journal.path
+
+
+def test_discard_removes_the_journal(state_dir, tmp_path):
+    journal = _start(state_dir, tmp_path)
+    journal.discard()
+    assert not journal.path.exists()
+    assert not TransferJournal(journal.path).has_upload_session
+
+
+def test_prune_removes_expired_journals_and_their_videos(state_dir, tmp_path):
+    journal = _start(state_dir, tmp_path)
+    data = json.loads(journal.path.read_text())
+    data["created_at"] = time.time() - 7200
+    journal.path.write_text(json.dumps(data))
+
+    prune_expired_journals(ttl_seconds=3600)
+    assert not journal.path.exists()
+    assert not (tmp_path / "sanitized" / "video.mp4").exists()
+
+
+def test_prune_keeps_fresh_journals_and_drops_unreadable_ones(state_dir, tmp_path):
+    journal = _start(state_dir, tmp_path)
+    directory = journal.path.parent
+    (directory / "list.json").write_text("[]")
+    (directory / "null.json").write_text("null")
+    (directory / "broken.json").write_text("{")
+
+    prune_expired_journals(ttl_seconds=3600)
+    assert journal.path.exists()
+    assert sorted(path.name for path in directory.glob("*.json")) == [journal.path.name]
+
+
+def test_journaled_videos_lists_the_videos_kept_for_resuming(state_dir, tmp_path):
+    journal = _start(state_dir, tmp_path)
+    (journal.path.parent / "broken.json").write_text("[]")
+
+    assert journaled_videos() == {str(tmp_path / "sanitized" / "video.mp4")}
+
+    journal.discard()
+    assert journaled_videos() == set()
@@ -0,0 +1,59 @@
+import json
+
+import pytest
+
+from tiktok_uploader.upload_trace import UploadTrace, traced_upload
+from tiktok_uploader.upload_transfer import PartResult
+
+
+def test_phases_and_parts_are_recorded():
+    trace = UploadTrace("clip.mp4", trace_file="")
+    with trace.phase("transfer"):
+        trace.record_part(PartResult(part_number=2, size=100, crc="b", attempts=2, elapsed=0.25))
+        trace.record_part(PartResult(part_number=1, size=50, crc="a", attempts=1, elapsed=0.125))
+    trace.begin("publish")
+    trace.end("publish", ok=False)
+    trace.set(upload_host="upload.example")
+
+    data = trace.to_dict()
+
+    assert [(span["name"], span["ok"]) for span in data["phases"]] == [("transfer", True), ("publish", False)]
+    assert [part["part_number"] for part in data["parts"]] == [1, 2]
+    assert data["parts"][1]["latency_ms"] == 250.0
+    assert data["bytes_sent"] == 250
+    assert data["part_retries"] == 1
+    assert data["upload_host"] == "upload.example"
+
+
+def test_a_phase_that_raises_is_marked_failed():
+    trace = UploadTrace(trace_file="")
+    with pytest.raises(RuntimeError):
+        with trace.phase("preprocess"):
+            raise RuntimeError("ffmpeg failed")
+
+    assert trace.phases[0]["ok"] is False
+
+
+def test_traced_upload_closes_open_phases_and_writes_the_trace(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    trace = UploadTrace(trace_file=str(path))
+
+    with pytest.raises(ConnectionError):
+        with traced_upload(trace, "clip.mp4") as active:
+            active.begin("transfer")
+            raise ConnectionError("reset")
+
+    record = json.loads(path.read_text())
+    assert record["video"] == "clip.mp4"
+    assert record["success"] is False
+    assert record["error"] == "reset"
+    assert record["phases"][0]["name"] == "transfer"
+    assert record["phases"][0]["ok"] is False
+
+
+def test_traced_upload_reports_the_stored_outcome(tmp_path):
+    with traced_upload(UploadTrace(trace_file=""), "clip.mp4") as trace:
+        trace.success = True
+
+    assert trace.success is True
+    assert trace.duration_ms is not None
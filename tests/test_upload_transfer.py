@@ -0,0 +1,165 @@
+import json
+import threading
+import time
+
+import pytest
+
+from tiktok_uploader import upload_transfer
+from tiktok_uploader.bot_utils import crc32
+from tiktok_uploader.upload_transfer import (
+    UploadSessionRejected,
+    UploadTransferError,
+    VideoChunkReader,
+    check_part_response,
+    transfer_parts,
+)
+
+
+def _video(tmp_path, size):
+    path = tmp_path / "video.mp4"
+    path.write_bytes(bytes(index % 251 for index in range(size)))
+    return path
+
+
+def test_reader_splits_file_into_parts(tmp_path):
+    path = _video(tmp_path, 2500)
+    with VideoChunkReader(path, chunk_size=1000) as reader:
+        assert reader.size == 2500
+        assert reader.part_count == 3
+        assert reader.part_bounds(2) == (2000, 2500)
+        parts = [(number, bytes(view)) for number, view in reader.iter_parts()]
+    assert [number for number, _ in parts] == [1, 2, 3]
+    assert b"".join(data for _, data in parts) == path.read_bytes()
+
+
+def test_reader_part_is_a_view_of_the_mapping(tmp_path):
+    path = _video(tmp_path, 10)
+    with VideoChunkReader(path, chunk_size=4) as reader:
+        view = reader.part(1)
+        assert isinstance(view, memoryview)
+        assert bytes(view) == path.read_bytes()[4:8]
+        view.release()
+        with pytest.raises(IndexError):
+            reader.part(3)
+
+
+def test_reader_empty_file_has_no_parts(tmp_path):
+    path = _video(tmp_path, 0)
+    with VideoChunkReader(path, chunk_size=4) as reader:
+        assert reader.part_count == 0
+        assert list(reader.iter_parts()) == []
+
+
+def test_reader_requires_open_and_positive_chunk_size(tmp_path):
+    path = _video(tmp_path, 10)
+    with pytest.raises(ValueError):
+        VideoChunkReader(path, chunk_size=0)
+    with pytest.raises(RuntimeError):
+        VideoChunkReader(path, chunk_size=4).part(0)
+
+
+class _Response:
+    def __init__(self, status_code=200, content=b""):
+        self.status_code = status_code
+        self.content = content
+
+
+def test_transfer_parts_bounds_parts_in_flight(tmp_path):
+    path = _video(tmp_path, 10 * 100)
+    lock = threading.Lock()
+    in_flight = []
+    peak = []
+    sent = []
+
+    def send_part(part_number, view, crc):
+        with lock:
+            in_flight.append(part_number)
+            peak.append(len(in_flight))
+        time.sleep(0.01)
+        with lock:
+            in_flight.remove(part_number)
+            sent.append(part_number)
+        return _Response()
+
+    with VideoChunkReader(path, chunk_size=100) as reader:
+        crcs = transfer_parts(reader, send_part, concurrency=3, completed={2: "cafebabe"})
+    data = path.read_bytes()
+    expected = [crc32(data[start:start + 100]) for start in range(0, len(data), 100)]
+    assert sorted(sent) == [1, 3, 4, 5, 6, 7, 8, 9, 10]
+    assert 1 < max(peak) <= 3
+    expected[1] = "cafebabe"
+    assert crcs == expected
+
+
+def test_check_part_response():
+    check_part_response(1, 200, b'{"code": 2000, "data": {"crc32": "ABCD"}}', "0000abcd")
+    check_part_response(1, 200, b"not json", "0000abcd")
+    with pytest.raises(UploadSessionRejected):
+        check_part_response(1, 403, b"", "0000abcd")
+    with pytest.raises(UploadTransferError):
+        check_part_response(1, 502, b"", "0000abcd")
+    with pytest.raises(UploadTransferError, match="code 4001"):
+        check_part_response(1, 200, b'{"code": 4001, "message": "bad part"}', "0000abcd")
+    with pytest.raises(UploadTransferError, match="CRC mismatch"):
+        check_part_response(1, 200, b'{"code": 2000, "data": {"crc32": "ffffffff"}}', "0000abcd")
+
+
+def test_transfer_parts_returns_crcs_in_part_order(tmp_path):
+    path = _video(tmp_path, 5 * 100)
+
+    def send_part(part_number, view, crc):
+        # Later parts finish first.
+        time.sleep(0.005 * (6 - part_number))
+        return _Response(content=json.dumps({"code": 2000, "data": {"crc32": crc}}).encode())
+
+    with VideoChunkReader(path, chunk_size=100) as reader:
+        crcs = transfer_parts(reader, send_part, concurrency=5)
+    data = path.read_bytes()
+    assert crcs == [crc32(data[start:start + 100]) for start in range(0, len(data), 100)]
+
+
+def test_transfer_parts_retries_a_failed_part(tmp_path, monkeypatch):
+    monkeypatch.setattr(upload_transfer, "backoff_delay", lambda attempt: 0)
+    path = _video(tmp_path, 3 * 100)
+    calls = []
+
+    def send_part(part_number, view, crc):
+        calls.append(part_number)
+        if part_number == 2 and calls.count(2) == 1:
+            return _Response(content=json.dumps({"code": 2000, "data": {"crc32": "deadbeef"}}).encode())
+        return _Response()
+
+    results = []
+    with VideoChunkReader(path, chunk_size=100) as reader:
+        transfer_parts(reader, send_part, concurrency=1, on_part_done=results.append)
+    assert calls == [1, 2, 2, 3]
+    assert [result.attempts for result in results] == [1, 2, 1]
+
+
+def test_transfer_parts_gives_up_after_retries(tmp_path, monkeypatch):
+    monkeypatch.setattr(upload_transfer, "backoff_delay", lambda attempt: 0)
+    path = _video(tmp_path, 100)
+    calls = []
+
+    def send_part(part_number, view, crc):
+        calls.append(part_number)
+        return _Response(status_code=500)
+
+    with VideoChunkReader(path, chunk_size=100) as reader:
+        with pytest.raises(UploadTransferError, match="after 3 attempts"):
+            transfer_parts(reader, send_part, retries=2)
+    assert len(calls) == 3
+
+
+def test_transfer_parts_does_not_retry_a_rejected_session(tmp_path):
+    path = _video(tmp_path, 100)
+    calls = []
+
+    def send_part(part_number, view, crc):
+        calls.append(part_number)
+        return _Response(status_code=401)
+
+    with VideoChunkReader(path, chunk_size=100) as reader:
+        with pytest.raises(UploadSessionRejected):
+            transfer_parts(reader, send_part, retries=3)
+    assert calls == [1]
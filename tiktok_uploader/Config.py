@@ -14,7 +14,11 @@ class Config:
         "TMP_YOUTUBE_VIDEO_DIR": "",
         "LANG": "en", 
         "TIKTOK_BASE_URL": "https://www.tiktok.com/upload?lang=", 
-        "IMAGEMAGICK_BINARY": ""
+        "IMAGEMAGICK_BINARY": "",
+        "STATE_DIR": "./StateDir",
+        "UPLOAD_BANDWIDTH_LIMIT": "",
+        "UPLOAD_BANDWIDTH_PER_UPLOAD": "",
+        "UPLOAD_PIPELINED": "0"
     }
 
     _EXCLUDE = ["#"]
@@ -129,3 +133,23 @@ class Config:
     def imagemagick_binary_path(self):
         """ImageMagick Binary path """
         return self.get_option_by_name("IMAGEMAGICK_BINARY")
+
+    @property
+    def state_dir(self):
+        """Directory for upload journals, caches and other runtime state"""
+        return self.get_option_by_name("STATE_DIR") or Config._DEFAULT_OPTIONS["STATE_DIR"]
+
+    @property
+    def upload_bandwidth_limit(self):
+        """Bytes per second shared by all uploads of the process, empty for unlimited"""
+        return self.get_option_by_name("UPLOAD_BANDWIDTH_LIMIT")
+
+    @property
+    def upload_bandwidth_per_upload(self):
+        """Bytes per second a single upload may use, empty for unlimited"""
+        return self.get_option_by_name("UPLOAD_BANDWIDTH_PER_UPLOAD")
+
+    @property
+    def upload_pipelined(self):
+        """1 to preprocess videos while the TikTok project is created (off by default)"""
+        return self.get_option_by_name("UPLOAD_PIPELINED")
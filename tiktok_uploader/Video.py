@@ -36,8 +36,32 @@ class Video:
         while not os.path.isfile(self.source_ref):
             time.sleep(1)
 
-        self.clip = VideoFileClip(self.source_ref)
+        self._clip = None
+        self._source_clip = None
 
+    @property
+    def clip(self):
+        # A VideoFileClip keeps an ffmpeg reader process open, so it is only
+        # started for the editing helpers and released again by close().
+        if self._clip is None:
+            self._clip = self._source_clip = VideoFileClip(self.source_ref)
+        return self._clip
+
+    @clip.setter
+    def clip(self, clip):
+        self._clip = clip
+
+    def close(self):
+        for clip in (self._clip, self._source_clip):
+            if clip is not None:
+                clip.close()
+        self._clip = self._source_clip = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
 
     def crop(self, start_time, end_time, saveFile=False):
         if end_time > self.clip.duration:
@@ -134,8 +158,13 @@ class Video:
                             return
                         self._report_status("Waiting for downloaded files to appear...")
 
-                    composite_video = VideoFileClip(downloaded_v_path).set_audio(AudioFileClip(downloaded_a_path))
-                    composite_video.write_videofile(video_path)
+                    video_clip = VideoFileClip(downloaded_v_path)
+                    audio_clip = AudioFileClip(downloaded_a_path)
+                    try:
+                        video_clip.set_audio(audio_clip).write_videofile(video_path)
+                    finally:
+                        audio_clip.close()
+                        video_clip.close()
                     # Deleting raw video and audio files.
                     # os.remove(downloaded_a_path)
                     # os.remove(downloaded_v_path)
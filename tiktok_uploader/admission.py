@@ -0,0 +1,72 @@
+import asyncio
+import math
+import time
+from collections import deque
+
+
+class AdmissionRejected(Exception):
+    """No slot within the deadline (or the wait queue is full); retry after ``retry_after`` seconds."""
+
+    def __init__(self, gate: str, reason: str, retry_after: int) -> None:
+        super().__init__(f"{gate}: {reason}")
+        self.gate = gate
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionGate:
+    """
+    Concurrency limit for one kind of request, with a bounded wait queue.
+
+    Up to ``concurrency`` requests run at once. Up to ``max_queue`` more wait
+    for a slot, each for at most ``timeout`` seconds; anything beyond that is
+    rejected at once, so load past capacity turns into fast 429s instead of
+    everything getting slower. ``Retry-After`` is estimated from how long
+    recent requests held their slot.
+    """
+
+    def __init__(self, name: str, concurrency: int, max_queue: int = 0, timeout: float = 0.0) -> None:
+        self.name = name
+        self.concurrency = max(1, concurrency)
+        self.max_queue = max(0, max_queue)
+        self.timeout = timeout
+        self.active = 0
+        self.waiting = 0
+        self.rejected = 0
+        self._slots = asyncio.Semaphore(self.concurrency)
+        self._service_seconds: deque = deque(maxlen=50)
+
+    def retry_after(self) -> int:
+        if not self._service_seconds:
+            return 5
+        average = sum(self._service_seconds) / len(self._service_seconds)
+        # Time until the requests ahead (running and waiting) are through.
+        return max(1, math.ceil(average * (self.waiting + self.active) / self.concurrency))
+
+    def _reject(self, reason: str) -> AdmissionRejected:
+        self.rejected += 1
+        return AdmissionRejected(self.name, reason, self.retry_after())
+
+    async def acquire(self) -> float:
+        """Wait for a slot and return the seconds spent queueing; raises ``AdmissionRejected``."""
+        if not self._slots.locked():
+            await self._slots.acquire()
+            self.active += 1
+            return 0.0
+        if self.waiting >= self.max_queue:
+            raise self._reject("busy")
+        started = time.monotonic()
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.timeout)
+        except asyncio.TimeoutError:
+            raise self._reject("queue deadline passed")
+        finally:
+            self.waiting -= 1
+        self.active += 1
+        return time.monotonic() - started
+
+    def release(self, service_seconds: float) -> None:
+        self.active -= 1
+        self._service_seconds.append(service_seconds)
+        self._slots.release()
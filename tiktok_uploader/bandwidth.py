@@ -0,0 +1,214 @@
+import asyncio
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import AsyncIterator, Dict, Iterator, Optional
+
+from .Config import Config
+
+
+PRIORITY_WEIGHTS = {"high": 4, "normal": 2, "background": 1}
+DEFAULT_PRIORITY = "normal"
+
+# Tokens are handed out per block so a part is paced instead of sent in one burst.
+_THROTTLE_BLOCK_SIZE = 64 * 1024
+_RATE_SUFFIXES = {"k": 1024, "m": 1024 ** 2, "g": 1024 ** 3}
+
+
+def parse_rate(value) -> Optional[float]:
+    """Parse a bytes-per-second limit such as ``"2500000"``, ``"512K"`` or ``"8M"``; empty means unlimited."""
+    if value is None:
+        return None
+    text = str(value).strip().lower().replace('"', "")
+    if text.endswith("/s"):
+        text = text[:-2]
+    if text.endswith("b"):
+        text = text[:-1]
+    if not text or text in ("0", "none", "off"):
+        return None
+    multiplier = _RATE_SUFFIXES.get(text[-1], 1)
+    if text[-1] in _RATE_SUFFIXES:
+        text = text[:-1]
+    rate = float(text) * multiplier
+    return rate if rate > 0 else None
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket counted in bytes.
+
+    ``reserve`` never blocks: it takes the tokens (possibly going into debt) and
+    returns how long the caller has to wait, so the same bucket serves threads
+    and coroutines.
+    """
+
+    def __init__(self, rate: float, burst: Optional[float] = None) -> None:
+        self._lock = threading.Lock()
+        self.rate = rate
+        self.burst = burst or rate
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def set_rate(self, rate: float) -> None:
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = rate
+            self.burst = rate
+
+    def reserve(self, amount: int) -> float:
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens -= amount
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+
+class _ThrottledBody:
+    """Sized iterable body so requests sends a Content-Length instead of chunked encoding."""
+
+    def __init__(self, throttle: "UploadThrottle", view: memoryview) -> None:
+        self._throttle = throttle
+        self._view = view
+
+    def __len__(self) -> int:
+        return self._view.nbytes
+
+    def __iter__(self) -> Iterator[bytes]:
+        return self._throttle.iter_blocks(self._view)
+
+
+class UploadThrottle:
+    """Paces the part bodies of one upload against its own and the global bucket."""
+
+    def __init__(self, limiter: "BandwidthLimiter", priority: str, rate: Optional[float]) -> None:
+        self.limiter = limiter
+        self.priority = priority
+        self.rate = rate
+        self.weight = PRIORITY_WEIGHTS[priority]
+        self._bucket: Optional[TokenBucket] = None
+
+    def _set_rate(self, rate: Optional[float]) -> None:
+        if rate is None:
+            self._bucket = None
+        elif self._bucket is None:
+            self._bucket = TokenBucket(rate)
+        else:
+            self._bucket.set_rate(rate)
+
+    def delay(self, nbytes: int) -> float:
+        delay = self.limiter.reserve(nbytes)
+        bucket = self._bucket
+        if bucket is not None:
+            delay = max(delay, bucket.reserve(nbytes))
+        return delay
+
+    def iter_blocks(self, view: memoryview) -> Iterator[memoryview]:
+        for start in range(0, view.nbytes, _THROTTLE_BLOCK_SIZE):
+            block = view[start:start + _THROTTLE_BLOCK_SIZE]
+            delay = self.delay(block.nbytes)
+            if delay:
+                time.sleep(delay)
+            yield block
+
+    async def aiter_blocks(self, view: memoryview) -> AsyncIterator[bytes]:
+        for start in range(0, view.nbytes, _THROTTLE_BLOCK_SIZE):
+            block = bytes(view[start:start + _THROTTLE_BLOCK_SIZE])
+            delay = self.delay(len(block))
+            if delay:
+                await asyncio.sleep(delay)
+            yield block
+
+    def body(self, view: memoryview) -> _ThrottledBody:
+        """Wrap a part for ``requests`` so it is sent at the throttled rate."""
+        return _ThrottledBody(self, view)
+
+
+class BandwidthLimiter:
+    """
+    Process-wide upload bandwidth limiter.
+
+    All throttled uploads draw from one global bucket. While several uploads are
+    active the global rate is split by priority weight (high 4, normal 2,
+    background 1), so an upload scheduled to go out soon takes bandwidth from
+    background jobs instead of queueing behind them. A per-upload rate caps
+    each upload on top of its share.
+    """
+
+    def __init__(self, global_rate: Optional[float] = None, per_upload_rate: Optional[float] = None) -> None:
+        self.global_rate = global_rate
+        self.per_upload_rate = per_upload_rate
+        self._global = TokenBucket(global_rate) if global_rate else None
+        self._lock = threading.Lock()
+        self._active: Dict[int, UploadThrottle] = {}
+
+    def reserve(self, nbytes: int) -> float:
+        return self._global.reserve(nbytes) if self._global is not None else 0.0
+
+    def _rebalance(self) -> None:
+        total_weight = sum(throttle.weight for throttle in self._active.values())
+        for throttle in self._active.values():
+            rate = throttle.rate
+            if self.global_rate and total_weight:
+                share = self.global_rate * throttle.weight / total_weight
+                rate = share if rate is None else min(rate, share)
+            throttle._set_rate(rate)
+
+    @contextmanager
+    def throttle(self, priority: Optional[str] = None, rate: Optional[float] = None) -> Iterator[Optional[UploadThrottle]]:
+        """
+        Register an upload for the duration of its transfer.
+
+        Yields ``None`` when neither a global, a per-upload nor ``rate`` limit
+        applies, so callers send their parts untouched.
+        """
+        priority = priority or DEFAULT_PRIORITY
+        if priority not in PRIORITY_WEIGHTS:
+            raise ValueError(f"Unknown upload priority '{priority}', expected one of {', '.join(PRIORITY_WEIGHTS)}")
+        rate = rate or self.per_upload_rate
+        if not self.global_rate and not rate:
+            yield None
+            return
+
+        throttle = UploadThrottle(self, priority, rate)
+        with self._lock:
+            self._active[id(throttle)] = throttle
+            self._rebalance()
+        try:
+            yield throttle
+        finally:
+            with self._lock:
+                self._active.pop(id(throttle), None)
+                self._rebalance()
+
+
+def _configured_rate(env_name: str, configured) -> Optional[float]:
+    value = os.getenv(env_name)
+    return parse_rate(configured if value is None else value)
+
+
+_limiter: Optional[BandwidthLimiter] = None
+_limiter_lock = threading.Lock()
+
+
+def get_limiter() -> BandwidthLimiter:
+    """
+    Return the process-wide limiter.
+
+    Limits come from ``TIKTOK_UPLOAD_BANDWIDTH_LIMIT`` / ``TIKTOK_UPLOAD_BANDWIDTH_PER_UPLOAD``
+    or the ``UPLOAD_BANDWIDTH_LIMIT`` / ``UPLOAD_BANDWIDTH_PER_UPLOAD`` config options.
+    """
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            config = Config.get()
+            _limiter = BandwidthLimiter(
+                _configured_rate("TIKTOK_UPLOAD_BANDWIDTH_LIMIT", config.upload_bandwidth_limit),
+                _configured_rate("TIKTOK_UPLOAD_BANDWIDTH_PER_UPLOAD", config.upload_bandwidth_per_upload),
+            )
+        return _limiter
@@ -1,4 +1,26 @@
+import json
+import os
 import sys
+import threading
 
 def eprint(*args, **kwargs):
-    print(*args, file=sys.stderr, **kwargs)
\ No newline at end of file
+    print(*args, file=sys.stderr, **kwargs)
+
+
+def write_json_atomic(path, payload, mode=0o600):
+    """Write ``payload`` as JSON so readers only ever see the old or the new file."""
+    path = str(path)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, mode)
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(payload, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
@@ -0,0 +1,318 @@
+import csv
+import json
+import os
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+from .job_queue import DONE, FINAL_STATES, Job, JobQueue, JobWorkerPool, get_job_queue
+
+
+# Uploads of one batch that run at the same time; each still sends its parts in parallel.
+BATCH_WORKERS = int(os.getenv("TIKTOK_BATCH_WORKERS", "2"))
+
+# Manifest column -> BatchItem field, so CSV headers can use the CLI's names too.
+_ALIASES = {
+    "video": "video",
+    "file": "video",
+    "path": "video",
+    "youtube": "video",
+    "caption": "title",
+    "title": "title",
+    "account": "account",
+    "user": "account",
+    "users": "account",
+    "schedule": "schedule",
+    "privacy": "visibility",
+    "visibility": "visibility",
+    "comment": "comment",
+    "duet": "duet",
+    "stitch": "stitch",
+    "brand_organic": "brand_organic",
+    "brandorganic": "brand_organic",
+    "branded_content": "branded_content",
+    "brandcontent": "branded_content",
+    "ai_label": "ai_label",
+    "ailabel": "ai_label",
+    "proxy": "proxy",
+    "datacenter": "datacenter",
+    "priority": "priority",
+}
+_FLAGS = ("comment", "duet", "stitch", "brand_organic", "branded_content", "ai_label")
+_TRUE = ("1", "true", "yes", "y", "on")
+_FALSE = ("0", "false", "no", "n", "off", "")
+_VISIBILITY = {"public": 0, "private": 1}
+
+
+class ManifestError(ValueError):
+    """The manifest cannot be read; nothing in it is uploaded."""
+
+
+@dataclass
+class BatchItem:
+    """One manifest row: the arguments of a single ``upload_video`` call."""
+
+    line: int
+    video: str
+    title: str
+    account: str
+    schedule: int = 0
+    visibility: int = 0
+    comment: int = 1
+    duet: int = 0
+    stitch: int = 0
+    brand_organic: int = 0
+    branded_content: int = 0
+    ai_label: int = 0
+    proxy: Optional[str] = None
+    datacenter: Optional[str] = None
+    priority: Optional[str] = None
+
+
+@dataclass
+class BatchResult:
+    line: int
+    video: str
+    account: str
+    ok: bool
+    error: Optional[str] = None
+    duration_s: float = 0.0
+    bytes_sent: int = 0
+    trace_id: Optional[str] = None
+    job_id: Optional[str] = None
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+
+def _flag(value, name: str, line: int) -> int:
+    if isinstance(value, bool) or isinstance(value, int):
+        return int(bool(value))
+    text = str(value).strip().lower()
+    if text in _TRUE:
+        return 1
+    if text in _FALSE:
+        return 0
+    raise ManifestError(f"line {line}: {name} must be 0/1 or true/false, got {value!r}")
+
+
+def _schedule(value, line: int, now: float) -> int:
+    """Seconds from now; an ISO 8601 timestamp is converted when the manifest is read."""
+    if value in (None, ""):
+        return 0
+    if isinstance(value, (int, float)) or str(value).strip().lstrip("-").isdigit():
+        return int(value)
+    try:
+        when = datetime.fromisoformat(str(value).strip().replace("Z", "+00:00"))
+    except ValueError:
+        raise ManifestError(f"line {line}: schedule must be seconds or an ISO 8601 time, got {value!r}")
+    if when.tzinfo is None:
+        when = when.astimezone()
+    return int(when.astimezone(timezone.utc).timestamp() - now)
+
+
+def _visibility(value, line: int) -> int:
+    if value in (None, ""):
+        return 0
+    text = str(value).strip().lower()
+    if text in _VISIBILITY:
+        return _VISIBILITY[text]
+    if text in ("0", "1"):
+        return int(text)
+    raise ManifestError(f"line {line}: privacy must be public/private or 0/1, got {value!r}")
+
+
+def _item(row: Dict, line: int, default_account: Optional[str], now: float) -> BatchItem:
+    values = {}
+    for key, value in row.items():
+        name = _ALIASES.get(str(key).strip().lower()) if key is not None else None
+        if name is None:
+            raise ManifestError(f"line {line}: unknown column {key!r}")
+        if isinstance(value, str):
+            value = value.strip()
+        values[name] = value
+
+    video = values.get("video")
+    if not video:
+        raise ManifestError(f"line {line}: video is required")
+    account = values.get("account") or default_account
+    if not account:
+        raise ManifestError(f"line {line}: account is required (or pass -u)")
+    item = BatchItem(
+        line=line,
+        video=str(video),
+        title=str(values.get("title") or ""),
+        account=str(account),
+        schedule=_schedule(values.get("schedule"), line, now),
+        visibility=_visibility(values.get("visibility"), line),
+        proxy=values.get("proxy") or None,
+        datacenter=values.get("datacenter") or None,
+        priority=values.get("priority") or None,
+    )
+    for name in _FLAGS:
+        if values.get(name) not in (None, ""):
+            setattr(item, name, _flag(values[name], name, line))
+    return item
+
+
+def load_manifest(path: str, default_account: Optional[str] = None) -> List[BatchItem]:
+    """
+    Read a CSV (header row) or JSON-lines manifest, one upload per row.
+
+    Columns: ``video`` (file name or YouTube URL), ``caption``, ``account``,
+    ``schedule`` (seconds or ISO 8601 time), ``privacy`` (public/private),
+    ``comment``/``duet``/``stitch`` and the other ``upload`` flags. Every row is
+    checked before anything is uploaded; a malformed manifest raises ``ManifestError``.
+    """
+    now = time.time()
+    rows = []
+    try:
+        with open(path, "r", encoding="utf-8-sig", newline="") as f:
+            if path.lower().endswith((".jsonl", ".ndjson", ".json")):
+                for line, text in enumerate(f, start=1):
+                    if not text.strip() or text.lstrip().startswith("#"):
+                        continue
+                    try:
+                        row = json.loads(text)
+                    except ValueError as exc:
+                        raise ManifestError(f"line {line}: invalid JSON ({exc})")
+                    if not isinstance(row, dict):
+                        raise ManifestError(f"line {line}: expected a JSON object")
+                    rows.append((line, row))
+            else:
+                reader = csv.DictReader(f)
+                for row in reader:
+                    if any((value or "").strip() for value in row.values() if isinstance(value, str)):
+                        rows.append((reader.line_num, row))
+    except OSError as exc:
+        raise ManifestError(f"cannot read manifest: {exc}")
+
+    items = [_item(row, line, default_account, now) for line, row in rows]
+    if not items:
+        raise ManifestError("manifest has no uploads")
+    return items
+
+
+def session_file(account: str) -> str:
+    """Cookie file name for an account as listed by ``cli.py show -u`` (a path is kept as is)."""
+    if os.path.isabs(account) or account.startswith("tiktok_session-"):
+        return account
+    return f"tiktok_session-{account}"
+
+
+def check_item(item: BatchItem) -> Optional[str]:
+    """Why ``item`` would be rejected before any request is sent, or None."""
+    from . import tiktok
+    from .cookies import _cookie_file_path
+
+    error = tiktok._validate_upload_params(item.title, item.schedule, item.visibility)
+    if error:
+        return error
+    if not os.path.exists(_cookie_file_path(session_file(item.account))):
+        return f"[-] No saved session for account {item.account}: use login first"
+    if not item.video.startswith(("http://", "https://")) and not tiktok._resolve_video_path(item.video).exists():
+        return f"[-] Video does not exist: {item.video}"
+    return None
+
+
+def job_payload(item: BatchItem) -> Dict:
+    """Job queue payload for ``item``; cookie and video become absolute paths so any worker can run it."""
+    from . import tiktok
+    from .cookies import _cookie_file_path
+
+    youtube = item.video.startswith(("http://", "https://"))
+    return {
+        "session_file": os.path.abspath(_cookie_file_path(session_file(item.account))),
+        "video": item.video if youtube else str(tiktok._resolve_video_path(item.video).resolve()),
+        "youtube": youtube,
+        "title": item.title,
+        "schedule_time": item.schedule,
+        "allow_comment": item.comment,
+        "allow_duet": item.duet,
+        "allow_stitch": item.stitch,
+        "visibility_type": item.visibility,
+        "brand_organic_type": item.brand_organic,
+        "branded_content_type": item.branded_content,
+        "ai_label": item.ai_label,
+        "proxy": item.proxy,
+        "datacenter": item.datacenter,
+        "priority": item.priority,
+    }
+
+
+def _result(item: BatchItem, job: Job) -> BatchResult:
+    trace = job.result or {}
+    return BatchResult(
+        line=item.line,
+        video=item.video,
+        account=item.account,
+        ok=job.state == DONE,
+        error=None if job.state == DONE else job.error,
+        duration_s=round((job.finished_at or time.time()) - (job.started_at or job.created_at), 3),
+        bytes_sent=trace.get("bytes_sent", 0),
+        trace_id=trace.get("trace_id"),
+        job_id=job.id,
+    )
+
+
+def run_batch(
+    items: List[BatchItem],
+    workers: int = BATCH_WORKERS,
+    status_callback: Optional[Callable[[BatchItem, str], None]] = None,
+    result_callback: Optional[Callable[[BatchResult], None]] = None,
+    queue: Optional[JobQueue] = None,
+) -> List[BatchResult]:
+    """
+    Queue every item and upload them on ``workers`` threads of this process.
+
+    Rows that fail ``check_item`` are reported without being queued. The
+    pool only takes this batch's jobs; whatever it leaves behind (Ctrl-C, a
+    crash) stays in the job queue for ``cli.py worker``, the GUI or the API.
+    Results come back in manifest order; ``result_callback`` sees each one as
+    soon as its upload ends.
+    """
+    queue = queue or get_job_queue()
+    results: Dict[int, BatchResult] = {}
+    queued: Dict[str, tuple] = {}
+    for index, item in enumerate(items):
+        error = check_item(item)
+        if error:
+            results[index] = BatchResult(line=item.line, video=item.video, account=item.account, ok=False, error=error)
+            if result_callback:
+                result_callback(results[index])
+            continue
+        job_id = queue.submit(job_payload(item), source="cli", priority=item.priority)
+        queued[job_id] = (index, item)
+    if not queued:
+        return [results[index] for index in sorted(results)]
+
+    def listener(job, state, message):
+        _, item = queued[job.id]
+        if message:
+            if status_callback:
+                status_callback(item, message)
+        elif state in FINAL_STATES and result_callback:
+            result_callback(_result(item, queue.get(job.id)))
+
+    pool = JobWorkerPool(queue, workers=min(workers, len(queued)), job_ids=queued, listener=listener).start()
+    try:
+        jobs = pool.wait(queued)
+    finally:
+        # On Ctrl-C running uploads finish; the others stay queued.
+        pool.stop(wait=True)
+    for job in jobs:
+        index, item = queued[job.id]
+        results[index] = _result(item, job)
+    return [results[index] for index in sorted(results)]
+
+
+def summarize(results: List[BatchResult], elapsed: float) -> Dict:
+    succeeded = sum(result.ok for result in results)
+    return {
+        "total": len(results),
+        "succeeded": succeeded,
+        "failed": len(results) - succeeded,
+        "elapsed_s": round(elapsed, 3),
+        "bytes_sent": sum(result.bytes_sent for result in results),
+    }
@@ -74,7 +74,29 @@ def assert_success(url, r, status_callback=None):
 	return r.status_code == 200
 
 
-def convert_tags(text, session):
+TAG_PATTERN = r'#(\w+)|@([\w.-]+)|([^#@]+)'
+
+MENTION_LOOKUP_HEADERS = {
+	'authority': 'www.tiktok.com',
+	'accept': '*/*',
+	'accept-language': 'q=0.9,en-US;q=0.8,en;q=0.7,zh-CN;q=0.6,zh;q=0.5,vi;q=0.4',
+	'user-agent': user_agent
+}
+
+
+def extract_mentions(text):
+	return [match.group(2) for match in re.finditer(TAG_PATTERN, text) if match.group(2)]
+
+
+def profile_url(username):
+	return "https://www.tiktok.com/@" + username
+
+
+def extract_user_id(html):
+	return html.split('webapp.user-detail":{"userInfo":{"user":{"id":"')[1].split('"')[0]
+
+
+def convert_tags(text, session, user_ids=None):
 	end = 0
 	i = -1
 	text_extra = []
@@ -97,16 +119,12 @@ def convert_tags(text, session):
 			end += len(match.group(1)) + 1
 			return "<h id=\"" + str(i) + "\">#" + match.group(1) + "</h>"
 		elif match.group(2):
-			url = "https://www.tiktok.com/@" + match.group(2)
-			headers = {
-				'authority': 'www.tiktok.com',
-				'accept': '*/*',
-				'accept-language': 'q=0.9,en-US;q=0.8,en;q=0.7,zh-CN;q=0.6,zh;q=0.5,vi;q=0.4',
-				'user-agent': user_agent
-			}
-
-			r = session.request("GET", url, headers=headers)
-			user_id = r.text.split('webapp.user-detail":{"userInfo":{"user":{"id":"')[1].split('"')[0]
+			if user_ids and match.group(2) in user_ids:
+				# Resolved ahead of time by the mention resolver.
+				user_id = user_ids[match.group(2)]
+			else:
+				r = session.request("GET", profile_url(match.group(2)), headers=MENTION_LOOKUP_HEADERS)
+				user_id = extract_user_id(r.text)
 			text_extra.append(text_extra_block(end, end + len(match.group(2)) + 1, 0, "", user_id, str(i)))
 			end += len(match.group(2)) + 1
 			return "<m id=\"" + str(i) + "\">@" + match.group(2) + "</m>"
@@ -114,7 +132,7 @@ def convert_tags(text, session):
 			end += len(match.group(3))
 			return match.group(3)
 
-	result = re.sub(r'#(\w+)|@([\w.-]+)|([^#@]+)', convert, text)
+	result = re.sub(TAG_PATTERN, convert, text)
 	return result, text_extra
 
 
@@ -141,17 +159,15 @@ def assertSuccess(url, r, status_callback=None):
 
 
 def getTagsExtra(title, tags, users, session):
+	from .hashtag_index import get_hashtag_index
+
 	text_extra = []
+	# Only tags the local index has never seen are looked up, all at once.
+	index = get_hashtag_index()
+	if index.fetch(session, tags):
+		return False
 	for tag in tags:
-		url = "https://www.tiktok.com/api/upload/challenge/sug/"
-		params = {"keyword": tag}
-		r = session.get(url, params=params)
-		if not assertSuccess(url, r):
-			return False
-		try:
-			verified_tag = r.json()["sug_list"][0]["cha_name"]
-		except:
-			verified_tag = tag
+		verified_tag = index.top_suggestion(tag) or tag
 		title += " #"+verified_tag
 		text_extra.append({"start": len(title)-len(verified_tag)-1, "end": len(
 			title), "user_id": "", "type": 1, "hashtag_name": verified_tag})
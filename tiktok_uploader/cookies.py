@@ -1,23 +1,34 @@
 from .Config import Config
-from .basics import eprint
+from .basics import eprint, write_json_atomic
 
+import hashlib
+import json
 import pickle
 import os
+import time
 
 
-def load_cookies_from_file(filename: str, cookies_path=None):
+# msToken cookies are reused across uploads of an account for this long.
+MSTOKEN_TTL_SECONDS = int(os.getenv("TIKTOK_MSTOKEN_TTL_SECONDS", str(6 * 3600)))
+
+
+def _cookie_file_path(filename: str, cookies_path=None):
     if os.path.isabs(filename):
-        cookie_path = filename
-    elif not cookies_path:
-        cookie_path = os.path.join(os.getcwd(), Config.get().cookies_dir, filename + ".cookie")
-    else:
-        cookie_path = os.path.join(cookies_path, filename + ".cookie")
+        return filename
+    if not cookies_path:
+        return os.path.join(os.getcwd(), Config.get().cookies_dir, filename + ".cookie")
+    return os.path.join(cookies_path, filename + ".cookie")
+
+
+def load_cookies_from_file(filename: str, cookies_path=None):
+    cookie_path = _cookie_file_path(filename, cookies_path)
     if not os.path.exists(cookie_path):
         # eprint(f"Warning: Could not find cookie file at path: {cookie_path} (ignoring)")
         print("User not found on system.")
         return []
     
-    cookie_data = pickle.load(open(cookie_path, "rb"))
+    with open(cookie_path, "rb") as f:
+        cookie_data = pickle.load(f)
     cookies = []
     for cookie in cookie_data:
         # still necessary?
@@ -65,4 +76,55 @@ def delete_all_cookies_files(cookies_path=None):
 
 def update_dc_location(filename:str, new_dc_location: str):
     """As datacenter location can change per load, we need to update based on response set cookies headers, in the case of dc change, we need to update settings"""
-    raise NotImplementedError("This function is not implemented yet.")
\ No newline at end of file
+    raise NotImplementedError("This function is not implemented yet.")
+
+
+class MsTokenStore:
+    """
+    msToken of one account, kept next to its session cookie file.
+
+    Publishing needs an msToken cookie; without a stored one every upload has
+    to download the TikTok homepage to get issued a new token. Session files
+    that live outside COOKIES_DIR (e.g. the temporary copies made by the API)
+    store the token under ``STATE_DIR/mstokens`` keyed by the session id instead.
+    """
+
+    def __init__(self, path: str, ttl_seconds: int = MSTOKEN_TTL_SECONDS) -> None:
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+
+    @classmethod
+    def for_session(cls, session_file: str, session_id: str) -> "MsTokenStore":
+        cookie_path = os.path.realpath(_cookie_file_path(session_file))
+        cookies_dir = os.path.realpath(os.path.join(os.getcwd(), Config.get().cookies_dir or ""))
+        if os.path.dirname(cookie_path) == cookies_dir:
+            stem = cookie_path[:-len(".cookie")] if cookie_path.endswith(".cookie") else cookie_path
+            return cls(stem + ".mstoken")
+
+        state_dir = os.path.join(os.getcwd(), Config.get().state_dir, "mstokens")
+        os.makedirs(state_dir, exist_ok=True)
+        key = hashlib.sha256(session_id.encode("utf-8")).hexdigest()[:32]
+        return cls(os.path.join(state_dir, key + ".json"))
+
+    def load(self):
+        """Return the stored token, or None when missing or older than the TTL."""
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(data, dict) or time.time() - data.get("saved_at", 0) > self.ttl_seconds:
+            return None
+        return data.get("msToken") or None
+
+    def save(self, token: str) -> None:
+        try:
+            write_json_atomic(self.path, {"msToken": token, "saved_at": time.time()})
+        except OSError as exc:
+            eprint(f"Warning: could not store msToken: {exc}")
+
+    def clear(self) -> None:
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
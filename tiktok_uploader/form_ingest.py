@@ -0,0 +1,228 @@
+import asyncio
+import hashlib
+import os
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Mapping, Optional, Set
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:  # python-multipart < 0.0.13
+    from multipart.multipart import MultipartParser, parse_options_header
+
+
+# Room for the text fields and the multipart framing on top of the file limits.
+FORM_OVERHEAD_BYTES = int(os.getenv("TIKTOK_FORM_OVERHEAD_BYTES", 1024 * 1024))
+MAX_FIELD_BYTES = 64 * 1024
+MAX_FIELDS = 32
+# Received chunks are parsed (and written) in a worker thread once this much has arrived.
+_FLUSH_BYTES = 1024 * 1024
+
+
+class IngestError(Exception):
+    """The request body was rejected; ``status_code`` and ``detail`` go back to the client."""
+
+    def __init__(self, status_code: int, detail: str) -> None:
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+@dataclass
+class FileRule:
+    """Accepted file field: size limit, allowed content types (None: any) and the name used in errors."""
+
+    max_bytes: int
+    content_types: Optional[Set[str]] = None
+    label: str = "file"
+    default_name: str = "upload"
+
+
+@dataclass
+class StagedFile:
+    filename: str
+    content_type: Optional[str]
+    path: Path
+    size: int = 0
+    # SHA-256 of the content, computed while it streams in.
+    digest: Any = field(default_factory=hashlib.sha256, repr=False)
+
+    @property
+    def sha256(self) -> str:
+        return self.digest.hexdigest()
+
+
+@dataclass
+class IngestedForm:
+    fields: Dict[str, str] = field(default_factory=dict)
+    files: Dict[str, StagedFile] = field(default_factory=dict)
+
+
+class _FormWriter:
+    """
+    python-multipart callbacks: file parts go straight to ``directory``, text fields stay in memory.
+
+    The parser is fed in a worker thread (``feed``) so file writes never block the event loop.
+    """
+
+    def __init__(self, directory: Path, rules: Mapping[str, FileRule]) -> None:
+        self.directory = directory
+        self.rules = rules
+        self.form = IngestedForm()
+        self._headers: Dict[bytes, bytes] = {}
+        self._header_field = b""
+        self._header_value = b""
+        self._name: Optional[str] = None
+        self._file: Optional[StagedFile] = None
+        self._handle = None
+        self._value = bytearray()
+        # feed and close run in threads; the request may be cancelled while a batch is written.
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def feed(self, parser: MultipartParser, chunks: List[bytes], final: bool = False) -> None:
+        with self._lock:
+            if self._closed:
+                return
+            for chunk in chunks:
+                parser.write(chunk)
+            if final:
+                parser.finalize()
+
+    def callbacks(self) -> Dict:
+        return {
+            "on_part_begin": self.on_part_begin,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+        }
+
+    def on_part_begin(self) -> None:
+        self._headers = {}
+        self._name = None
+        self._file = None
+        self._value = bytearray()
+
+    def on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_field += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def on_header_end(self) -> None:
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = b""
+        self._header_value = b""
+
+    def on_headers_finished(self) -> None:
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        if b"name" not in options:
+            raise IngestError(400, "Form part without a name.")
+        self._name = options[b"name"].decode("utf-8", errors="replace")
+        if b"filename" not in options:
+            if len(self.form.fields) >= MAX_FIELDS:
+                raise IngestError(400, "Too many form fields.")
+            return
+
+        rule = self.rules.get(self._name)
+        if rule is None or self._name in self.form.files:
+            raise IngestError(400, f"Unexpected file field {self._name}.")
+        content_type = self._headers.get(b"content-type", b"").decode("latin-1").strip() or None
+        if rule.content_types is not None and content_type not in rule.content_types:
+            raise IngestError(400, f"Unsupported {rule.label} type.")
+
+        filename = Path(options[b"filename"].decode("utf-8", errors="replace")).name or rule.default_name
+        path = self.directory / filename
+        if any(staged.path == path for staged in self.form.files.values()):
+            path = self.directory / f"{self._name}-{filename}"
+        self._file = StagedFile(filename, content_type, path)
+        self.form.files[self._name] = self._file
+        self._handle = open(path, "wb")
+
+    def on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self._file is None:
+            self._value += data[start:end]
+            if len(self._value) > MAX_FIELD_BYTES:
+                raise IngestError(413, f"{self._name} exceeds size limit.")
+            return
+        self._file.size += end - start
+        rule = self.rules[self._name]
+        if self._file.size > rule.max_bytes:
+            raise IngestError(413, f"{rule.label} exceeds size limit.")
+        chunk = data[start:end]
+        self._file.digest.update(chunk)
+        self._handle.write(chunk)
+
+    def on_part_end(self) -> None:
+        if self._file is None:
+            self.form.fields[self._name] = self._value.decode("utf-8", errors="replace")
+        else:
+            self._close_file()
+
+    def _close_file(self) -> None:
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+
+    def close(self) -> None:
+        """Close the open file part, after a batch still being written; later batches are dropped."""
+        with self._lock:
+            self._closed = True
+            self._close_file()
+
+
+async def ingest_multipart(
+    headers: Mapping[str, str],
+    body: AsyncIterator[bytes],
+    directory: Path,
+    rules: Mapping[str, FileRule],
+) -> IngestedForm:
+    """
+    Read a multipart/form-data body chunk by chunk as it arrives.
+
+    File parts named in ``rules`` are written once, directly into
+    ``directory``; nothing is buffered or spooled elsewhere first. Limits are
+    checked before the body is read (Content-Length), when a part's headers
+    arrive (content type) and as parts are written (size), so a bad request
+    is cut off without reading the rest of it. Chunks are parsed and written
+    in a worker thread, a batch at a time, off the event loop. On
+    ``IngestError`` the caller removes ``directory``.
+    """
+    content_type, options = parse_options_header(headers.get("content-type", ""))
+    if content_type != b"multipart/form-data":
+        raise IngestError(415, "Expected multipart/form-data.")
+    if not options.get(b"boundary"):
+        raise IngestError(400, "Missing multipart boundary.")
+
+    limit = sum(rule.max_bytes for rule in rules.values()) + FORM_OVERHEAD_BYTES
+    declared = headers.get("content-length")
+    if declared is not None and declared.isdigit() and int(declared) > limit:
+        raise IngestError(413, "Request body exceeds size limit.")
+
+    writer = _FormWriter(directory, rules)
+    parser = MultipartParser(options[b"boundary"], writer.callbacks())
+    received = 0
+    batch: List[bytes] = []
+    batched = 0
+    try:
+        async for chunk in body:
+            received += len(chunk)
+            if received > limit:
+                raise IngestError(413, "Request body exceeds size limit.")
+            batch.append(chunk)
+            batched += len(chunk)
+            if batched >= _FLUSH_BYTES:
+                await asyncio.to_thread(writer.feed, parser, batch)
+                batch, batched = [], 0
+        await asyncio.to_thread(writer.feed, parser, batch, True)
+    except IngestError:
+        raise
+    except Exception as exc:
+        raise IngestError(400, f"Malformed multipart body: {exc}")
+    finally:
+        await asyncio.to_thread(writer.close)
+    return writer.form
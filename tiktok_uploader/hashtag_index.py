@@ -0,0 +1,212 @@
+import bisect
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set
+
+from .Config import Config
+from .basics import write_json_atomic
+from .bot_utils import TAG_PATTERN, assertSuccess
+
+
+CHALLENGE_SUG_URL = "https://www.tiktok.com/api/upload/challenge/sug/"
+
+# Suggestions fetched for a prefix are trusted for this long before TikTok is asked again.
+HASHTAG_PREFIX_TTL_SECONDS = int(os.getenv("TIKTOK_HASHTAG_PREFIX_TTL_SECONDS", str(7 * 24 * 3600)))
+HASHTAG_LOOKUP_CONCURRENCY = int(os.getenv("TIKTOK_HASHTAG_LOOKUP_CONCURRENCY", "4"))
+
+# Runs lookups started by the GUI while the user keeps typing.
+_background = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tiktok-hashtags")
+
+
+def _index_path() -> Path:
+    base_dir = Path(Config.get().state_dir)
+    if not base_dir.is_absolute():
+        base_dir = Path.cwd() / base_dir
+    base_dir.mkdir(parents=True, exist_ok=True)
+    return base_dir / "hashtags.json"
+
+
+def extract_hashtags(text: str) -> List[str]:
+    """Return the hashtag names in ``text`` in order, without the ``#``."""
+    return [match.group(1) for match in re.finditer(TAG_PATTERN, text) if match.group(1)]
+
+
+def _normalize(keyword: str) -> str:
+    return keyword.strip().lstrip("#").lower()
+
+
+def parse_suggestions(payload) -> List[Dict]:
+    """Turn a ``challenge/sug`` response into ``{"name", "views"}`` entries, best match first."""
+    suggestions = []
+    if not isinstance(payload, dict):
+        return suggestions
+    for item in payload.get("sug_list") or []:
+        name = item.get("cha_name") if isinstance(item, dict) else None
+        if not name:
+            continue
+        try:
+            views = int(item.get("view_count") or 0)
+        except (TypeError, ValueError):
+            views = 0
+        suggestions.append({"name": name, "views": views})
+    return suggestions
+
+
+class HashtagIndex:
+    """
+    Local prefix index of known hashtags, kept in ``STATE_DIR/hashtags.json``.
+
+    Tags come from past ``challenge/sug`` responses and from the captions of
+    successful uploads. Names are held in a sorted list so a prefix search is
+    a bisect plus a short scan. Keywords already asked for within the TTL are
+    remembered, so TikTok is only queried for prefixes the index has never seen.
+    """
+
+    def __init__(self, path: Optional[Path] = None, ttl_seconds: int = HASHTAG_PREFIX_TTL_SECONDS) -> None:
+        self.path = path or _index_path()
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._tags: Dict[str, Dict] = {}
+        self._prefixes: Dict[str, Dict] = {}
+        self._inflight: Dict[str, Future] = {}
+        self._load()
+        self._keys: List[str] = sorted(self._tags)
+
+    def _load(self) -> None:
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if isinstance(data, dict):
+            self._tags = data.get("tags") or {}
+            self._prefixes = data.get("prefixes") or {}
+
+    def save(self) -> None:
+        with self._lock:
+            payload = {"tags": dict(self._tags), "prefixes": dict(self._prefixes)}
+        try:
+            write_json_atomic(self.path, payload, mode=0o644)
+        except OSError:
+            pass
+
+    def _add(self, name: str, views: int = 0, uses: int = 0) -> None:
+        key = name.lower()
+        entry = self._tags.get(key)
+        if entry is None:
+            self._tags[key] = {"name": name, "views": views, "uses": uses}
+            bisect.insort(self._keys, key)
+            return
+        entry["views"] = max(entry.get("views", 0), views)
+        entry["uses"] = entry.get("uses", 0) + uses
+
+    def search(self, prefix: str, limit: int = 10) -> List[str]:
+        """Known tags starting with ``prefix``, most used and most viewed first."""
+        prefix = _normalize(prefix)
+        with self._lock:
+            start = bisect.bisect_left(self._keys, prefix)
+            matches = []
+            for key in self._keys[start:]:
+                if not key.startswith(prefix):
+                    break
+                matches.append(self._tags[key])
+        matches.sort(key=lambda entry: (-entry.get("uses", 0), -entry.get("views", 0), len(entry["name"])))
+        return [entry["name"] for entry in matches[:limit]]
+
+    def is_known(self, keyword: str) -> bool:
+        """True when suggestions for ``keyword`` were fetched within the TTL."""
+        entry = self._prefixes.get(_normalize(keyword))
+        return bool(entry) and time.time() - entry.get("fetched_at", 0) <= self.ttl_seconds
+
+    def top_suggestion(self, keyword: str) -> Optional[str]:
+        """TikTok's first suggestion for ``keyword``, if it has been fetched."""
+        entry = self._prefixes.get(_normalize(keyword))
+        return entry.get("top") if entry else None
+
+    def add_suggestions(self, keyword: str, suggestions: List[Dict]) -> None:
+        with self._lock:
+            for suggestion in suggestions:
+                self._add(suggestion["name"], views=suggestion.get("views", 0))
+            self._prefixes[_normalize(keyword)] = {
+                "fetched_at": time.time(),
+                "top": suggestions[0]["name"] if suggestions else None,
+            }
+
+    def record_caption(self, text: str) -> None:
+        """Count the hashtags of a caption that was published."""
+        names = extract_hashtags(text)
+        if not names:
+            return
+        with self._lock:
+            for name in names:
+                self._add(name, uses=1)
+        self.save()
+
+    def fetch(self, session, keywords: Iterable[str]) -> Set[str]:
+        """
+        Fetch suggestions for every keyword the index has not seen yet, in parallel.
+
+        All results are stored with a single write. Returns the keywords whose
+        lookup failed; they stay unknown and are retried next time.
+        """
+        unseen = sorted(
+            keyword for keyword in {_normalize(keyword) for keyword in keywords}
+            if keyword and not self.is_known(keyword)
+        )
+        if not unseen:
+            return set()
+
+        def lookup(keyword):
+            try:
+                r = session.get(CHALLENGE_SUG_URL, params={"keyword": keyword})
+            except OSError:
+                return keyword, None
+            if not assertSuccess(CHALLENGE_SUG_URL, r):
+                return keyword, None
+            try:
+                return keyword, parse_suggestions(r.json())
+            except ValueError:
+                # An unparsable answer means TikTok has no suggestion; the tag is kept as typed.
+                return keyword, []
+
+        failed = set()
+        with ThreadPoolExecutor(max_workers=min(len(unseen), HASHTAG_LOOKUP_CONCURRENCY), thread_name_prefix="tiktok-hashtag") as pool:
+            for keyword, suggestions in pool.map(lookup, unseen):
+                if suggestions is None:
+                    failed.add(keyword)
+                else:
+                    self.add_suggestions(keyword, suggestions)
+        if len(failed) < len(unseen):
+            self.save()
+        return failed
+
+    def fetch_in_background(self, session, keyword: str) -> Optional[Future]:
+        """Start fetching an unseen keyword; concurrent calls for the same keyword share one lookup."""
+        keyword = _normalize(keyword)
+        if not keyword or self.is_known(keyword):
+            return None
+        with self._lock:
+            future = self._inflight.get(keyword)
+            if future is None:
+                future = _background.submit(self.fetch, session, [keyword])
+                self._inflight[keyword] = future
+                future.add_done_callback(lambda _, keyword=keyword: self._inflight.pop(keyword, None))
+        return future
+
+
+_index: Optional[HashtagIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_hashtag_index() -> HashtagIndex:
+    """Return the process-wide index backed by ``STATE_DIR/hashtags.json``."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = HashtagIndex()
+        return _index
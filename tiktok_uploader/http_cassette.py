@@ -0,0 +1,331 @@
+import asyncio
+import base64
+import http.client
+import io
+import json
+import re
+import threading
+import time
+from typing import Dict, List, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from requests.adapters import HTTPAdapter
+from requests.exceptions import ConnectionError as RequestsConnectionError
+from urllib3 import HTTPResponse
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+
+REDACTED = "REDACTED"
+_CRC_PLACEHOLDER = "{{crc32}}"
+
+# Query parameters and headers that carry account secrets or per-request signatures.
+_SECRET_PARAMS = {"msToken", "X-Bogus", "_signature", "X-Amz-Security-Token", "X-Amz-Signature", "X-Amz-Credential"}
+_SECRET_HEADERS = {"authorization", "x-amz-security-token", "x-tt-token", "x-bogus"}
+_DROPPED_HEADERS = {"cookie"}
+# JSON fields redacted anywhere in request and response bodies.
+_SECRET_FIELDS = {
+    "access_key_id", "secret_acess_key", "secret_access_key", "session_token",
+    "SessionKey", "Auth", "sessionid", "sid_tt", "msToken", "uid", "sec_uid",
+}
+_SET_COOKIE_VALUE = re.compile(r"^([^=;]+)=[^;]*")
+# Query keys that tell otherwise identical upload calls apart when replaying.
+_MATCH_PARAMS = ("Action", "phase")
+_MAX_TEXT_BODY = 256 * 1024
+
+
+def _redact_url(url: str) -> str:
+    parts = urlsplit(url)
+    query = [(key, REDACTED if key in _SECRET_PARAMS else value) for key, value in parse_qsl(parts.query, keep_blank_values=True)]
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, urlencode(query), parts.fragment))
+
+
+def _redact_headers(headers) -> List[List[str]]:
+    redacted = []
+    for name, value in headers:
+        lowered = name.lower()
+        if lowered in _DROPPED_HEADERS:
+            continue
+        if lowered in _SECRET_HEADERS:
+            value = REDACTED
+        elif lowered == "set-cookie":
+            value = _SET_COOKIE_VALUE.sub(lambda match: f"{match.group(1)}={REDACTED}", value, count=1)
+        redacted.append([name, value])
+    return redacted
+
+
+def _redact_json(value):
+    if isinstance(value, dict):
+        return {key: REDACTED if key in _SECRET_FIELDS and not isinstance(item, (dict, list)) else _redact_json(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_redact_json(item) for item in value]
+    return value
+
+
+def _encode_body(body, content_type: str = "") -> Dict:
+    """Store a body as (redacted) JSON, text or base64; large non-JSON bodies are truncated."""
+    if body is None:
+        return {"size": 0}
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    if not isinstance(body, (bytes, bytearray, memoryview)):
+        return {"size": len(body) if hasattr(body, "__len__") else None}
+    body = bytes(body)
+    if len(body) > _MAX_TEXT_BODY and "json" not in content_type:
+        return {"size": len(body), "text": body[:_MAX_TEXT_BODY].decode("utf-8", errors="replace"), "truncated": True}
+    try:
+        text = body.decode("utf-8")
+    except UnicodeDecodeError:
+        return {"size": len(body)} if len(body) > _MAX_TEXT_BODY else {"size": len(body), "base64": base64.b64encode(body).decode("ascii")}
+    try:
+        return {"size": len(body), "json": _redact_json(json.loads(text))}
+    except ValueError:
+        return {"size": len(body), "text": text}
+
+
+def _encode_request_body(body) -> Dict:
+    """Request bodies keep only small UTF-8 payloads; video parts are recorded by size."""
+    if body is not None and not isinstance(body, (str, bytes, bytearray, memoryview)):
+        return {"size": len(body) if hasattr(body, "__len__") else None}
+    if isinstance(body, (bytes, bytearray, memoryview)):
+        if len(body) > _MAX_TEXT_BODY:
+            return {"size": len(body)}
+        try:
+            bytes(body).decode("utf-8")
+        except UnicodeDecodeError:
+            return {"size": len(body)}
+    return _encode_body(body)
+
+
+def _decode_body(stored: Dict) -> bytes:
+    if "json" in stored:
+        return json.dumps(stored["json"]).encode("utf-8")
+    if "text" in stored:
+        return stored["text"].encode("utf-8")
+    if "base64" in stored:
+        return base64.b64decode(stored["base64"])
+    return b""
+
+
+def match_key(method: str, url: str) -> str:
+    """Key under which an exchange is recorded and looked up again on replay."""
+    parts = urlsplit(url)
+    query = dict(parse_qsl(parts.query, keep_blank_values=True))
+    # Part transfers go to per-upload store URIs; only the phase identifies them.
+    path = "<upload>" if "phase" in query else parts.path
+    return " ".join([method.upper(), path] + [f"{key}={query[key]}" for key in _MATCH_PARAMS if key in query])
+
+
+class Cassette:
+    """
+    JSON-lines file of recorded HTTP exchanges, one per line.
+
+    Secrets (cookies, signatures, upload credentials, msTokens) are replaced
+    with ``REDACTED`` before anything is written, so cassettes can be shared.
+    A part response that echoes the request's CRC32 stores a placeholder that
+    replay fills with the CRC of the part actually sent.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries: Optional[Dict[str, List[Dict]]] = None
+        self._cursors: Dict[str, int] = {}
+
+    def record(self, method: str, url: str, request_headers, request_body, status: int, response_headers, content: bytes, elapsed: float) -> None:
+        request_headers = list(request_headers)
+        response_headers = list(response_headers)
+        crc = next((value for name, value in request_headers if name.lower() == "content-crc32"), None)
+        content_type = next((value for name, value in response_headers if name.lower() == "content-type"), "")
+        response = _encode_body(content, content_type)
+        if crc and "json" in response:
+            response["json"] = json.loads(json.dumps(response["json"]).replace(f'"{crc}"', f'"{_CRC_PLACEHOLDER}"'))
+        entry = {
+            "key": match_key(method, url),
+            "method": method.upper(),
+            "url": _redact_url(url),
+            "request_headers": _redact_headers(request_headers),
+            "request_body": _encode_request_body(request_body),
+            "status": status,
+            "response_headers": _redact_headers(response_headers),
+            "response_body": response,
+            "elapsed_ms": round(elapsed * 1000, 2),
+        }
+        line = json.dumps(entry, separators=(",", ":")) + "\n"
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+
+    def _load(self) -> Dict[str, List[Dict]]:
+        entries: Dict[str, List[Dict]] = {}
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    entries.setdefault(entry["key"], []).append(entry)
+        return entries
+
+    def next_exchange(self, method: str, url: str) -> Optional[Dict]:
+        """Next recorded exchange for this call; recordings are cycled when replay makes more calls."""
+        key = match_key(method, url)
+        with self._lock:
+            if self._entries is None:
+                self._entries = self._load()
+            recorded = self._entries.get(key)
+            if not recorded:
+                return None
+            cursor = self._cursors.get(key, 0)
+            self._cursors[key] = cursor + 1
+            return recorded[cursor % len(recorded)]
+
+
+def replay_content(exchange: Dict, crc: Optional[str]) -> bytes:
+    content = _decode_body(exchange["response_body"])
+    if crc:
+        content = content.replace(_CRC_PLACEHOLDER.encode("utf-8"), crc.encode("utf-8"))
+    return content
+
+
+def _replay_headers(exchange: Dict) -> List[List[str]]:
+    # Content-Length/encoding of the recording no longer match the replayed body.
+    return [
+        [name, value] for name, value in exchange["response_headers"]
+        if name.lower() not in ("content-length", "content-encoding", "transfer-encoding")
+    ]
+
+
+class _SizedBody:
+    """Stand-in for a streamed request body: only its size is recorded."""
+
+    def __init__(self, size: int) -> None:
+        self._size = size
+
+    def __len__(self) -> int:
+        return self._size
+
+
+class _RecordedOriginal:
+    """What requests and urllib3 read from the ``http.client`` response behind a urllib3 one."""
+
+    def __init__(self, headers) -> None:
+        self.msg = http.client.HTTPMessage()
+        for name, value in headers:
+            self.msg[name] = value
+
+    def isclosed(self) -> bool:
+        return True
+
+    def close(self) -> None:
+        pass
+
+
+class RecordingHTTPAdapter(HTTPAdapter):
+    """Forwards to ``inner`` and appends every exchange to the cassette."""
+
+    def __init__(self, cassette: Cassette, inner: HTTPAdapter) -> None:
+        super().__init__()
+        self.cassette = cassette
+        self.inner = inner
+
+    def send(self, request, **kwargs):
+        started = time.monotonic()
+        response = self.inner.send(request, **kwargs)
+        content = response.content
+        self.cassette.record(
+            request.method, request.url, request.headers.items(), request.body,
+            response.status_code, response.raw.headers.items(), content, time.monotonic() - started,
+        )
+        return response
+
+    def close(self):
+        # The wrapped adapter may be shared by other sessions.
+        pass
+
+
+class ReplayHTTPAdapter(HTTPAdapter):
+    """
+    Answers requests from a cassette without touching the network.
+
+    ``speed`` scales the recorded latencies: 1.0 replays them, 0 returns
+    immediately so only the uploader's own CPU time remains.
+    """
+
+    def __init__(self, cassette: Cassette, speed: float = 1.0) -> None:
+        super().__init__()
+        self.cassette = cassette
+        self.speed = speed
+
+    def send(self, request, **kwargs):
+        exchange = self.cassette.next_exchange(request.method, request.url)
+        if exchange is None:
+            raise RequestsConnectionError(f"No recorded exchange for {match_key(request.method, request.url)}", request=request)
+        if self.speed:
+            time.sleep(exchange["elapsed_ms"] / 1000 * self.speed)
+
+        headers = _replay_headers(exchange)
+        raw = HTTPResponse(
+            body=io.BytesIO(replay_content(exchange, request.headers.get("Content-Crc32"))),
+            headers=headers,
+            status=exchange["status"],
+            preload_content=False,
+            decode_content=False,
+            # requests reads Set-Cookie headers through the original http.client message.
+            original_response=_RecordedOriginal(headers),
+        )
+        return self.build_response(request, raw)
+
+
+if httpx is not None:
+
+    class RecordingAsyncTransport(httpx.AsyncBaseTransport):
+        """Async counterpart of ``RecordingHTTPAdapter``."""
+
+        def __init__(self, cassette: Cassette, inner) -> None:
+            self.cassette = cassette
+            self.inner = inner
+
+        async def handle_async_request(self, request):
+            started = time.monotonic()
+            response = await self.inner.handle_async_request(request)
+            content = await response.aread()
+            if isinstance(request.stream, httpx.ByteStream):
+                body = request.content
+            else:
+                size = request.headers.get("Content-Length")
+                body = _SizedBody(int(size)) if size else None
+            self.cassette.record(
+                request.method, str(request.url), request.headers.multi_items(), body,
+                response.status_code, response.headers.multi_items(), content, time.monotonic() - started,
+            )
+            return httpx.Response(response.status_code, headers=response.headers, content=content, request=request)
+
+        async def aclose(self) -> None:
+            pass
+
+        async def shutdown(self) -> None:
+            await self.inner.shutdown()
+
+    class ReplayAsyncTransport(httpx.AsyncBaseTransport):
+        """Async counterpart of ``ReplayHTTPAdapter``."""
+
+        def __init__(self, cassette: Cassette, speed: float = 1.0) -> None:
+            self.cassette = cassette
+            self.speed = speed
+
+        async def handle_async_request(self, request):
+            exchange = self.cassette.next_exchange(request.method, str(request.url))
+            if exchange is None:
+                raise httpx.ConnectError(f"No recorded exchange for {match_key(request.method, str(request.url))}", request=request)
+            if self.speed:
+                await asyncio.sleep(exchange["elapsed_ms"] / 1000 * self.speed)
+            content = replay_content(exchange, request.headers.get("Content-Crc32"))
+            return httpx.Response(exchange["status"], headers=_replay_headers(exchange), content=content, request=request)
+
+        async def aclose(self) -> None:
+            pass
+
+        async def shutdown(self) -> None:
+            pass
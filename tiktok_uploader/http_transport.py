@@ -0,0 +1,399 @@
+import asyncio
+import os
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Dict, Iterable, Optional
+from urllib.parse import urlsplit, urlunsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from . import http_cassette
+from .http_cassette import Cassette, RecordingHTTPAdapter, ReplayHTTPAdapter
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+
+# Pools for www.tiktok.com serve the control-plane calls of every upload in the process.
+TIKTOK_POOL_MAXSIZE = int(os.getenv("TIKTOK_HTTP_POOL_MAXSIZE", "10"))
+# Upload hosts receive the parallel part transfers, so their pools are wider.
+UPLOAD_POOL_MAXSIZE = int(os.getenv("TIKTOK_UPLOAD_POOL_MAXSIZE", "16"))
+UPLOAD_POOL_HOSTS = int(os.getenv("TIKTOK_UPLOAD_POOL_HOSTS", "8"))
+PREWARM_ENABLED = os.getenv("TIKTOK_HTTP_PREWARM", "1").lower() in ("1", "true", "yes")
+PREWARM_HOSTS = tuple(
+    host.strip()
+    for host in os.getenv("TIKTOK_HTTP_PREWARM_HOSTS", "www.tiktok.com").split(",")
+    if host.strip()
+)
+
+_TIKTOK_PREFIXES = ("https://www.tiktok.com", "https://us.tiktok.com")
+
+# Send every request to this base URL instead, e.g. the offline mock server
+# (``python -m tiktok_uploader.mock_server``) used by the upload benchmark.
+_endpoint_override = os.getenv("TIKTOK_HTTP_ENDPOINT_OVERRIDE", "").rstrip("/") or None
+
+
+def set_endpoint_override(base_url: Optional[str]) -> None:
+    """Redirect sessions and async clients created from now on to ``base_url`` (None restores TikTok)."""
+    global _endpoint_override
+    _endpoint_override = base_url.rstrip("/") if base_url else None
+
+
+# Record every exchange to, or answer every request from, a cassette file
+# (see http_cassette.py). Replay ignores the endpoint override.
+_CASSETTE_MODES = ("record", "replay")
+REPLAY_SPEED = float(os.getenv("TIKTOK_HTTP_REPLAY_SPEED", "1.0"))
+_cassette_mode: Optional[tuple] = None
+if os.getenv("TIKTOK_HTTP_REPLAY"):
+    _cassette_mode = ("replay", os.getenv("TIKTOK_HTTP_REPLAY"), REPLAY_SPEED)
+elif os.getenv("TIKTOK_HTTP_RECORD"):
+    _cassette_mode = ("record", os.getenv("TIKTOK_HTTP_RECORD"), REPLAY_SPEED)
+_cassettes: Dict[str, Cassette] = {}
+_cassette_lock = threading.Lock()
+
+
+def set_cassette(path: Optional[str], mode: str = "replay", speed: float = REPLAY_SPEED) -> None:
+    """
+    Record to (``mode="record"``) or replay from the cassette at ``path`` in
+    sessions and async clients created from now on; None goes back to the network.
+
+    ``speed`` scales the recorded latencies on replay, 0 skips them entirely.
+    """
+    global _cassette_mode
+    if path and mode not in _CASSETTE_MODES:
+        raise ValueError(f"Unknown cassette mode {mode!r}, expected one of {_CASSETTE_MODES}")
+    _cassette_mode = (mode, path, speed) if path else None
+
+
+@contextmanager
+def use_cassette(path: str, mode: str = "replay", speed: float = REPLAY_SPEED):
+    """``set_cassette`` for the duration of a ``with`` block."""
+    global _cassette_mode
+    previous = _cassette_mode
+    set_cassette(path, mode, speed)
+    try:
+        yield _cassette(path)
+    finally:
+        _cassette_mode = previous
+
+
+def _cassette(path: str) -> Cassette:
+    # One Cassette per file, so replay cursors and record writes are shared by all sessions.
+    with _cassette_lock:
+        cassette = _cassettes.get(path)
+        if cassette is None:
+            cassette = Cassette(path)
+            _cassettes[path] = cassette
+        return cassette
+
+
+def _redirect_url(url: str, base_url: str) -> str:
+    target = urlsplit(base_url)
+    parts = urlsplit(url)
+    return urlunsplit((target.scheme, target.netloc, parts.path, parts.query, parts.fragment))
+
+
+class TransportStats:
+    """Thread-safe counters describing how well pooled connections are reused."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.connections_opened = 0
+        self.tls_handshakes = 0
+        # Responses with an HTTP error status, by status code.
+        self.http_errors: Dict[int, int] = {}
+        # TikTok replies whose JSON status_code is not 0 (they usually come with HTTP 200), by upload step and code.
+        self.api_errors: Dict[str, Dict[str, int]] = {}
+
+    def _add(self, name: str) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def _response(self, status_code: int) -> None:
+        if status_code >= 400:
+            with self._lock:
+                self.http_errors[status_code] = self.http_errors.get(status_code, 0) + 1
+
+    def _api_error(self, step: str, status_code: str) -> None:
+        with self._lock:
+            codes = self.api_errors.setdefault(step, {})
+            codes[status_code] = codes.get(status_code, 0) + 1
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "connections_opened": self.connections_opened,
+                "tls_handshakes": self.tls_handshakes,
+                "connections_reused": max(0, self.requests - self.connections_opened),
+                "http_errors": dict(self.http_errors),
+                "api_errors": {step: dict(codes) for step, codes in self.api_errors.items()},
+            }
+
+
+_stats = TransportStats()
+
+
+class _CountingHTTPConnectionPool(HTTPConnectionPool):
+    def _new_conn(self):
+        _stats._add("connections_opened")
+        return super()._new_conn()
+
+
+class _CountingHTTPSConnectionPool(HTTPSConnectionPool):
+    def _new_conn(self):
+        _stats._add("connections_opened")
+        return super()._new_conn()
+
+    def _validate_conn(self, conn):
+        # A closed connection (new, or dropped by the server) is (re)connected here.
+        if conn.is_closed:
+            _stats._add("tls_handshakes")
+        super()._validate_conn(conn)
+
+
+_POOL_CLASSES = {"http": _CountingHTTPConnectionPool, "https": _CountingHTTPSConnectionPool}
+
+
+class SharedHTTPAdapter(HTTPAdapter):
+    """
+    HTTPAdapter whose connection pools outlive the sessions it is mounted on.
+
+    Every upload gets its own ``requests.Session`` (cookies, proxy, headers) but
+    they all share these adapters, so keep-alive connections and TLS sessions
+    are reused across uploads.
+    """
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = _POOL_CLASSES
+
+    def proxy_manager_for(self, proxy, **proxy_kwargs):
+        manager = super().proxy_manager_for(proxy, **proxy_kwargs)
+        manager.pool_classes_by_scheme = _POOL_CLASSES
+        return manager
+
+    def send(self, request, **kwargs):
+        _stats._add("requests")
+        response = super().send(request, **kwargs)
+        _stats._response(response.status_code)
+        return response
+
+    def close(self):
+        # Sessions must not tear down pools shared with other uploads.
+        pass
+
+    def shutdown(self):
+        super().close()
+
+
+class RedirectingHTTPAdapter(SharedHTTPAdapter):
+    """
+    Sends requests for any host to one base URL, keeping path and query.
+
+    The session still sees the original URL, so cookies keep the TikTok
+    domains they would have in production.
+    """
+
+    def __init__(self, base_url: str, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.base_url = base_url
+
+    def send(self, request, **kwargs):
+        redirected = request.copy()
+        redirected.url = _redirect_url(request.url, self.base_url)
+        response = super().send(redirected, **kwargs)
+        response.request = request
+        response.url = request.url
+        return response
+
+
+_tiktok_adapter = SharedHTTPAdapter(pool_connections=4, pool_maxsize=TIKTOK_POOL_MAXSIZE)
+_upload_adapter = SharedHTTPAdapter(pool_connections=UPLOAD_POOL_HOSTS, pool_maxsize=UPLOAD_POOL_MAXSIZE)
+_redirect_adapters: Dict[str, RedirectingHTTPAdapter] = {}
+_redirect_lock = threading.Lock()
+
+
+def _redirect_adapter(base_url: str) -> RedirectingHTTPAdapter:
+    with _redirect_lock:
+        adapter = _redirect_adapters.get(base_url)
+        if adapter is None:
+            adapter = RedirectingHTTPAdapter(base_url, pool_connections=1, pool_maxsize=TIKTOK_POOL_MAXSIZE + UPLOAD_POOL_MAXSIZE)
+            _redirect_adapters[base_url] = adapter
+        return adapter
+
+
+_recording_adapters: Dict[tuple, RecordingHTTPAdapter] = {}
+
+
+def _recording_adapter(cassette: Cassette, inner: HTTPAdapter) -> RecordingHTTPAdapter:
+    with _cassette_lock:
+        key = (cassette.path, id(inner))
+        adapter = _recording_adapters.get(key)
+        if adapter is None:
+            adapter = RecordingHTTPAdapter(cassette, inner)
+            _recording_adapters[key] = adapter
+        return adapter
+
+
+def create_session() -> requests.Session:
+    """Return a fresh session (own cookies and headers) on the shared connection pools."""
+    session = requests.Session()
+    if _cassette_mode and _cassette_mode[0] == "replay":
+        adapter = ReplayHTTPAdapter(_cassette(_cassette_mode[1]), speed=_cassette_mode[2])
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    if _endpoint_override:
+        adapter = _redirect_adapter(_endpoint_override)
+        mounts = [("https://", adapter), ("http://", adapter)]
+    else:
+        mounts = [("https://", _upload_adapter), ("http://", _upload_adapter)]
+        mounts += [(prefix, _tiktok_adapter) for prefix in _TIKTOK_PREFIXES]
+    if _cassette_mode:
+        cassette = _cassette(_cassette_mode[1])
+        mounts = [(prefix, _recording_adapter(cassette, adapter)) for prefix, adapter in mounts]
+    for prefix, adapter in mounts:
+        session.mount(prefix, adapter)
+    return session
+
+
+if httpx is not None:
+
+    class SharedAsyncTransport(httpx.AsyncHTTPTransport):
+        """Async counterpart of ``SharedHTTPAdapter``: clients may close, the pool stays."""
+
+        async def handle_async_request(self, request):
+            _stats._add("requests")
+            response = await super().handle_async_request(request)
+            _stats._response(response.status_code)
+            return response
+
+        async def aclose(self) -> None:
+            pass
+
+        async def shutdown(self) -> None:
+            await super().aclose()
+
+    class RedirectingAsyncTransport(SharedAsyncTransport):
+        """Async counterpart of ``RedirectingHTTPAdapter``."""
+
+        def __init__(self, base_url: str, **kwargs) -> None:
+            super().__init__(**kwargs)
+            self.base_url = base_url
+
+        async def handle_async_request(self, request):
+            redirected = httpx.Request(
+                request.method,
+                _redirect_url(str(request.url), self.base_url),
+                headers=request.headers,
+                stream=request.stream,
+                extensions=request.extensions,
+            )
+            # The client attaches the original request to the response for cookie handling.
+            return await super().handle_async_request(redirected)
+
+
+# httpx pools are bound to the event loop that opened them, so they are shared per loop.
+_async_transports: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+
+def create_async_client(proxy: Optional[str] = None):
+    """
+    Return an ``httpx.AsyncClient`` on the connection pool shared by the running loop.
+
+    Like ``create_session`` each upload gets its own cookies and headers, while
+    connections to TikTok and the upload hosts are reused across uploads.
+    """
+    if httpx is None:
+        raise RuntimeError("The async upload engine requires httpx: pip install 'httpx>=0.27'")
+    loop = asyncio.get_running_loop()
+    transports = _async_transports.setdefault(loop, {})
+    key = (proxy, _endpoint_override, _cassette_mode)
+    transport = transports.get(key)
+    if transport is None:
+        limits = httpx.Limits(
+            max_connections=TIKTOK_POOL_MAXSIZE + UPLOAD_POOL_MAXSIZE * UPLOAD_POOL_HOSTS,
+            max_keepalive_connections=TIKTOK_POOL_MAXSIZE + UPLOAD_POOL_MAXSIZE,
+        )
+        if _cassette_mode and _cassette_mode[0] == "replay":
+            transport = http_cassette.ReplayAsyncTransport(_cassette(_cassette_mode[1]), speed=_cassette_mode[2])
+        elif _endpoint_override:
+            transport = RedirectingAsyncTransport(_endpoint_override, proxy=proxy, limits=limits)
+        else:
+            transport = SharedAsyncTransport(proxy=proxy, limits=limits)
+        if _cassette_mode and _cassette_mode[0] == "record":
+            transport = http_cassette.RecordingAsyncTransport(_cassette(_cassette_mode[1]), transport)
+        transports[key] = transport
+    # requests follows redirects by default; keep both engines on the same wire behaviour.
+    return httpx.AsyncClient(transport=transport, follow_redirects=True, timeout=None)
+
+
+async def shutdown_async() -> None:
+    """Close the async pools opened by the running loop."""
+    transports = _async_transports.pop(asyncio.get_running_loop(), {})
+    for transport in transports.values():
+        await transport.shutdown()
+
+
+def transport_stats() -> Dict[str, int]:
+    """Return request, connection, TLS handshake, HTTP error and TikTok API error counts for the process."""
+    return _stats.snapshot()
+
+
+def record_api_status(step: str, response) -> None:
+    """Count the reply of an upload ``step`` whose JSON ``status_code`` reports a TikTok error."""
+    try:
+        status_code = response.json().get("status_code")
+    except (ValueError, AttributeError):
+        return
+    if status_code not in (None, 0, "0"):
+        _stats._api_error(step, str(status_code))
+
+
+def prewarm(hosts: Optional[Iterable[str]] = None, timeout: float = 5.0) -> int:
+    """
+    Open pooled connections to ``hosts`` ahead of the first upload.
+
+    Returns the number of hosts that answered; failures are ignored since the
+    real requests will simply connect on demand.
+    """
+    hosts = tuple(hosts) if hosts is not None else PREWARM_HOSTS
+    if not hosts:
+        return 0
+    session = create_session()
+
+    def warm(host: str) -> bool:
+        try:
+            session.head(f"https://{host}/", timeout=timeout, allow_redirects=False)
+            return True
+        except requests.RequestException:
+            return False
+
+    with ThreadPoolExecutor(max_workers=len(hosts), thread_name_prefix="tiktok-prewarm") as pool:
+        return sum(pool.map(warm, hosts))
+
+
+def prewarm_in_background(hosts: Optional[Iterable[str]] = None) -> Optional[threading.Thread]:
+    """Start ``prewarm`` on a daemon thread when ``TIKTOK_HTTP_PREWARM`` allows it."""
+    if not PREWARM_ENABLED:
+        return None
+    thread = threading.Thread(target=prewarm, args=(hosts,), name="tiktok-prewarm", daemon=True)
+    thread.start()
+    return thread
+
+
+def shutdown() -> None:
+    """Close every pooled connection; only needed when the process is exiting."""
+    _tiktok_adapter.shutdown()
+    _upload_adapter.shutdown()
+    for adapter in list(_redirect_adapters.values()):
+        adapter.shutdown()
@@ -0,0 +1,840 @@
+import asyncio
+import json
+import os
+import random
+import shutil
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import Executor, ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from .Config import Config
+from .bandwidth import DEFAULT_PRIORITY, PRIORITY_WEIGHTS
+from .upload_trace import UploadTrace
+from .upload_transfer import UploadSessionRejected, UploadTransferError
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+
+QUEUED = "queued"
+PREPARING = "preparing"
+TRANSFERRING = "transferring"
+PUBLISHING = "publishing"
+DONE = "done"
+FAILED = "failed"
+STATES = (QUEUED, PREPARING, TRANSFERRING, PUBLISHING, DONE, FAILED)
+ACTIVE_STATES = (PREPARING, TRANSFERRING, PUBLISHING)
+FINAL_STATES = (DONE, FAILED)
+
+# A claimed job belongs to its worker for this long; workers renew the lease while they run.
+JOB_LEASE_SECONDS = int(os.getenv("TIKTOK_JOB_LEASE_SECONDS", "120"))
+# Attempts per job: crashed workers (expired leases) and transient errors are retried, rejections are not.
+JOB_MAX_ATTEMPTS = int(os.getenv("TIKTOK_JOB_MAX_ATTEMPTS", "3"))
+JOB_RETRY_BASE_DELAY_SECONDS = float(os.getenv("TIKTOK_JOB_RETRY_BASE_DELAY_SECONDS", "30"))
+JOB_WORKERS = int(os.getenv("TIKTOK_JOB_WORKERS", "2"))
+# Where the API stages uploaded files (default STATE_DIR/spool); a tmpfs such as /dev/shm keeps them off the disk.
+SPOOL_DIR = os.getenv("TIKTOK_SPOOL_DIR", "")
+_POLL_SECONDS = 1.0
+# TikTok's shortest scheduling lead time (see tiktok._validate_upload_params).
+_MIN_SCHEDULE_SECONDS = 900
+
+# Trace phases that move a running job to the next state.
+_PHASE_STATES = {
+    "transfer": TRANSFERRING,
+    "finish": TRANSFERRING,
+    "commit_upload": TRANSFERRING,
+    "preflight": PUBLISHING,
+    "mentions": PUBLISHING,
+    "sign": PUBLISHING,
+    "publish": PUBLISHING,
+}
+_PRIORITY_RANKS = {name: rank for rank, name in enumerate(sorted(PRIORITY_WEIGHTS, key=PRIORITY_WEIGHTS.get, reverse=True))}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    state TEXT NOT NULL,
+    source TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    priority INTEGER NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    not_before REAL NOT NULL DEFAULT 0,
+    lease_owner TEXT,
+    lease_expires REAL,
+    message TEXT,
+    error TEXT,
+    result TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_pending ON jobs (state, priority, created_at);
+CREATE INDEX IF NOT EXISTS jobs_finished ON jobs (finished_at);
+CREATE TABLE IF NOT EXISTS job_keys (
+    key TEXT PRIMARY KEY,
+    job_id TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+"""
+
+
+def _queue_path() -> Path:
+    base_dir = Path(Config.get().state_dir)
+    if not base_dir.is_absolute():
+        base_dir = Path.cwd() / base_dir
+    base_dir.mkdir(parents=True, exist_ok=True)
+    return base_dir / "jobs.sqlite3"
+
+
+def spool_dir(job_id: str) -> Path:
+    """Directory under ``SPOOL_DIR`` (``STATE_DIR/spool``) for files a queued job needs; removed when it ends."""
+    base_dir = (Path(SPOOL_DIR) if SPOOL_DIR else _queue_path().parent / "spool") / job_id
+    base_dir.mkdir(parents=True, exist_ok=True)
+    return base_dir
+
+
+@dataclass
+class Job:
+    id: str
+    state: str
+    source: str
+    payload: Dict
+    priority: int
+    attempts: int
+    max_attempts: int
+    lease_owner: Optional[str]
+    message: Optional[str]
+    error: Optional[str]
+    result: Optional[Dict]
+    created_at: float
+    updated_at: float
+    started_at: Optional[float]
+    finished_at: Optional[float]
+
+    @classmethod
+    def from_row(cls, row: sqlite3.Row) -> "Job":
+        return cls(
+            id=row["id"],
+            state=row["state"],
+            source=row["source"],
+            payload=json.loads(row["payload"]),
+            priority=row["priority"],
+            attempts=row["attempts"],
+            max_attempts=row["max_attempts"],
+            lease_owner=row["lease_owner"],
+            message=row["message"],
+            error=row["error"],
+            result=json.loads(row["result"]) if row["result"] else None,
+            created_at=row["created_at"],
+            updated_at=row["updated_at"],
+            started_at=row["started_at"],
+            finished_at=row["finished_at"],
+        )
+
+    @property
+    def finished(self) -> bool:
+        return self.state in FINAL_STATES
+
+    def to_dict(self, include_result: bool = True) -> Dict:
+        payload = {
+            "id": self.id,
+            "state": self.state,
+            "source": self.source,
+            "attempts": self.attempts,
+            "max_attempts": self.max_attempts,
+            "message": self.message,
+            "error": self.error,
+            "result": self.result,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+        if not include_result:
+            payload.pop("result")
+        return payload
+
+
+class JobQueue:
+    """
+    Upload jobs in a SQLite database (``STATE_DIR/jobs.sqlite3``).
+
+    CLI, GUI and API submit here and worker pools in any of those processes
+    drain it. A worker claims a job with a lease and renews it while the job
+    runs; a job whose lease expires (the worker crashed or the process was
+    killed) is claimed again by the next worker and counts as another
+    attempt. The transfer journal then resumes its upload where it stopped.
+    """
+
+    def __init__(self, path: Optional[Path] = None) -> None:
+        self.path = Path(path or _queue_path())
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit; writes that read first use BEGIN IMMEDIATE so two workers never claim one job.
+            conn = sqlite3.connect(str(self.path), timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def submit(
+        self,
+        payload: Dict,
+        source: str,
+        priority: Optional[str] = None,
+        max_attempts: int = JOB_MAX_ATTEMPTS,
+        job_id: Optional[str] = None,
+        keys: Iterable[str] = (),
+    ) -> str:
+        """
+        Queue an upload; ``payload`` holds the ``upload_video`` arguments (see ``run_upload_job``).
+
+        ``keys`` (idempotency keys, content hashes) are mapped to the new job
+        so ``find_by_key`` sends repeated requests to it.
+        """
+        job_id = job_id or uuid.uuid4().hex
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._insert(conn, job_id, payload, source, priority, max_attempts, keys)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return job_id
+
+    def submit_unless_known(
+        self,
+        payload: Dict,
+        source: str,
+        keys: List[str],
+        max_age: float,
+        priority: Optional[str] = None,
+        max_attempts: int = JOB_MAX_ATTEMPTS,
+        job_id: Optional[str] = None,
+    ) -> Tuple[Job, bool]:
+        """
+        ``submit`` unless ``find_by_key(keys[0], max_age)`` has a job already.
+
+        Returns the job and whether it was queued now; a known job is mapped to
+        the other ``keys`` as well. Lookup and insert are one transaction, so
+        identical requests cannot both get through, even from two processes.
+        """
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            existing = self._find_by_key(conn, keys[0], max_age)
+            if existing is not None:
+                self._add_keys(conn, existing.id, keys[1:])
+            else:
+                job_id = self._insert(conn, job_id or uuid.uuid4().hex, payload, source, priority, max_attempts, keys)
+            job = existing or Job.from_row(conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone())
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return job, existing is None
+
+    def _insert(self, conn: sqlite3.Connection, job_id: str, payload: Dict, source: str, priority: Optional[str], max_attempts: int, keys: Iterable[str]) -> str:
+        now = time.time()
+        if payload.get("schedule_time"):
+            # A job may wait in the queue; the post still goes live at the time asked for.
+            payload = dict(payload, schedule_at=now + payload["schedule_time"])
+        conn.execute(
+            "INSERT INTO jobs (id, state, source, payload, priority, max_attempts, created_at, updated_at)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (job_id, QUEUED, source, json.dumps(payload), _PRIORITY_RANKS[priority or DEFAULT_PRIORITY], max(1, max_attempts), now, now),
+        )
+        self._add_keys(conn, job_id, keys)
+        return job_id
+
+    @staticmethod
+    def _add_keys(conn: sqlite3.Connection, job_id: str, keys: Iterable[str]) -> None:
+        now = time.time()
+        conn.executemany(
+            "INSERT OR REPLACE INTO job_keys (key, job_id, created_at) VALUES (?, ?, ?)",
+            [(key, job_id, now) for key in keys],
+        )
+
+    def add_keys(self, job_id: str, keys: Iterable[str]) -> None:
+        self._add_keys(self._connect(), job_id, keys)
+
+    def find_by_key(self, key: str, max_age: float) -> Optional[Job]:
+        """The job ``key`` was mapped to within ``max_age`` seconds, unless it failed (a retry may run again)."""
+        return self._find_by_key(self._connect(), key, max_age)
+
+    @staticmethod
+    def _find_by_key(conn: sqlite3.Connection, key: str, max_age: float) -> Optional[Job]:
+        row = conn.execute(
+            "SELECT jobs.* FROM job_keys JOIN jobs ON jobs.id = job_keys.job_id"
+            " WHERE job_keys.key = ? AND job_keys.created_at >= ? AND jobs.state != ?",
+            (key, time.time() - max_age, FAILED),
+        ).fetchone()
+        return Job.from_row(row) if row else None
+
+    def claim(self, worker_id: str, job_ids: Optional[Iterable[str]] = None, lease_seconds: int = JOB_LEASE_SECONDS) -> Optional[Job]:
+        """
+        Take the most urgent runnable job, or None.
+
+        Queued jobs go by priority, then age; running jobs whose lease expired
+        are queued again first. ``job_ids`` restricts the claim to those jobs.
+        """
+        now = time.time()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._expire_leases(conn, now)
+            query = "SELECT * FROM jobs WHERE state = ? AND not_before <= ?"
+            params: List = [QUEUED, now]
+            if job_ids is not None:
+                job_ids = list(job_ids)
+                if not job_ids:
+                    conn.execute("COMMIT")
+                    return None
+                query += f" AND id IN ({','.join('?' * len(job_ids))})"
+                params += job_ids
+            row = conn.execute(query + " ORDER BY priority, created_at LIMIT 1", params).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE jobs SET state = ?, attempts = attempts + 1, lease_owner = ?, lease_expires = ?,"
+                " started_at = COALESCE(started_at, ?), updated_at = ?, error = NULL WHERE id = ?",
+                (PREPARING, worker_id, now + lease_seconds, now, now, row["id"]),
+            )
+            claimed = conn.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone()
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return Job.from_row(claimed)
+
+    def _expire_leases(self, conn: sqlite3.Connection, now: float) -> None:
+        # Jobs of dead workers go back to the queue, or fail once they are out of attempts.
+        conn.execute(
+            "UPDATE jobs SET state = ?, lease_owner = NULL, lease_expires = NULL, updated_at = ?,"
+            " error = 'worker lease expired' WHERE state IN (?, ?, ?) AND lease_expires < ? AND attempts < max_attempts",
+            (QUEUED, now) + ACTIVE_STATES + (now,),
+        )
+        conn.execute(
+            "UPDATE jobs SET state = ?, lease_owner = NULL, lease_expires = NULL, updated_at = ?, finished_at = ?,"
+            " error = 'worker lease expired' WHERE state IN (?, ?, ?) AND lease_expires < ?",
+            (FAILED, now, now) + ACTIVE_STATES + (now,),
+        )
+
+    def renew(self, job_id: str, worker_id: str, lease_seconds: int = JOB_LEASE_SECONDS) -> bool:
+        """Extend a running job's lease; False when the job is no longer this worker's."""
+        now = time.time()
+        cursor = self._connect().execute(
+            "UPDATE jobs SET lease_expires = ? WHERE id = ? AND lease_owner = ? AND state IN (?, ?, ?)",
+            (now + lease_seconds, job_id, worker_id) + ACTIVE_STATES,
+        )
+        return cursor.rowcount == 1
+
+    def update(self, job_id: str, worker_id: str, state: Optional[str] = None, message: Optional[str] = None) -> None:
+        """Record progress of a running job: a later state and/or the latest status message."""
+        now = time.time()
+        if state is not None:
+            # States only move forward, even if the engine reports phases out of order.
+            earlier = ACTIVE_STATES[:ACTIVE_STATES.index(state)]
+            self._connect().execute(
+                f"UPDATE jobs SET state = ?, updated_at = ? WHERE id = ? AND lease_owner = ? AND state IN ({','.join('?' * len(earlier))})",
+                (state, now, job_id, worker_id) + earlier,
+            )
+        if message is not None:
+            self._connect().execute(
+                "UPDATE jobs SET message = ?, updated_at = ? WHERE id = ? AND lease_owner = ?",
+                (message[:500], now, job_id, worker_id),
+            )
+
+    def complete(self, job_id: str, worker_id: str, result: Optional[Dict] = None) -> None:
+        now = time.time()
+        self._connect().execute(
+            "UPDATE jobs SET state = ?, result = ?, lease_owner = NULL, lease_expires = NULL, error = NULL,"
+            " updated_at = ?, finished_at = ? WHERE id = ? AND lease_owner = ?",
+            (DONE, json.dumps(result) if result is not None else None, now, now, job_id, worker_id),
+        )
+
+    def fail(self, job_id: str, worker_id: str, error: str, retry: bool = False, result: Optional[Dict] = None) -> str:
+        """
+        Record a failed attempt. With ``retry`` and attempts left the job is
+        queued again after an exponential backoff; returns the new state.
+        """
+        now = time.time()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT attempts, max_attempts FROM jobs WHERE id = ? AND lease_owner = ?", (job_id, worker_id)).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return FAILED
+            encoded = json.dumps(result) if result is not None else None
+            if retry and row["attempts"] < row["max_attempts"]:
+                delay = JOB_RETRY_BASE_DELAY_SECONDS * (2 ** (row["attempts"] - 1)) * random.uniform(0.5, 1.0)
+                state = QUEUED
+                conn.execute(
+                    "UPDATE jobs SET state = ?, error = ?, result = ?, not_before = ?, lease_owner = NULL,"
+                    " lease_expires = NULL, updated_at = ? WHERE id = ?",
+                    (QUEUED, error, encoded, now + delay, now, job_id),
+                )
+            else:
+                state = FAILED
+                conn.execute(
+                    "UPDATE jobs SET state = ?, error = ?, result = ?, lease_owner = NULL, lease_expires = NULL,"
+                    " updated_at = ?, finished_at = ? WHERE id = ?",
+                    (FAILED, error, encoded, now, now, job_id),
+                )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return state
+
+    def get(self, job_id: str) -> Optional[Job]:
+        row = self._connect().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return Job.from_row(row) if row else None
+
+    def list_jobs(self, states: Optional[Iterable[str]] = None, limit: Optional[int] = 50) -> List[Job]:
+        """Most recently updated jobs first, optionally only in ``states``; ``limit=None`` lists all."""
+        query = "SELECT * FROM jobs"
+        params: List = []
+        if states:
+            states = list(states)
+            query += f" WHERE state IN ({','.join('?' * len(states))})"
+            params += states
+        # SQLite reads a negative LIMIT as no limit.
+        rows = self._connect().execute(query + " ORDER BY updated_at DESC LIMIT ?", params + [-1 if limit is None else limit]).fetchall()
+        return [Job.from_row(row) for row in rows]
+
+    def depth(self) -> int:
+        """Jobs waiting to be claimed."""
+        return self._connect().execute("SELECT COUNT(*) FROM jobs WHERE state = ?", (QUEUED,)).fetchone()[0]
+
+    def stats(self, window_seconds: int = 3600) -> Dict:
+        """Queue depth per state and throughput over the last ``window_seconds``."""
+        now = time.time()
+        conn = self._connect()
+        counts = {state: 0 for state in STATES}
+        for row in conn.execute("SELECT state, COUNT(*) AS n FROM jobs GROUP BY state"):
+            counts[row["state"]] = row["n"]
+        recent = conn.execute(
+            "SELECT state, COUNT(*) AS n, AVG(finished_at - started_at) AS avg_s FROM jobs"
+            " WHERE finished_at >= ? GROUP BY state",
+            (now - window_seconds,),
+        ).fetchall()
+        finished = {row["state"]: row for row in recent}
+        oldest = conn.execute("SELECT MIN(created_at) AS t FROM jobs WHERE state = ?", (QUEUED,)).fetchone()["t"]
+        done = finished[DONE]["n"] if DONE in finished else 0
+        return {
+            "states": counts,
+            "depth": counts[QUEUED],
+            "running": sum(counts[state] for state in ACTIVE_STATES),
+            "window_seconds": window_seconds,
+            "done": done,
+            "failed": finished[FAILED]["n"] if FAILED in finished else 0,
+            "per_hour": round(done * 3600 / window_seconds, 1),
+            "avg_duration_s": round(finished[DONE]["avg_s"], 1) if done and finished[DONE]["avg_s"] is not None else None,
+            "oldest_queued_s": round(now - oldest, 1) if oldest else None,
+        }
+
+    def prune(self, older_than_seconds: float) -> int:
+        """Delete finished jobs older than this (and any spool files left behind); returns how many."""
+        cutoff = time.time() - older_than_seconds
+        conn = self._connect()
+        rows = conn.execute("SELECT * FROM jobs WHERE state IN (?, ?) AND finished_at < ?", FINAL_STATES + (cutoff,)).fetchall()
+        for row in rows:
+            _cleanup(Job.from_row(row))
+        conn.execute("DELETE FROM jobs WHERE state IN (?, ?) AND finished_at < ?", FINAL_STATES + (cutoff,))
+        conn.execute("DELETE FROM job_keys WHERE created_at < ? OR job_id NOT IN (SELECT id FROM jobs)", (cutoff,))
+        return len(rows)
+
+
+class _JobTrace(UploadTrace):
+    """Upload trace that moves the job to the state of each phase the engine begins."""
+
+    def __init__(self, video, on_state: Callable[[str], None]) -> None:
+        super().__init__(video)
+        self._on_state = on_state
+        # Set once the publish request may have reached TikTok; from then on a retry could post twice.
+        self.publish_sent = False
+
+    def begin(self, name: str) -> None:
+        super().begin(name)
+        if name == "publish":
+            self.publish_sent = True
+        state = _PHASE_STATES.get(name)
+        if state is not None:
+            try:
+                self._on_state(state)
+            except sqlite3.Error:
+                pass
+
+
+def _prepare_source(payload: Dict, report: Callable[[str], None]) -> str:
+    """Download YouTube sources and run the optional upscale; returns the file to upload."""
+    video_path = payload["video"]
+    if payload.get("youtube"):
+        from .Video import Video
+
+        report("Downloading the YouTube video.")
+        video = Video(video_path, payload.get("title", ""), status_callback=report)
+        try:
+            video.is_valid_file_format()
+        except SystemExit as exc:
+            raise RuntimeError(str(exc)) from None
+        video_path = video.source_ref
+        if not video_path or not os.path.exists(video_path):
+            raise RuntimeError("YouTube download failed; no video file was produced.")
+    if payload.get("upscale_with_videotoolbox"):
+        from .videotoolbox_upscale import upscale_video_with_videotoolbox
+
+        report("Upscaling the video to 4K with VideoToolbox Super Resolution.")
+        video_path = upscale_video_with_videotoolbox(video_path)
+    return video_path
+
+
+_UPLOAD_ARGUMENTS = (
+    "schedule_time", "allow_comment", "allow_duet", "allow_stitch", "visibility_type",
+    "brand_organic_type", "branded_content_type", "ai_label", "proxy", "datacenter", "priority",
+)
+
+
+def _upload_kwargs(payload: Dict, trace: UploadTrace, report: Callable[[str], None]) -> Dict:
+    kwargs = {name: payload[name] for name in _UPLOAD_ARGUMENTS if payload.get(name) is not None}
+    if payload.get("schedule_at"):
+        # Time spent queued shortens the lead time; a post due within TikTok's minimum goes out at the minimum.
+        kwargs["schedule_time"] = max(_MIN_SCHEDULE_SECONDS, int(payload["schedule_at"] - time.time()))
+    return dict(kwargs, status_callback=report, trace=trace)
+
+
+def run_upload_job(job: Job, trace: UploadTrace, report: Callable[[str], None]) -> bool:
+    """
+    Run one job with ``tiktok.upload_video``.
+
+    ``payload`` keys: ``session_file``, ``video`` (path, or URL with
+    ``youtube``), ``title``, ``upscale_with_videotoolbox`` and the keyword
+    arguments of ``upload_video`` (``schedule_time``, ``visibility_type``, ...).
+    """
+    from . import tiktok
+
+    payload = job.payload
+    video_path = _prepare_source(payload, report)
+    return tiktok.upload_video(payload["session_file"], video_path, payload.get("title", ""), **_upload_kwargs(payload, trace, report))
+
+
+async def run_upload_job_async(job: Job, trace: UploadTrace, report: Callable[[str], None]) -> bool:
+    """``run_upload_job`` on the asyncio engine; source preparation runs in a thread."""
+    from .tiktok_async import upload_video_async
+
+    payload = job.payload
+    video_path = await asyncio.to_thread(_prepare_source, payload, report)
+    return await upload_video_async(payload["session_file"], video_path, payload.get("title", ""), **_upload_kwargs(payload, trace, report))
+
+
+def _cleanup(job: Job) -> None:
+    cleanup_dir = job.payload.get("cleanup_dir")
+    if cleanup_dir:
+        shutil.rmtree(cleanup_dir, ignore_errors=True)
+
+
+def _worker_id(name: str) -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{name}"
+
+
+def _is_transient(error: BaseException) -> bool:
+    """True for failures a later attempt can get past: network and disk errors, 5xx answers."""
+    if isinstance(error, UploadSessionRejected):
+        return False
+    response = getattr(error, "response", None)
+    status = getattr(response, "status_code", None) if response is not None else getattr(error, "status_code", None)
+    if status is not None:
+        return status >= 500
+    # requests' exceptions are OSErrors too.
+    if isinstance(error, (OSError, UploadTransferError)):
+        return True
+    return httpx is not None and isinstance(error, httpx.TransportError)
+
+
+# (job, state, message): state changes and status lines of the jobs a pool runs.
+JobListener = Callable[[Job, str, Optional[str]], None]
+
+
+class _Execution:
+    """Bookkeeping shared by the thread and asyncio pools for one claimed job."""
+
+    def __init__(self, queue: JobQueue, job: Job, worker_id: str, listener: Optional[JobListener], writer: Optional[Executor] = None) -> None:
+        self.queue = queue
+        self.job = job
+        self.worker_id = worker_id
+        self.listener = listener
+        # Set by the asyncio pool: progress is written by its single writer thread, in order, off the event loop.
+        self._writer = writer
+        self.trace = _JobTrace(job.payload.get("video"), self.set_state)
+        self.failure: Optional[str] = None
+        self._notify(job.state, None)
+
+    def _notify(self, state: str, message: Optional[str]) -> None:
+        if self.listener:
+            try:
+                self.listener(self.job, state, message)
+            except Exception:
+                pass
+
+    def _update(self, **changes) -> None:
+        if self._writer is None:
+            self.queue.update(self.job.id, self.worker_id, **changes)
+        else:
+            self._writer.submit(self._update_quietly, changes)
+
+    def _update_quietly(self, changes: Dict) -> None:
+        try:
+            self.queue.update(self.job.id, self.worker_id, **changes)
+        except sqlite3.Error:
+            pass
+
+    def set_state(self, state: str) -> None:
+        self._update(state=state)
+        self.job.state = state
+        self._notify(state, None)
+
+    def report(self, message: str) -> None:
+        message = str(message)
+        if message.lstrip().startswith("[-]"):
+            self.failure = message
+        try:
+            self._update(message=message)
+        except sqlite3.Error:
+            pass
+        self._notify(self.job.state, message)
+
+    def finish(self, ok: bool, error: Optional[BaseException]) -> str:
+        result = self.trace.to_dict()
+        if ok:
+            self.queue.complete(self.job.id, self.worker_id, result)
+            state = DONE
+        elif error is not None and self.trace.publish_sent:
+            # The post may be live already: leave the job failed for someone to check instead of posting again.
+            message = f"{str(error) or type(error).__name__} (after the publish request was sent; check TikTok before retrying)"
+            state = self.queue.fail(self.job.id, self.worker_id, message, result=result)
+        elif error is not None:
+            # Network and disk errors are retried; anything else (a bad session, a broken video) fails right away.
+            state = self.queue.fail(self.job.id, self.worker_id, str(error) or type(error).__name__, retry=_is_transient(error), result=result)
+        else:
+            # upload_video returned False: TikTok or validation rejected it, retrying will not help.
+            state = self.queue.fail(self.job.id, self.worker_id, self.failure or "upload failed", result=result)
+        if state in FINAL_STATES:
+            _cleanup(self.job)
+        self.job.state = state
+        # Listeners see the attempt's trace, also when the job is queued again for a retry.
+        self.job.result = result
+        self._notify(state, None)
+        return state
+
+
+class JobWorkerPool:
+    """
+    Threads that drain the queue with ``run_upload_job``.
+
+    ``job_ids`` limits the pool to those jobs (a CLI run waiting for its own
+    uploads); otherwise every runnable job is taken, including work left over
+    from earlier runs. ``listener`` sees state changes and status messages.
+    """
+
+    def __init__(self, queue: JobQueue, workers: int = JOB_WORKERS, job_ids: Optional[Iterable[str]] = None, listener: Optional[JobListener] = None, runner=run_upload_job) -> None:
+        self.queue = queue
+        self.workers = max(1, workers)
+        self.job_ids = set(job_ids) if job_ids is not None else None
+        self.listener = listener
+        self.runner = runner
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._running: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def start(self) -> "JobWorkerPool":
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._work, args=(_worker_id(f"w{index}-{uuid.uuid4().hex[:6]}"),), name=f"tiktok-job-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        keeper = threading.Thread(target=self._renew_leases, name="tiktok-job-leases", daemon=True)
+        keeper.start()
+        self._threads.append(keeper)
+        return self
+
+    @property
+    def busy(self) -> bool:
+        """True while a worker of this pool is running a job."""
+        with self._lock:
+            return bool(self._running)
+
+    def _pending_ids(self) -> Optional[List[str]]:
+        if self.job_ids is None:
+            return None
+        with self._lock:
+            return [job_id for job_id in self.job_ids if job_id not in self._running]
+
+    def _work(self, worker_id: str) -> None:
+        while not self._stop.is_set():
+            try:
+                job = self.queue.claim(worker_id, job_ids=self._pending_ids())
+            except sqlite3.Error:
+                job = None
+            if job is None:
+                self._stop.wait(_POLL_SECONDS)
+                continue
+            with self._lock:
+                self._running[job.id] = worker_id
+            execution = _Execution(self.queue, job, worker_id, self.listener)
+            ok, error = False, None
+            try:
+                ok = bool(self.runner(job, execution.trace, execution.report))
+            except Exception as exc:
+                error = exc
+            try:
+                execution.finish(ok, error)
+            finally:
+                with self._lock:
+                    self._running.pop(job.id, None)
+
+    def _renew_leases(self) -> None:
+        while not self._stop.wait(max(1.0, JOB_LEASE_SECONDS / 3)):
+            with self._lock:
+                running = list(self._running.items())
+            for job_id, worker_id in running:
+                try:
+                    self.queue.renew(job_id, worker_id)
+                except sqlite3.Error:
+                    pass
+
+    def wait(self, job_ids: Iterable[str], timeout: Optional[float] = None) -> List[Job]:
+        """Block until every job in ``job_ids`` is done or failed; returns them in order."""
+        job_ids = list(job_ids)
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while True:
+            jobs = [self.queue.get(job_id) for job_id in job_ids]
+            if all(job is None or job.finished for job in jobs):
+                return [job for job in jobs if job is not None]
+            if deadline is not None and time.monotonic() >= deadline:
+                return [job for job in jobs if job is not None]
+            time.sleep(0.2)
+
+    def stop(self, wait: bool = True) -> None:
+        """Stop claiming jobs; with ``wait`` the running ones finish first."""
+        self._stop.set()
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+
+class AsyncJobWorkerPool:
+    """``JobWorkerPool`` for an event loop: jobs run on the asyncio engine (the API)."""
+
+    def __init__(self, queue: JobQueue, workers: int = JOB_WORKERS, listener: Optional[JobListener] = None, runner=run_upload_job_async) -> None:
+        self.queue = queue
+        self.workers = max(1, workers)
+        self.listener = listener
+        self.runner = runner
+        self._running: Dict[str, str] = {}
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._writer: Optional[ThreadPoolExecutor] = None
+
+    def start(self) -> "AsyncJobWorkerPool":
+        self._wakeup = asyncio.Event()
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tiktok-job-writer")
+        self._tasks = [asyncio.create_task(self._work(_worker_id(f"a{index}-{uuid.uuid4().hex[:6]}"))) for index in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._renew_leases()))
+        return self
+
+    def notify(self) -> None:
+        """Wake idle workers right away, e.g. after this process submitted a job."""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _idle(self) -> None:
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), _POLL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+        self._wakeup.clear()
+
+    async def _work(self, worker_id: str) -> None:
+        while True:
+            try:
+                job = await asyncio.to_thread(self.queue.claim, worker_id)
+            except sqlite3.Error:
+                job = None
+            if job is None:
+                await self._idle()
+                continue
+            self._running[job.id] = worker_id
+            execution = _Execution(self.queue, job, worker_id, self.listener, writer=self._writer)
+            ok, error = False, None
+            try:
+                ok = bool(await self.runner(job, execution.trace, execution.report))
+            except asyncio.CancelledError:
+                # Shutdown: the lease expires and another worker picks the job up again.
+                self._running.pop(job.id, None)
+                raise
+            except Exception as exc:
+                error = exc
+            try:
+                # After the progress writes still queued for this job.
+                await asyncio.wrap_future(self._writer.submit(execution.finish, ok, error))
+            finally:
+                self._running.pop(job.id, None)
+
+    async def _renew_leases(self) -> None:
+        while True:
+            await asyncio.sleep(max(1.0, JOB_LEASE_SECONDS / 3))
+            for job_id, worker_id in list(self._running.items()):
+                try:
+                    await asyncio.to_thread(self.queue.renew, job_id, worker_id)
+                except sqlite3.Error:
+                    pass
+
+    async def wait(self, job_id: str, poll_seconds: float = 0.5) -> Optional[Job]:
+        """Wait until ``job_id`` is done or failed, whichever process runs it."""
+        while True:
+            job = await asyncio.to_thread(self.queue.get, job_id)
+            if job is None or job.finished:
+                return job
+            await asyncio.sleep(poll_seconds)
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._writer is not None:
+            await asyncio.to_thread(self._writer.shutdown)
+            self._writer = None
+
+
+_queue: Optional[JobQueue] = None
+_queue_lock = threading.Lock()
+
+
+def get_job_queue() -> JobQueue:
+    """Return the process-wide queue backed by ``STATE_DIR/jobs.sqlite3``."""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = JobQueue()
+        return _queue
@@ -0,0 +1,143 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple, Type
+
+from .Config import Config
+from .basics import write_json_atomic
+from .bot_utils import MENTION_LOOKUP_HEADERS, extract_mentions, extract_user_id, profile_url
+
+
+# user ids never change, but a username can be released and taken by another account.
+MENTION_CACHE_TTL_SECONDS = int(os.getenv("TIKTOK_MENTION_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+MENTION_LOOKUP_CONCURRENCY = int(os.getenv("TIKTOK_MENTION_LOOKUP_CONCURRENCY", "4"))
+
+# Runs whole-caption resolutions started ahead of publish; lookups get their own pool.
+_background = ThreadPoolExecutor(max_workers=2, thread_name_prefix="tiktok-mentions")
+
+
+def _cache_path() -> Path:
+    base_dir = Path(Config.get().state_dir)
+    if not base_dir.is_absolute():
+        base_dir = Path.cwd() / base_dir
+    base_dir.mkdir(parents=True, exist_ok=True)
+    return base_dir / "mentions.json"
+
+
+class MentionResolver:
+    """
+    Resolve @mentions to TikTok user ids with an on-disk cache.
+
+    Cache misses are looked up concurrently. Usernames that cannot be resolved
+    are left out of the result, so ``convert_tags`` falls back to its own
+    lookup and reports the failure as before.
+    """
+
+    def __init__(self, path: Optional[Path] = None, ttl_seconds: int = MENTION_CACHE_TTL_SECONDS) -> None:
+        self.path = path or _cache_path()
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict] = self._read()
+
+    def _read(self) -> Dict[str, Dict]:
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return data if isinstance(data, dict) else {}
+
+    def cached(self, usernames: Iterable[str]) -> Dict[str, str]:
+        now = time.time()
+        hits = {}
+        with self._lock:
+            for username in usernames:
+                entry = self._entries.get(username.lower())
+                if entry and now - entry.get("resolved_at", 0) <= self.ttl_seconds:
+                    hits[username] = entry["user_id"]
+        return hits
+
+    def _store(self, resolved: Dict[str, str]) -> None:
+        if not resolved:
+            return
+        now = time.time()
+        with self._lock:
+            # Merge with the file so concurrent processes do not drop each other's entries.
+            entries = self._read()
+            entries.update(self._entries)
+            for username, user_id in resolved.items():
+                entries[username.lower()] = {"user_id": user_id, "resolved_at": now}
+            self._entries = entries
+            try:
+                write_json_atomic(self.path, entries, mode=0o644)
+            except OSError:
+                pass
+
+    @staticmethod
+    def _misses(usernames: Iterable[str], hits: Dict[str, str]) -> List[str]:
+        return sorted(set(usernames) - set(hits))
+
+    def resolve(self, session, usernames: Iterable[str]) -> Dict[str, str]:
+        """Return ``username -> user_id`` for ``usernames`` using a requests session."""
+        usernames = list(usernames)
+        result = self.cached(usernames)
+        misses = self._misses(usernames, result)
+        if not misses:
+            return result
+
+        def lookup(username):
+            try:
+                r = session.get(profile_url(username), headers=MENTION_LOOKUP_HEADERS)
+                return username, extract_user_id(r.text)
+            except (OSError, IndexError):
+                return username, None
+
+        with ThreadPoolExecutor(max_workers=min(len(misses), MENTION_LOOKUP_CONCURRENCY), thread_name_prefix="tiktok-mention") as pool:
+            resolved = {username: user_id for username, user_id in pool.map(lookup, misses) if user_id}
+        self._store(resolved)
+        result.update(resolved)
+        return result
+
+    async def resolve_async(self, client, usernames: Iterable[str], network_errors: Tuple[Type[BaseException], ...] = ()) -> Dict[str, str]:
+        """Coroutine version of ``resolve``; ``network_errors`` are the async client's exceptions."""
+        usernames = list(usernames)
+        result = self.cached(usernames)
+        misses = self._misses(usernames, result)
+        if not misses:
+            return result
+
+        limit = asyncio.Semaphore(MENTION_LOOKUP_CONCURRENCY)
+
+        async def lookup(username):
+            async with limit:
+                try:
+                    r = await client.get(profile_url(username), headers=MENTION_LOOKUP_HEADERS)
+                    return username, extract_user_id(r.text)
+                except (OSError, IndexError) + network_errors:
+                    return username, None
+
+        resolved = {username: user_id for username, user_id in await asyncio.gather(*(lookup(u) for u in misses)) if user_id}
+        await asyncio.to_thread(self._store, resolved)
+        result.update(resolved)
+        return result
+
+    def resolve_in_background(self, session, text: str) -> Future:
+        """Start resolving the mentions of ``text`` so they are ready by publish time."""
+        return _background.submit(self.resolve, session, extract_mentions(text))
+
+
+_resolver: Optional[MentionResolver] = None
+_resolver_lock = threading.Lock()
+
+
+def get_mention_resolver() -> MentionResolver:
+    """Return the process-wide resolver backed by ``STATE_DIR/mentions.json``."""
+    global _resolver
+    with _resolver_lock:
+        if _resolver is None:
+            _resolver = MentionResolver()
+        return _resolver
@@ -0,0 +1,285 @@
+import argparse
+import json
+import random
+import secrets
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from .bandwidth import TokenBucket, parse_rate
+
+
+_READ_BLOCK_SIZE = 64 * 1024
+MOCK_UPLOAD_HOST = "upload.mock.tiktok"
+
+
+@dataclass
+class MockBehaviour:
+    """
+    How the mock server misbehaves.
+
+    ``latency`` is added to every response, ``bandwidth`` (bytes per second,
+    shared by all connections) paces request bodies, ``part_failure_rate`` is
+    the probability that a part transfer answers HTTP 500 and
+    ``failure_rate`` the same for every other endpoint.
+    """
+
+    latency: float = 0.0
+    bandwidth: Optional[float] = None
+    part_failure_rate: float = 0.0
+    failure_rate: float = 0.0
+    seed: Optional[int] = None
+
+
+class MockStats:
+    """Per-endpoint request counts and received body bytes."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.requests: Dict[str, int] = {}
+        self.failures: Dict[str, int] = {}
+        self.bytes_received = 0
+
+    def add(self, endpoint: str, nbytes: int, failed: bool) -> None:
+        with self._lock:
+            self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+            if failed:
+                self.failures[endpoint] = self.failures.get(endpoint, 0) + 1
+            self.bytes_received += nbytes
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                "requests": dict(self.requests),
+                "failures": dict(self.failures),
+                "bytes_received": self.bytes_received,
+            }
+
+
+def _json(payload) -> Tuple[int, Dict[str, str], bytes]:
+    return 200, {"Content-Type": "application/json"}, json.dumps(payload).encode("utf-8")
+
+
+class _MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "MockTikTok/1.0"
+    # Headers and body are separate writes; without this every response waits for a delayed ACK.
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_body(self) -> bytes:
+        bucket = self.server.bucket
+        chunks = []
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            while True:
+                size = int(self.rfile.readline().split(b";")[0].strip() or b"0", 16)
+                if size == 0:
+                    self.rfile.readline()
+                    break
+                chunks.append(self.rfile.read(size))
+                self.rfile.readline()
+                if bucket is not None:
+                    time.sleep(bucket.reserve(size))
+            return b"".join(chunks)
+
+        remaining = int(self.headers.get("Content-Length") or 0)
+        while remaining > 0:
+            block = self.rfile.read(min(remaining, _READ_BLOCK_SIZE))
+            if not block:
+                break
+            chunks.append(block)
+            remaining -= len(block)
+            if bucket is not None:
+                time.sleep(bucket.reserve(len(block)))
+        return b"".join(chunks)
+
+    def _handle(self) -> None:
+        body = self._read_body() if self.command != "HEAD" else b""
+        url = urlsplit(self.path)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        endpoint, failure_rate = self._route(url.path, query)
+        behaviour = self.server.behaviour
+
+        if behaviour.latency:
+            time.sleep(behaviour.latency)
+        failed = self.server.should_fail(failure_rate)
+        self.server.stats.add(endpoint, len(body), failed)
+        if failed:
+            status, headers, payload = 500, {"Content-Type": "application/json"}, b'{"code":5000,"message":"injected failure"}'
+        else:
+            status, headers, payload = getattr(self, "_" + endpoint)(query, body)
+
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(payload)
+
+    do_GET = do_POST = do_PUT = do_HEAD = _handle
+
+    def _route(self, path: str, query: Dict[str, str]) -> Tuple[str, float]:
+        behaviour = self.server.behaviour
+        if query.get("phase") == "transfer":
+            return "part_transfer", behaviour.part_failure_rate
+        if query.get("phase") == "finish":
+            return "part_finish", behaviour.failure_rate
+        routes = {
+            "/": "home",
+            "/api/v1/web/project/create/": "project_create",
+            "/api/v1/video/upload/auth/": "upload_auth",
+            "/tiktok/web/project/post/v1/": "project_post",
+            "/api/upload/challenge/sug/": "challenge_sug",
+        }
+        if path == "/top/v1":
+            action = query.get("Action", "")
+            return ("apply_upload" if action == "ApplyUploadInner" else "commit_upload"), behaviour.failure_rate
+        if path.startswith("/@"):
+            return "profile", behaviour.failure_rate
+        return routes.get(path, "not_found"), behaviour.failure_rate
+
+    def _home(self, query, body):
+        token = secrets.token_urlsafe(96)
+        return 200, {
+            "Content-Type": "text/html",
+            "Set-Cookie": f"msToken={token}; Domain=.tiktok.com; Path=/",
+        }, b"<html></html>"
+
+    def _project_create(self, query, body):
+        return _json({"status_code": 0, "project": {"project_id": str(random.randint(10 ** 18, 10 ** 19))}})
+
+    def _upload_auth(self, query, body):
+        return _json({
+            "status_code": 0,
+            "video_token_v5": {
+                "access_key_id": "MOCKACCESSKEY",
+                "secret_acess_key": "mock-secret",
+                "session_token": "mock-session-token",
+                "expired_time": int(time.time()) + 3600,
+            },
+        })
+
+    def _apply_upload(self, query, body):
+        video_id = "v" + secrets.token_hex(12)
+        return _json({
+            "ResponseMetadata": {"Action": "ApplyUploadInner"},
+            "Result": {
+                "InnerUploadAddress": {
+                    "UploadNodes": [{
+                        "Vid": video_id,
+                        "StoreInfos": [{"StoreUri": f"tos-mock/{video_id}", "Auth": "mock-store-auth"}],
+                        "UploadHost": MOCK_UPLOAD_HOST,
+                        "SessionKey": secrets.token_hex(16),
+                    }],
+                },
+            },
+        })
+
+    def _part_transfer(self, query, body):
+        crc = ("%x" % (zlib.crc32(body) & 0xFFFFFFFF)).zfill(8)
+        return _json({"code": 2000, "message": "Success", "data": {"crc32": crc}})
+
+    def _part_finish(self, query, body):
+        return _json({"code": 2000, "message": "Success", "data": {}})
+
+    def _commit_upload(self, query, body):
+        return _json({"ResponseMetadata": {"Action": "CommitUploadInner"}, "Result": {"Results": [{}]}})
+
+    def _project_post(self, query, body):
+        return _json({"status_code": 0, "status_msg": ""})
+
+    def _challenge_sug(self, query, body):
+        keyword = query.get("keyword", "")
+        return _json({"status_code": 0, "sug_list": [{"cha_name": keyword, "view_count": 0}] if keyword else []})
+
+    def _profile(self, query, body):
+        user_id = str(zlib.crc32(self.path.encode("utf-8")))
+        return 200, {"Content-Type": "text/html"}, ('"webapp.user-detail":{"userInfo":{"user":{"id":"' + user_id + '"').encode("utf-8")
+
+    def _not_found(self, query, body):
+        return 404, {"Content-Type": "application/json"}, b'{"status_code":404}'
+
+
+class MockTikTokServer(ThreadingHTTPServer):
+    """
+    Local stand-in for the TikTok endpoints used by ``upload_video``.
+
+    Point the uploader at it with ``http_transport.set_endpoint_override(server.base_url)``
+    or ``TIKTOK_HTTP_ENDPOINT_OVERRIDE``; every host, including the upload
+    host returned by ApplyUploadInner, is then served from here. Responses
+    carry the fields the uploader reads, part CRCs are computed from the
+    received bytes, and ``MockBehaviour`` adds latency, a bandwidth cap and
+    random failures.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, behaviour: Optional[MockBehaviour] = None) -> None:
+        super().__init__((host, port), _MockHandler)
+        self.behaviour = behaviour or MockBehaviour()
+        self.bucket = TokenBucket(self.behaviour.bandwidth) if self.behaviour.bandwidth else None
+        self.stats = MockStats()
+        self._random = random.Random(self.behaviour.seed)
+        self._random_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def should_fail(self, rate: float) -> bool:
+        if rate <= 0:
+            return False
+        with self._random_lock:
+            return self._random.random() < rate
+
+    def start(self) -> "MockTikTokServer":
+        self._thread = threading.Thread(target=self.serve_forever, name="mock-tiktok", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "MockTikTokServer":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Offline stand-in for the TikTok upload endpoints")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8901)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every response")
+    parser.add_argument("--bandwidth", default="", help="Inbound bytes per second, e.g. 20M")
+    parser.add_argument("--part-failure-rate", type=float, default=0.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    behaviour = MockBehaviour(args.latency, parse_rate(args.bandwidth), args.part_failure_rate, args.failure_rate, args.seed)
+    server = MockTikTokServer(args.host, args.port, behaviour)
+    print(f"Mock TikTok server listening on {server.base_url} (set TIKTOK_HTTP_ENDPOINT_OVERRIDE={server.base_url})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+import hashlib
+import itertools
+import os
+import shutil
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Optional
+
+from .Config import Config
+
+
+# Total size of cached renders; the least recently used ones are removed beyond it. 0 turns the cache off.
+RENDER_CACHE_MAX_BYTES = int(os.getenv("TIKTOK_RENDER_CACHE_MAX_BYTES", str(1024 * 1024 * 1024)))
+# No render takes this long: an older staging file was left behind by a render that died.
+RENDER_STALE_PART_SECONDS = int(os.getenv("TIKTOK_RENDER_STALE_PART_SECONDS", "3600"))
+
+
+def _cache_dir() -> Path:
+    base_dir = Path(Config.get().state_dir)
+    if not base_dir.is_absolute():
+        base_dir = Path.cwd() / base_dir
+    return base_dir / "render_cache"
+
+
+def cache_key(*parts) -> str:
+    """Content address of a render: a hash over everything that changes its output."""
+    return hashlib.sha256("\0".join(str(part) for part in parts).encode("utf-8")).hexdigest()
+
+
+class RenderCache:
+    """
+    Rendered files by content address, kept on disk with LRU eviction by total size.
+
+    A render is written to ``staging_path`` inside the cache directory and
+    moved in place with ``commit``, so readers never see a partial file and
+    nothing is copied. Hits refresh the file's mtime, which is the LRU order.
+    Renders in progress (and their inputs, see ``stage_input``) count against
+    the size limit; staging files older than ``stale_part_seconds`` are
+    leftovers of crashed renders and removed.
+    """
+
+    def __init__(self, directory: Optional[Path] = None, max_bytes: int = RENDER_CACHE_MAX_BYTES, suffix: str = ".mp4", stale_part_seconds: float = RENDER_STALE_PART_SECONDS) -> None:
+        self.directory = Path(directory or _cache_dir())
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self.stale_part_seconds = stale_part_seconds
+        self._lock = threading.Lock()
+        if self.enabled:
+            # Clear what a previous process left behind.
+            with self._lock:
+                self._evict()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}{self.suffix}"
+
+    def get(self, key: str) -> Optional[Path]:
+        if not self.enabled:
+            return None
+        path = self._path(key)
+        with self._lock:
+            try:
+                os.utime(path)
+            except FileNotFoundError:
+                return None
+        return path
+
+    def staging_path(self, key: str) -> Path:
+        return self.directory / f"{key}.{uuid.uuid4().hex}.part"
+
+    def stage_input(self, key: str, source: Path) -> Path:
+        """Copy a render's input into the cache, so the render does not depend on where it came from; the caller removes it."""
+        inputs = self.directory / "inputs"
+        inputs.mkdir(exist_ok=True)
+        path = inputs / f"{key}.{uuid.uuid4().hex}{Path(source).suffix}"
+        shutil.copyfile(source, path)
+        return path
+
+    def commit(self, key: str, staged: Path) -> Path:
+        """Move a finished render into the cache and evict old entries; returns its cached path."""
+        path = self._path(key)
+        with self._lock:
+            os.replace(staged, path)
+            self._evict(keep=path)
+        return path
+
+    def _evict(self, keep: Optional[Path] = None) -> None:
+        entries = []
+        total = 0
+        stale_before = time.time() - self.stale_part_seconds
+        for path in itertools.chain(self.directory.glob("*.part"), (self.directory / "inputs").glob("*")):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            if stat.st_mtime < stale_before:
+                path.unlink(missing_ok=True)
+            else:
+                total += stat.st_size
+        for path in self.directory.glob(f"*{self.suffix}"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        total += sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            path.unlink(missing_ok=True)
+            total -= size
@@ -1,13 +1,24 @@
-import time, requests, datetime, hashlib, hmac, random, zlib, json, datetime
-import requests, zlib, json, time, subprocess, string, secrets, os, sys
+import time, datetime, hashlib, hmac, random, zlib, json, datetime
+import zlib, json, time, subprocess, string, secrets, os, sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from fake_useragent import FakeUserAgentError, UserAgent
 from requests_auth_aws_sigv4 import AWSSigV4
-from tiktok_uploader.cookies import load_cookies_from_file
+from tiktok_uploader.cookies import MsTokenStore, load_cookies_from_file
 from tiktok_uploader.Browser import Browser
 from tiktok_uploader.bot_utils import *
+from tiktok_uploader.bot_utils import _relay_status
 from tiktok_uploader import Config, Video
 from tiktok_uploader.metadata_spoofing import prepare_video_for_upload, MetadataProcessingError
+from tiktok_uploader.bandwidth import get_limiter
+from tiktok_uploader.hashtag_index import get_hashtag_index
+from tiktok_uploader.http_transport import create_session, record_api_status
+from tiktok_uploader.mention_resolver import get_mention_resolver
+from tiktok_uploader.upload_auth import credential_cache, is_auth_failure
+from tiktok_uploader.transfer_tuner import ADAPTIVE_TRANSFER_ENABLED, TransferSettings, get_tuner
+from tiktok_uploader.upload_journal import TransferJournal
+from tiktok_uploader.upload_trace import UploadTrace, traced_upload
+from tiktok_uploader.upload_transfer import DEFAULT_CHUNK_SIZE, UploadSessionRejected, UploadTransferError, VideoChunkReader, transfer_parts
 from dotenv import load_dotenv
 
 
@@ -16,6 +27,27 @@ load_dotenv()
 
 # Constants
 _UA = 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/68.0.3440.106 Safari/537.36'
+_PUBLISH_URL = "https://www.tiktok.com/tiktok/web/project/post/v1/"
+_UPLOAD_AUTH_URL = "https://www.tiktok.com/api/v1/video/upload/auth/?aid=1988"
+_COMMIT_UPLOAD_URL = "https://www.tiktok.com/top/v1?Action=CommitUploadInner&Version=2020-11-19&SpaceName=tiktok"
+# Values of TIKTOK_UPLOAD_PIPELINED / UPLOAD_PIPELINED that turn pipelining on.
+_ENABLED_VALUES = ("1", "true", "yes")
+
+
+def _pipelined_preupload(pipelined=None) -> bool:
+	"""
+	Whether the ffmpeg preprocessing runs while project creation and upload auth are in flight.
+
+	Off unless ``pipelined``, ``TIKTOK_UPLOAD_PIPELINED`` or the ``UPLOAD_PIPELINED`` config option
+	turns it on: the project is created before preprocessing is done, so a video that fails to
+	preprocess leaves an unused project behind on TikTok's side.
+	"""
+	if pipelined is not None:
+		return bool(pipelined)
+	value = os.getenv("TIKTOK_UPLOAD_PIPELINED")
+	if value is None:
+		value = Config.get().upload_pipelined
+	return str(value or "").strip().lower() in _ENABLED_VALUES
 
 
 def login(login_name: str):
@@ -50,56 +82,48 @@ def login(login_name: str):
 
 
 # Local Code...
-def upload_video(session_file_path, video, title, schedule_time=0, allow_comment=1, allow_duet=0, allow_stitch=0, visibility_type=0, brand_organic_type=0, branded_content_type=0, ai_label=0, proxy=None, datacenter=None, status_callback=None):
-	def _report_status(message):
-		if status_callback:
-			try:
-				status_callback(message)
-			except Exception:
-				pass
-		else:
-			print(message)
+def upload_video(session_file_path, video, title, schedule_time=0, allow_comment=1, allow_duet=0, allow_stitch=0, visibility_type=0, brand_organic_type=0, branded_content_type=0, ai_label=0, proxy=None, datacenter=None, status_callback=None, transfer_concurrency=None, resume_key=None, adaptive_transfer=None, pipelined=None, priority=None, bandwidth_limit=None, trace=None):
+	# Pass an UploadTrace as `trace` to get per-phase timings, part latencies and retries back.
+	with traced_upload(trace, video) as trace:
+		trace.success = _upload_video(
+			session_file_path,
+			video,
+			title,
+			schedule_time=schedule_time,
+			allow_comment=allow_comment,
+			allow_duet=allow_duet,
+			allow_stitch=allow_stitch,
+			visibility_type=visibility_type,
+			brand_organic_type=brand_organic_type,
+			branded_content_type=branded_content_type,
+			ai_label=ai_label,
+			proxy=proxy,
+			datacenter=datacenter,
+			status_callback=status_callback,
+			transfer_concurrency=transfer_concurrency,
+			resume_key=resume_key,
+			adaptive_transfer=adaptive_transfer,
+			pipelined=pipelined,
+			priority=priority,
+			bandwidth_limit=bandwidth_limit,
+			trace=trace,
+		)
+		return trace.success
 
-	try:
-		user_agent = UserAgent().random
-	except FakeUserAgentError as e:
-		user_agent = _UA
-		_report_status("[-] Could not get random user agent, using default")
 
-	cookies = load_cookies_from_file(session_file_path)
-	session_id = next((c["value"] for c in cookies if c["name"] == 'sessionid'), None)
-	dc_from_cookie = next((c["value"] for c in cookies if c["name"] == 'tt-target-idc'), None)
-	dc_id = datacenter or dc_from_cookie
+def _upload_video(session_file_path, video, title, schedule_time=0, allow_comment=1, allow_duet=0, allow_stitch=0, visibility_type=0, brand_organic_type=0, branded_content_type=0, ai_label=0, proxy=None, datacenter=None, status_callback=None, transfer_concurrency=None, resume_key=None, adaptive_transfer=None, pipelined=None, priority=None, bandwidth_limit=None, trace=None):
+	_report_status = _status_reporter(status_callback)
 
-	if not session_id:
-		raise RuntimeError("No cookie with Tiktok session id found: use login to save session id")
-	if not dc_id:
-		_report_status("[WARNING]: Please login, tiktok datacenter id must be allocated, or may fail")
-		dc_id = "useast2a"
-	elif datacenter and datacenter != dc_from_cookie:
-		_report_status(f"[INFO]: Overriding stored datacenter '{dc_from_cookie}' with user preference '{datacenter}'")
-	elif datacenter:
-		_report_status(f"[INFO]: Using user-specified datacenter '{datacenter}'")
-	_report_status("User successfully logged in.")
-	_report_status(f"Tiktok Datacenter Assigned: {dc_id}")
-	
-	_report_status("Uploading video...")
-	# Parameter validation,
-	if schedule_time and (schedule_time > 864000 or schedule_time < 900):
-		_report_status("[-] Cannot schedule video in more than 10 days or less than 20 minutes")
-		return False
-	if len(title) > 2200:
-		_report_status("[-] The title has to be less than 2200 characters")
-		return False
-	if schedule_time != 0 and visibility_type == 1:
-		_report_status("[-] Private videos cannot be uploaded with schedule")
+	started = _begin_upload(session_file_path, video, title, schedule_time, visibility_type, datacenter, resume_key, _report_status)
+	if started is None:
 		return False
+	user_agent, session_id, dc_id, dc_from_cookie, journal = started
 
 	# Check video length - 1 minute max, takes too long to run this.
 
 
-	# Creating Session
-	session = requests.Session()
+	# Creating Session on the process-wide connection pools.
+	session = create_session()
 	session.cookies.set("sessionid", session_id, domain=".tiktok.com")
 	session.cookies.set("tt-target-idc", dc_id, domain=".tiktok.com")
 	session.verify = True
@@ -117,88 +141,74 @@ def upload_video(session_file_path, video, title, schedule_time=0, allow_comment
 			"https": proxy
 		}
 
-	try:
-		processed_video = prepare_video_for_upload(video)
-	except MetadataProcessingError as exc:
-		raise RuntimeError(str(exc)) from exc
-
-	cleanup_target = processed_video
+	processed_video = None
+	# Mention lookups only need the session, so they run while the video is transferred.
+	mentions = get_mention_resolver().resolve_in_background(session, title)
 
 	try:
-		creation_id = generate_random_string(21, True)
-		project_url = f"https://www.tiktok.com/api/v1/web/project/create/?creation_id={creation_id}&type=1&aid=1988"
-		r = session.post(project_url)
-
-		if not assert_success(project_url, r, _report_status):
-			_report_status(f"[-] TikTok project creation failed with HTTP {r.status_code}")
-			return False
-
-		try:
-			project_payload = r.json()
-		except (ValueError, json.JSONDecodeError):
-			project_payload = None
+		upload_info = None
+		if journal.is_resumable():
+			processed_video = journal.processed_video
+			creation_id = journal.get("creation_id")
+			project_id = journal.get("project_id")
+			trace.set(resumed=True)
+			_report_status(f"[INFO]: Resuming interrupted upload ({len(journal.confirmed_parts)} parts already confirmed)")
+			upload_info = upload_to_tiktok(processed_video, session, status_callback=_report_status, concurrency=transfer_concurrency, journal=journal, adaptive=adaptive_transfer, priority=priority, bandwidth_limit=bandwidth_limit, trace=trace)
+			if not upload_info:
+				if not _abandon_resume(journal, processed_video, _report_status):
+					return False
+				processed_video = None
+		else:
+			journal.discard()
 
-		project_id = None
-		if isinstance(project_payload, dict):
-			project_id = (
-				project_payload.get("project", {}) or {}
-			).get("project_id")
-
-		if not project_id:
-			status_msg = ""
-			if isinstance(project_payload, dict):
-				status_msg = (
-					project_payload.get("status_msg")
-					or project_payload.get("message")
-					or project_payload.get("error")
-					or ""
-				)
-			if not status_msg:
-				text_preview = (r.text or "")[:500]
-				status_msg = text_preview.strip()
-
-			if datacenter and datacenter != dc_from_cookie:
-				raise RuntimeError(
-					f"TikTok project creation failed when using datacenter '{datacenter}': "
-					f"{status_msg or 'unknown error'}"
-				)
-			raise RuntimeError(f"TikTok project creation failed: {status_msg or 'unknown error'}")
-
-		# get project_id
-		upload_info = upload_to_tiktok(processed_video, session, status_callback=_report_status)
 		if not upload_info:
-			_report_status("[-] Failed to initialize TikTok upload session.")
-			return False
+			credentials = None
+			if _pipelined_preupload(pipelined):
+				# Local preprocessing and the control-plane calls do not depend on each other.
+				# ApplyUploadInner does: it needs the size of the processed file, so it waits.
+				with ThreadPoolExecutor(max_workers=1, thread_name_prefix="tiktok-preprocess") as pool:
+					preprocessing = pool.submit(_preprocess_video, video, trace)
+					try:
+						project = _create_project(session, datacenter, dc_from_cookie, _report_status, trace)
+						if project:
+							credentials = _fetch_upload_credentials(session, _report_status, trace)
+					finally:
+						# Collect the result even on failure so the sanitized copy gets cleaned up.
+						processed_video = preprocessing.result()
+				if not project or not credentials:
+					return False
+			else:
+				processed_video = _preprocess_video(video, trace)
+				project = _create_project(session, datacenter, dc_from_cookie, _report_status, trace)
+				if not project:
+					return False
+			creation_id, project_id = project
+			journal.start(processed_video, creation_id, project_id)
+
+			upload_info = upload_to_tiktok(processed_video, session, status_callback=_report_status, concurrency=transfer_concurrency, journal=journal, adaptive=adaptive_transfer, priority=priority, bandwidth_limit=bandwidth_limit, trace=trace, credentials=credentials)
+			if not upload_info:
+				_report_status("[-] Failed to initialize TikTok upload session.")
+				return False
 		video_id, session_key, upload_id, crcs, upload_host, store_uri, video_auth, aws_auth = upload_info
 
-		url = f"https://{upload_host}/{store_uri}?uploadID={upload_id}&phase=finish&uploadmode=part"
-		headers = {
-			"Authorization": video_auth,
-			"Content-Type": "text/plain;charset=UTF-8",
-		}
-		data = ",".join([f"{i + 1}:{crcs[i]}" for i in range(len(crcs))])
+		url, headers, data = _finish_request(upload_host, store_uri, upload_id, video_auth, crcs)
 
-		if proxy:
-			r = requests.post(url, headers=headers, data=data, proxies=session.proxies)
-			if not assert_success(url, r, _report_status):
-				_report_status(f"[-] TikTok chunk commit failed with HTTP {r.status_code}")
-				return False
-		else:
-			r = requests.post(url, headers=headers, data=data)
-			if not assert_success(url, r, _report_status):
-				_report_status(f"[-] TikTok chunk commit failed with HTTP {r.status_code}")
-				return False
+		# Reuse the session so the commit rides the keep-alive connection of the part transfers.
+		trace.begin("finish")
+		r = session.post(url, headers=headers, data=data)
+		if not _step_succeeded("finish", url, r, trace, _report_status):
+			return False
 		#
 		# url = f"https://www.tiktok.com/top/v1?Action=CommitUploadInner&Version=2020-11-19&SpaceName=tiktok"
 		# data = '{"SessionKey":"' + session_key + '","Functions":[{"name":"GetMeta"}]}'
 
 		# ApplyUploadInner
-		url = f"https://www.tiktok.com/top/v1?Action=CommitUploadInner&Version=2020-11-19&SpaceName=tiktok"
-		data = '{"SessionKey":"' + session_key + '","Functions":[{"name":"GetMeta"}]}'
+		url = _COMMIT_UPLOAD_URL
+		data = _commit_upload_data(session_key)
 
+		trace.begin("commit_upload")
 		r = session.post(url, auth=aws_auth, data=data)
-		if not assert_success(url, r, _report_status):
-			_report_status(f"[-] TikTok ApplyUploadInner failed with HTTP {r.status_code}")
+		if not _step_succeeded("commit_upload", url, r, trace, _report_status):
 			return False
 
 		# publish video
@@ -207,9 +217,9 @@ def upload_video(session_file_path, video, title, schedule_time=0, allow_comment
 			"user-agent": user_agent
 		}
 
+		trace.begin("preflight")
 		r = session.head(url, headers=headers)
-		if not assert_success(url, r, _report_status):
-			_report_status(f"[-] TikTok preflight request failed with HTTP {r.status_code}")
+		if not _step_succeeded("preflight", url, r, trace, _report_status):
 			return False
 
 		headers = {
@@ -220,7 +230,12 @@ def upload_video(session_file_path, video, title, schedule_time=0, allow_comment
 
 		if brand and brand[-1] == ",":
 			brand = brand[:-1]
-		markup_text, text_extra = convert_tags(title, session)
+		with trace.phase("mentions"):
+			try:
+				user_ids = mentions.result()
+			except Exception:
+				user_ids = {}
+			markup_text, text_extra = convert_tags(title, session, user_ids=user_ids)
 
 
 
@@ -303,70 +318,28 @@ def upload_video(session_file_path, video, title, schedule_time=0, allow_comment
 		# }
 
 
-		data = {
-			"post_common_info": {
-				"creation_id": creation_id,
-					"enter_post_page_from": 1,
-					"post_type": 3
-				},
-				"feature_common_info_list": [
-					{
-						"geofencing_regions": [],
-						"playlist_name": "",
-						"playlist_id": "",
-						"tcm_params": "{\"commerce_toggle_info\":{}}",
-						"sound_exemption": 0,
-						"anchors": [],
-						"vedit_common_info": {
-							"draft": "",
-							"video_id": video_id
-						},
-						"privacy_setting_info": {
-							"visibility_type": visibility_type,
-							"allow_duet": allow_duet,
-							"allow_stitch": allow_stitch,
-							"allow_comment": allow_comment
-						}
-					}
-				],
-				"single_post_req_list": [
-					{
-						"batch_index": 0,
-						"video_id": video_id,
-						"is_long_video": 0,
-						"single_post_feature_info": {
-							"text": title,
-							"text_extra": text_extra,
-							"markup_text": title,
-							"music_info": {},
-							"poster_delay": 0,
-						}
-					}
-				]
-			}
-
-
-		# Add schedule_time to the payload if it's provided
-		if schedule_time > 0:
-			data["feature_common_info_list"][0]["schedule_time"] = schedule_time + int(time.time())
-
-		# TikTok expects brand flags inside the commerce toggle payload.
-		toggle_info = {}
-		if brand_organic_type:
-			toggle_info["brand_organic_type"] = brand_organic_type
-		if branded_content_type:
-			toggle_info["branded_content_type"] = branded_content_type
-		data["feature_common_info_list"][0]["tcm_params"] = json.dumps(
-			{"commerce_toggle_info": toggle_info if toggle_info else {}}
+		data = _build_publish_payload(
+			creation_id,
+			video_id,
+			title,
+			text_extra,
+			schedule_time=schedule_time,
+			visibility_type=visibility_type,
+			allow_comment=allow_comment,
+			allow_duet=allow_duet,
+			allow_stitch=allow_stitch,
+			brand_organic_type=brand_organic_type,
+			branded_content_type=branded_content_type,
+			ai_label=ai_label,
 		)
 
-		if ai_label:
-			aigc_payload = {"aigc_label_type": ai_label}
-			data["feature_common_info_list"][0]["aigc_info"] = dict(aigc_payload)
-			data["single_post_req_list"][0]["single_post_feature_info"]["aigc_info"] = dict(aigc_payload)
-		
+		mstoken_store, stored_mstoken = _stored_mstoken(session_file_path, session_id, session.cookies.get("msToken"))
+		if stored_mstoken:
+			session.cookies.set("msToken", stored_mstoken, domain=".tiktok.com")
+
 		uploaded = False
 		while True:
+			trace.begin("sign")
 			mstoken = session.cookies.get("msToken")
 			if not mstoken:
 				# TikTok expects msToken from visiting the main site; perform a lightweight GET if it's missing
@@ -379,51 +352,29 @@ def upload_video(session_file_path, video, title, schedule_time=0, allow_comment
 				if not mstoken:
 					_report_status("[-] TikTok did not issue an msToken cookie; aborting publish.")
 					return False
+				mstoken_store.save(mstoken)
 			# xbogus = subprocess_jsvmp(os.path.join(os.getcwd(), "tiktok_uploader", "./x-bogus.js"), user_agent, f"app_name=tiktok_web&channel=tiktok_web&device_platform=web&aid=1988&msToken={mstoken}")
 			# /tiktok/web/project/post/v1/
-			js_path = os.path.join(os.getcwd(), "tiktok_uploader", "tiktok-signature", "browser.js")
-			sig_url = f"https://www.tiktok.com/api/v1/web/project/post/?app_name=tiktok_web&channel=tiktok_web&device_platform=web&aid=1988&msToken={mstoken}"
-			signatures = subprocess_jsvmp(js_path, user_agent, sig_url)
-			if signatures is None:
-				_report_status("[-] Failed to generate upload signatures.")
-				return False
-
-			try:
-				tt_output = json.loads(signatures)["data"]
-			except (json.JSONDecodeError, KeyError) as e:
-				_report_status(f"[-] Failed to parse signature data: {str(e)}")
+			project_post_dict = _sign_publish(user_agent, mstoken, _report_status)
+			if project_post_dict is None:
 				return False
-
-			project_post_dict = {
-				"app_name": "tiktok_web",
-				"channel": "tiktok_web",
-				"device_platform": "web",
-				"aid": 1988,
-				"msToken": mstoken,
-				"X-Bogus": tt_output["x-bogus"],
-				"_signature": tt_output["signature"],
-				# "X-TT-Params": tt_output["x-tt-params"],  # not needed rn.
-			}
+			trace.end("sign")
 
 			# url = f"https://www.tiktok.com/api/v1/web/project/post/"
-			url = f"https://www.tiktok.com/tiktok/web/project/post/v1/"
+			url = _PUBLISH_URL
+			trace.begin("publish")
 			r = session.request("POST", url, params=project_post_dict, data=json.dumps(data), headers=headers)
-			if not assertSuccess(url, r, _report_status):
-				_report_status("[-] Publish request rejected by TikTok.")
-				printError(url, r, _report_status)
-				return False
-
-			if r.json()["status_code"] == 0:
-				msg = "Published successfully"
-				if schedule_time:
-					msg += f" | Scheduled for {schedule_time} seconds from now"
-				_report_status(msg)
-				uploaded = True
-				break
-			else:
-				_report_status("[-] Publish failed to TikTok.")
-				printError(url, r, _report_status)
+			published = _publish_result(url, r, stored_mstoken, schedule_time, _report_status)
+			if published is None:
+				mstoken_store.clear()
+				session.cookies.set("msToken", None, domain=".tiktok.com")
+				stored_mstoken = None
+				continue
+			if not published:
 				return False
+			trace.end("publish")
+			uploaded = True
+			break
 			#
 			# try:
 			# 	if r.json()["status_msg"] == "You are posting too fast. Take a rest.":
@@ -438,9 +389,395 @@ def upload_video(session_file_path, video, title, schedule_time=0, allow_comment
 		if not uploaded:
 			_report_status("[-] Could not upload video")
 			return False
+		_record_published(mstoken_store, session.cookies.get("msToken") or mstoken, journal, title)
 		return True
 	finally:
-		_cleanup_processed_video(cleanup_target)
+		mentions.cancel()
+		_release_upload_files(journal, processed_video)
+
+
+def _status_reporter(status_callback):
+	def _report_status(message):
+		if status_callback:
+			try:
+				status_callback(message)
+			except Exception:
+				pass
+		else:
+			print(message)
+	return _report_status
+
+
+# Everything below up to upload_to_tiktok is shared with tiktok_async.py. Helpers that touch
+# files (cookies, journal, msToken store, tuner) are plain functions the async engine runs in a thread.
+
+def _begin_upload(session_file_path, video, title, schedule_time, visibility_type, datacenter, resume_key, report_status):
+	# User agent, session cookie, parameter validation and the transfer journal; None when the parameters are rejected.
+	try:
+		user_agent = UserAgent().random
+	except FakeUserAgentError:
+		user_agent = _UA
+		report_status("[-] Could not get random user agent, using default")
+
+	session_id, dc_id, dc_from_cookie = _load_session_identity(session_file_path, datacenter, report_status)
+
+	report_status("Uploading video...")
+	validation_error = _validate_upload_params(title, schedule_time, visibility_type)
+	if validation_error:
+		report_status(validation_error)
+		return None
+
+	journal = TransferJournal.for_upload(session_id, str(_resolve_video_path(video)), resume_key)
+	return user_agent, session_id, dc_id, dc_from_cookie, journal
+
+
+def _abandon_resume(journal, processed_video, report_status):
+	# A resume failed: give up while the journal still holds the upload session (False),
+	# otherwise drop the stale copy so a fresh upload can start (True).
+	if journal.has_upload_session:
+		report_status("[-] Failed to resume TikTok upload session.")
+		return False
+	report_status("[INFO]: Stored upload session is no longer valid, starting a fresh upload.")
+	_cleanup_processed_video(processed_video)
+	return True
+
+
+_STEP_FAILURES = {
+	"finish": "[-] TikTok chunk commit failed with HTTP {}",
+	"commit_upload": "[-] TikTok ApplyUploadInner failed with HTTP {}",
+	"preflight": "[-] TikTok preflight request failed with HTTP {}",
+}
+
+
+def _step_succeeded(name, url, r, trace, report_status):
+	if not assert_success(url, r, report_status):
+		report_status(_STEP_FAILURES[name].format(r.status_code))
+		return False
+	trace.end(name)
+	return True
+
+
+def _stored_mstoken(session_file_path, session_id, cookie_mstoken):
+	# A stored msToken spares downloading the TikTok homepage just to be issued one.
+	mstoken_store = MsTokenStore.for_session(session_file_path, session_id)
+	return mstoken_store, None if cookie_mstoken else mstoken_store.load()
+
+
+def _sign_publish(user_agent, mstoken, report_status):
+	signatures = subprocess_jsvmp(_signature_js_path(), user_agent, _signature_url(mstoken))
+	return _publish_params(mstoken, signatures, report_status)
+
+
+def _publish_result(url, r, stored_mstoken, schedule_time, report_status):
+	# True when published, False when TikTok refused it, None when the stored msToken
+	# may be stale: the caller drops it and signs again with a freshly issued one.
+	record_api_status("publish", r)
+	if stored_mstoken and _publish_rejected(r):
+		report_status("[INFO]: Publish rejected with stored msToken, retrying with a fresh one.")
+		return None
+	if not assertSuccess(url, r, report_status):
+		report_status("[-] Publish request rejected by TikTok.")
+		printError(url, r, report_status)
+		return False
+	if r.json()["status_code"] != 0:
+		report_status("[-] Publish failed to TikTok.")
+		printError(url, r, report_status)
+		return False
+	msg = "Published successfully"
+	if schedule_time:
+		msg += f" | Scheduled for {schedule_time} seconds from now"
+	report_status(msg)
+	return True
+
+
+def _record_published(mstoken_store, mstoken, journal, title):
+	# TikTok rotates msToken on responses; keep the newest for the next upload.
+	mstoken_store.save(mstoken)
+	journal.discard()
+	get_hashtag_index().record_caption(title)
+
+
+def _release_upload_files(journal, processed_video):
+	# Keep the sanitized video while the journal can still resume its upload.
+	if not journal.has_upload_session:
+		journal.discard()
+		_cleanup_processed_video(processed_video)
+
+
+def _load_session_identity(session_file_path, datacenter, report_status):
+	cookies = load_cookies_from_file(session_file_path)
+	session_id = next((c["value"] for c in cookies if c["name"] == 'sessionid'), None)
+	dc_from_cookie = next((c["value"] for c in cookies if c["name"] == 'tt-target-idc'), None)
+	dc_id = datacenter or dc_from_cookie
+
+	if not session_id:
+		raise RuntimeError("No cookie with Tiktok session id found: use login to save session id")
+	if not dc_id:
+		report_status("[WARNING]: Please login, tiktok datacenter id must be allocated, or may fail")
+		dc_id = "useast2a"
+	elif datacenter and datacenter != dc_from_cookie:
+		report_status(f"[INFO]: Overriding stored datacenter '{dc_from_cookie}' with user preference '{datacenter}'")
+	elif datacenter:
+		report_status(f"[INFO]: Using user-specified datacenter '{datacenter}'")
+	report_status("User successfully logged in.")
+	report_status(f"Tiktok Datacenter Assigned: {dc_id}")
+	return session_id, dc_id, dc_from_cookie
+
+
+def _validate_upload_params(title, schedule_time, visibility_type):
+	if schedule_time and (schedule_time > 864000 or schedule_time < 900):
+		return "[-] Cannot schedule video in more than 10 days or less than 20 minutes"
+	if len(title) > 2200:
+		return "[-] The title has to be less than 2200 characters"
+	if schedule_time != 0 and visibility_type == 1:
+		return "[-] Private videos cannot be uploaded with schedule"
+	return None
+
+
+def _project_create_url(creation_id):
+	return f"https://www.tiktok.com/api/v1/web/project/create/?creation_id={creation_id}&type=1&aid=1988"
+
+
+def _apply_upload_url(file_size):
+	return f"https://www.tiktok.com/top/v1?Action=ApplyUploadInner&Version=2020-11-19&SpaceName=tiktok&FileType=video&IsInner=1&FileSize={file_size}&s=g158iqx8434"
+
+
+def _part_request(upload_host, store_uri, upload_id, video_auth, part_number, crc):
+	url = f"https://{upload_host}/{store_uri}?partNumber={part_number}&uploadID={upload_id}&phase=transfer"
+	headers = {
+		"Authorization": video_auth,
+		"Content-Type": "application/octet-stream",
+		"Content-Disposition": 'attachment; filename="undefined"',
+		"Content-Crc32": crc,
+	}
+	return url, headers
+
+
+def _finish_request(upload_host, store_uri, upload_id, video_auth, crcs):
+	url = f"https://{upload_host}/{store_uri}?uploadID={upload_id}&phase=finish&uploadmode=part"
+	headers = {
+		"Authorization": video_auth,
+		"Content-Type": "text/plain;charset=UTF-8",
+	}
+	data = ",".join([f"{i + 1}:{crcs[i]}" for i in range(len(crcs))])
+	return url, headers, data
+
+
+def _commit_upload_data(session_key):
+	return '{"SessionKey":"' + session_key + '","Functions":[{"name":"GetMeta"}]}'
+
+
+def _parse_upload_node(payload):
+	upload_node = payload["Result"]["InnerUploadAddress"]["UploadNodes"][0]
+	return {
+		"video_id": upload_node["Vid"],
+		"store_uri": upload_node["StoreInfos"][0]["StoreUri"],
+		"video_auth": upload_node["StoreInfos"][0]["Auth"],
+		"upload_host": upload_node["UploadHost"],
+		"session_key": upload_node["SessionKey"],
+	}
+
+
+def _signature_js_path():
+	return os.path.join(os.getcwd(), "tiktok_uploader", "tiktok-signature", "browser.js")
+
+
+def _signature_url(mstoken):
+	return f"https://www.tiktok.com/api/v1/web/project/post/?app_name=tiktok_web&channel=tiktok_web&device_platform=web&aid=1988&msToken={mstoken}"
+
+
+def _publish_params(mstoken, signatures, report_status):
+	if signatures is None:
+		report_status("[-] Failed to generate upload signatures.")
+		return None
+
+	try:
+		tt_output = json.loads(signatures)["data"]
+	except (json.JSONDecodeError, KeyError) as e:
+		report_status(f"[-] Failed to parse signature data: {str(e)}")
+		return None
+
+	return {
+		"app_name": "tiktok_web",
+		"channel": "tiktok_web",
+		"device_platform": "web",
+		"aid": 1988,
+		"msToken": mstoken,
+		"X-Bogus": tt_output["x-bogus"],
+		"_signature": tt_output["signature"],
+		# "X-TT-Params": tt_output["x-tt-params"],  # not needed rn.
+	}
+
+
+def _publish_rejected(response):
+	if response.status_code != 200:
+		return True
+	try:
+		return response.json()["status_code"] != 0
+	except (ValueError, KeyError, TypeError):
+		return True
+
+
+def _build_publish_payload(creation_id, video_id, title, text_extra, schedule_time=0, visibility_type=0, allow_comment=1, allow_duet=0, allow_stitch=0, brand_organic_type=0, branded_content_type=0, ai_label=0):
+	data = {
+		"post_common_info": {
+			"creation_id": creation_id,
+			"enter_post_page_from": 1,
+			"post_type": 3
+		},
+		"feature_common_info_list": [
+			{
+				"geofencing_regions": [],
+				"playlist_name": "",
+				"playlist_id": "",
+				"tcm_params": "{\"commerce_toggle_info\":{}}",
+				"sound_exemption": 0,
+				"anchors": [],
+				"vedit_common_info": {
+					"draft": "",
+					"video_id": video_id
+				},
+				"privacy_setting_info": {
+					"visibility_type": visibility_type,
+					"allow_duet": allow_duet,
+					"allow_stitch": allow_stitch,
+					"allow_comment": allow_comment
+				}
+			}
+		],
+		"single_post_req_list": [
+			{
+				"batch_index": 0,
+				"video_id": video_id,
+				"is_long_video": 0,
+				"single_post_feature_info": {
+					"text": title,
+					"text_extra": text_extra,
+					"markup_text": title,
+					"music_info": {},
+					"poster_delay": 0,
+				}
+			}
+		]
+	}
+
+	# Add schedule_time to the payload if it's provided
+	if schedule_time > 0:
+		data["feature_common_info_list"][0]["schedule_time"] = schedule_time + int(time.time())
+
+	# TikTok expects brand flags inside the commerce toggle payload.
+	toggle_info = {}
+	if brand_organic_type:
+		toggle_info["brand_organic_type"] = brand_organic_type
+	if branded_content_type:
+		toggle_info["branded_content_type"] = branded_content_type
+	data["feature_common_info_list"][0]["tcm_params"] = json.dumps(
+		{"commerce_toggle_info": toggle_info if toggle_info else {}}
+	)
+
+	if ai_label:
+		aigc_payload = {"aigc_label_type": ai_label}
+		data["feature_common_info_list"][0]["aigc_info"] = dict(aigc_payload)
+		data["single_post_req_list"][0]["single_post_feature_info"]["aigc_info"] = dict(aigc_payload)
+
+	return data
+
+
+def _parse_project_response(response, datacenter, dc_from_cookie):
+	try:
+		project_payload = response.json()
+	except (ValueError, json.JSONDecodeError):
+		project_payload = None
+
+	project_id = None
+	if isinstance(project_payload, dict):
+		project_id = (
+			project_payload.get("project", {}) or {}
+		).get("project_id")
+
+	if not project_id:
+		status_msg = ""
+		if isinstance(project_payload, dict):
+			status_msg = (
+				project_payload.get("status_msg")
+				or project_payload.get("message")
+				or project_payload.get("error")
+				or ""
+			)
+		if not status_msg:
+			text_preview = (response.text or "")[:500]
+			status_msg = text_preview.strip()
+
+		if datacenter and datacenter != dc_from_cookie:
+			raise RuntimeError(
+				f"TikTok project creation failed when using datacenter '{datacenter}': "
+				f"{status_msg or 'unknown error'}"
+			)
+		raise RuntimeError(f"TikTok project creation failed: {status_msg or 'unknown error'}")
+
+	return project_id
+
+
+def _preprocess_video(video, trace):
+	try:
+		with trace.phase("preprocess"):
+			return prepare_video_for_upload(video)
+	except MetadataProcessingError as exc:
+		raise RuntimeError(str(exc)) from exc
+
+
+def _cached_upload_credentials(session_id, refresh, trace):
+	# Credentials are shared by every upload of the account until they expire.
+	if refresh:
+		credential_cache().invalidate(session_id)
+		return None
+	credentials = credential_cache().get(session_id)
+	if credentials is not None:
+		trace.set(upload_auth_cached=True)
+	return credentials
+
+
+def _upload_credentials_result(session_id, url, r, status_callback, trace):
+	record_api_status("upload_auth", r)
+	if not assert_success(url, r, status_callback):
+		trace.end("upload_auth", ok=False)
+		return None
+	trace.end("upload_auth")
+	credentials = r.json()["video_token_v5"]
+	credential_cache().put(session_id, credentials)
+	return credentials
+
+
+def _fetch_upload_credentials(session, status_callback, trace, refresh=False):
+	session_id = session.cookies.get("sessionid", domain=".tiktok.com")
+	credentials = _cached_upload_credentials(session_id, refresh, trace)
+	if credentials is not None:
+		return credentials
+
+	url = _UPLOAD_AUTH_URL
+	trace.begin("upload_auth")
+	r = session.get(url)
+	return _upload_credentials_result(session_id, url, r, status_callback, trace)
+
+
+def _project_result(creation_id, project_url, r, datacenter, dc_from_cookie, report_status, trace):
+	record_api_status("project_create", r)
+	if not assert_success(project_url, r, report_status):
+		trace.end("project_create", ok=False)
+		report_status(f"[-] TikTok project creation failed with HTTP {r.status_code}")
+		return None
+
+	project_id = _parse_project_response(r, datacenter, dc_from_cookie)
+	trace.end("project_create")
+	return creation_id, project_id
+
+
+def _create_project(session, datacenter, dc_from_cookie, report_status, trace):
+	creation_id = generate_random_string(21, True)
+	project_url = _project_create_url(creation_id)
+	trace.begin("project_create")
+	r = session.post(project_url)
+	return _project_result(creation_id, project_url, r, datacenter, dc_from_cookie, report_status, trace)
 
 
 def _cleanup_processed_video(processed_video: str):
@@ -492,59 +829,145 @@ def _resolve_video_path(video_file: str) -> Path:
 	return candidate
 
 
-def upload_to_tiktok(video_file, session, status_callback=None):
-	url = "https://www.tiktok.com/api/v1/video/upload/auth/?aid=1988"
-	r = session.get(url)
-	if not assert_success(url, r, status_callback):
-		return False
-
-	aws_auth = AWSSigV4(
+def _build_aws_auth(credentials):
+	return AWSSigV4(
 		"vod",
 		region="ap-singapore-1",
-		aws_access_key_id=r.json()["video_token_v5"]["access_key_id"],
-		aws_secret_access_key=r.json()["video_token_v5"]["secret_acess_key"],
-		aws_session_token=r.json()["video_token_v5"]["session_token"],
+		aws_access_key_id=credentials["access_key_id"],
+		aws_secret_access_key=credentials["secret_acess_key"],
+		aws_session_token=credentials["session_token"],
 	)
+
+
+def _video_file_and_size(video_file):
 	video_path = _resolve_video_path(video_file)
-	with open(video_path, "rb") as f:
-		video_content = f.read()
-	file_size = len(video_content)
-	url = f"https://www.tiktok.com/top/v1?Action=ApplyUploadInner&Version=2020-11-19&SpaceName=tiktok&FileType=video&IsInner=1&FileSize={file_size}&s=g158iqx8434"
+	return video_path, os.path.getsize(video_path)
 
-	r = session.get(url, auth=aws_auth)
-	if not assert_success(url, r, status_callback):
-		return False
 
-	# upload chunks
-	upload_node = r.json()["Result"]["InnerUploadAddress"]["UploadNodes"][0]
-	video_id = upload_node["Vid"]
-	store_uri = upload_node["StoreInfos"][0]["StoreUri"]
-	video_auth = upload_node["StoreInfos"][0]["Auth"]
-	upload_host = upload_node["UploadHost"]
-	session_key = upload_node["SessionKey"]
-	chunk_size = 5242880
-	chunks = []
-	i = 0
-	while i < file_size:
-		chunks.append(video_content[i: i + chunk_size])
-		i += chunk_size
-	crcs = []
-	upload_id = str(uuid.uuid4())
-	for i in range(len(chunks)):
-		chunk = chunks[i]
-		crc = crc32(chunk)
-		crcs.append(crc)
-		url = f"https://{upload_host}/{store_uri}?partNumber={i + 1}&uploadID={upload_id}&phase=transfer"
-		headers = {
-			"Authorization": video_auth,
-			"Content-Type": "application/octet-stream",
-			"Content-Disposition": 'attachment; filename="undefined"',
-			"Content-Crc32": crc,
-		}
+_UPLOAD_SESSION_FIELDS = ("video_id", "store_uri", "video_auth", "upload_host", "session_key", "upload_id")
+
+
+def _resumed_upload_session(journal):
+	# A resumed upload must keep the part layout it was started with.
+	upload = {name: journal.get(name) for name in _UPLOAD_SESSION_FIELDS}
+	return upload, _build_aws_auth(journal.get("aws_credentials")), journal.get("chunk_size", DEFAULT_CHUNK_SIZE), journal.confirmed_parts
+
+
+def _new_upload_session(payload, credentials, adaptive, journal):
+	# ApplyUploadInner answered: pick the part size and journal the session so it can be resumed.
+	upload = _parse_upload_node(payload)
+	upload["upload_id"] = str(uuid.uuid4())
+	chunk_size = get_tuner().settings_for(upload["upload_host"]).chunk_size if adaptive else DEFAULT_CHUNK_SIZE
+	if journal is not None:
+		journal.record_upload_session(
+			chunk_size=chunk_size,
+			aws_credentials={
+				"access_key_id": credentials["access_key_id"],
+				"secret_acess_key": credentials["secret_acess_key"],
+				"session_token": credentials["session_token"],
+			},
+			**upload,
+		)
+	return upload, chunk_size
+
+
+def _transfer_settings(upload_host, chunk_size, concurrency, adaptive, status_callback):
+	if not adaptive:
+		return None, concurrency
+	settings = TransferSettings(chunk_size, concurrency or get_tuner().settings_for(upload_host).concurrency)
+	_relay_status(status_callback, f"[INFO]: Adaptive transfer to {upload_host}: {chunk_size // 1024} KiB parts, {settings.concurrency} in flight")
+	return settings, settings.concurrency
+
+
+def _transfer_failed(exc, journal, status_callback):
+	_relay_status(status_callback, f"[-] {exc}")
+	if isinstance(exc, UploadSessionRejected) and journal is not None:
+		journal.discard()
+
+
+def _upload_info(upload, crcs, aws_auth):
+	return upload["video_id"], upload["session_key"], upload["upload_id"], crcs, upload["upload_host"], upload["store_uri"], upload["video_auth"], aws_auth
+
+
+def upload_to_tiktok(video_file, session, status_callback=None, concurrency=None, journal=None, adaptive=None, credentials=None, priority=None, bandwidth_limit=None, trace=None):
+	trace = trace if trace is not None else UploadTrace(str(video_file))
+	video_path, file_size = _video_file_and_size(video_file)
+	adaptive = ADAPTIVE_TRANSFER_ENABLED if adaptive is None else adaptive
 
-		r = session.post(url, headers=headers, data=chunk)
+	if journal is not None and journal.is_resumable():
+		upload, aws_auth, chunk_size, completed = _resumed_upload_session(journal)
+	else:
+		# Credentials may have been fetched already while the video was being processed.
+		if credentials is None:
+			credentials = _fetch_upload_credentials(session, status_callback, trace)
+			if credentials is None:
+				return False
+		aws_auth = _build_aws_auth(credentials)
+		url = _apply_upload_url(file_size)
+
+		trace.begin("apply_upload")
+		r = session.get(url, auth=aws_auth)
+		if is_auth_failure(r.status_code, r.content):
+			# Cached credentials were revoked or expired early: fetch fresh ones once.
+			credentials = _fetch_upload_credentials(session, status_callback, trace, refresh=True)
+			if credentials is None:
+				trace.end("apply_upload", ok=False)
+				return False
+			aws_auth = _build_aws_auth(credentials)
+			r = session.get(url, auth=aws_auth)
+		if not assert_success(url, r, status_callback):
+			trace.end("apply_upload", ok=False)
+			return False
+		trace.end("apply_upload")
+
+		# upload chunks
+		upload, chunk_size = _new_upload_session(r.json(), credentials, adaptive, journal)
+		completed = {}
+
+	upload_host = upload["upload_host"]
+	throttle = None
+
+	def send_part(part_number, chunk, crc):
+		url, headers = _part_request(upload_host, upload["store_uri"], upload["upload_id"], upload["video_auth"], part_number, crc)
+		return session.post(url, headers=headers, data=throttle.body(chunk) if throttle else chunk)
+
+	part_results = []
+
+	def on_part_done(result):
+		part_results.append(result)
+		trace.record_part(result)
+		if journal is not None:
+			journal.confirm_part(result.part_number, result.crc)
+
+	settings, concurrency = _transfer_settings(upload_host, chunk_size, concurrency, adaptive, status_callback)
+
+	# Parts are mmap-backed views read lazily from disk and sent by a bounded worker pool;
+	# each part is validated and retried on its own.
+	trace.set(upload_host=upload_host, file_size=file_size, chunk_size=chunk_size, concurrency=concurrency, parts_resumed=len(completed))
+	transfer_started = time.monotonic()
+	transfer_failed = True
+	transfer_error = None
+	trace.begin("transfer")
+	try:
+		with get_limiter().throttle(priority, bandwidth_limit) as throttle, VideoChunkReader(video_path, chunk_size) as reader:
+			crcs = transfer_parts(
+				reader,
+				send_part,
+				concurrency=concurrency,
+				completed=completed,
+				on_part_done=on_part_done,
+			)
+		transfer_failed = False
+	except UploadTransferError as exc:
+		transfer_error = exc
+		_transfer_failed(exc, journal, status_callback)
+		return False
+	finally:
+		trace.end("transfer", ok=not transfer_failed)
+		if adaptive:
+			get_tuner().record(upload_host, settings, part_results, time.monotonic() - transfer_started, failed=transfer_failed, error=transfer_error)
 
-	return video_id, session_key, upload_id, crcs, upload_host, store_uri, video_auth, aws_auth
+	return _upload_info(upload, crcs, aws_auth)
 
 
 
@@ -0,0 +1,384 @@
+import asyncio
+import json
+import time
+from urllib.parse import urlencode
+
+import requests
+
+from .bandwidth import get_limiter
+from .bot_utils import (
+    MENTION_LOOKUP_HEADERS,
+    assert_success,
+    convert_tags,
+    extract_mentions,
+    extract_user_id,
+    generate_random_string,
+    profile_url,
+)
+from .http_transport import create_async_client, httpx
+from .mention_resolver import get_mention_resolver
+from .tiktok import (
+    _COMMIT_UPLOAD_URL,
+    _PUBLISH_URL,
+    _UPLOAD_AUTH_URL,
+    _abandon_resume,
+    _apply_upload_url,
+    _begin_upload,
+    _build_aws_auth,
+    _build_publish_payload,
+    _cached_upload_credentials,
+    _commit_upload_data,
+    _finish_request,
+    _new_upload_session,
+    _part_request,
+    _pipelined_preupload,
+    _preprocess_video,
+    _project_create_url,
+    _project_result,
+    _publish_result,
+    _record_published,
+    _release_upload_files,
+    _resumed_upload_session,
+    _sign_publish,
+    _status_reporter,
+    _step_succeeded,
+    _stored_mstoken,
+    _transfer_failed,
+    _transfer_settings,
+    _upload_credentials_result,
+    _upload_info,
+    _video_file_and_size,
+)
+from .transfer_tuner import ADAPTIVE_TRANSFER_ENABLED, get_tuner
+from .upload_auth import is_auth_failure
+from .upload_trace import UploadTrace, traced_upload
+from .upload_transfer import (
+    UploadTransferError,
+    VideoChunkReader,
+    iter_view_blocks,
+    transfer_parts_async,
+)
+
+
+def _signed_headers(aws_auth, method, url, client_headers, data=None):
+    """
+    Sign a TikTok "top/v1" call with the same AWSSigV4 auth the sync engine uses.
+
+    The signer works on a ``requests.PreparedRequest``; its headers are copied
+    onto the httpx request so both engines put identical bytes on the wire.
+    """
+    prepared = requests.Request(method, url, headers=dict(client_headers), data=data).prepare()
+    aws_auth(prepared)
+    return {name: value for name, value in prepared.headers.items() if name.lower() != "content-length"}
+
+
+async def _aws_request(client, method, url, aws_auth, data=None):
+    headers = _signed_headers(aws_auth, method, url, client.headers, data)
+    return await client.request(method, url, headers=headers, content=data)
+
+
+async def _fetch_upload_credentials(client, status_callback, trace, refresh=False):
+    session_id = client.cookies.get("sessionid", domain=".tiktok.com")
+    credentials = _cached_upload_credentials(session_id, refresh, trace)
+    if credentials is not None:
+        return credentials
+
+    url = _UPLOAD_AUTH_URL
+    trace.begin("upload_auth")
+    r = await client.get(url)
+    return _upload_credentials_result(session_id, url, r, status_callback, trace)
+
+
+async def _create_project(client, datacenter, dc_from_cookie, report_status, trace):
+    creation_id = generate_random_string(21, True)
+    project_url = _project_create_url(creation_id)
+    trace.begin("project_create")
+    r = await client.post(project_url)
+    return _project_result(creation_id, project_url, r, datacenter, dc_from_cookie, report_status, trace)
+
+
+async def _resolve_mentions(client, mentions, title):
+    # Like convert_tags with a session: whatever the resolver could not resolve is looked up once more.
+    try:
+        user_ids = dict(await mentions)
+    except Exception:
+        user_ids = {}
+    for username in extract_mentions(title):
+        if username not in user_ids:
+            r = await client.get(profile_url(username), headers=MENTION_LOOKUP_HEADERS)
+            user_ids[username] = extract_user_id(r.text)
+    return user_ids
+
+
+async def upload_video_async(session_file_path, video, title, schedule_time=0, allow_comment=1, allow_duet=0, allow_stitch=0, visibility_type=0, brand_organic_type=0, branded_content_type=0, ai_label=0, proxy=None, datacenter=None, status_callback=None, transfer_concurrency=None, resume_key=None, adaptive_transfer=None, pipelined=None, priority=None, bandwidth_limit=None, trace=None):
+    """
+    Asyncio counterpart of ``tiktok.upload_video`` with the same parameters and result.
+
+    Both engines share the URL, header and payload builders of ``tiktok.py``,
+    so requests are byte-identical; this one only waits on sockets instead of
+    threads, letting a single event loop drive many uploads at once.
+    """
+    with traced_upload(trace, video) as trace:
+        trace.success = await _upload_video_async(
+            session_file_path,
+            video,
+            title,
+            schedule_time=schedule_time,
+            allow_comment=allow_comment,
+            allow_duet=allow_duet,
+            allow_stitch=allow_stitch,
+            visibility_type=visibility_type,
+            brand_organic_type=brand_organic_type,
+            branded_content_type=branded_content_type,
+            ai_label=ai_label,
+            proxy=proxy,
+            datacenter=datacenter,
+            status_callback=status_callback,
+            transfer_concurrency=transfer_concurrency,
+            resume_key=resume_key,
+            adaptive_transfer=adaptive_transfer,
+            pipelined=pipelined,
+            priority=priority,
+            bandwidth_limit=bandwidth_limit,
+            trace=trace,
+        )
+        return trace.success
+
+
+async def _upload_video_async(session_file_path, video, title, schedule_time=0, allow_comment=1, allow_duet=0, allow_stitch=0, visibility_type=0, brand_organic_type=0, branded_content_type=0, ai_label=0, proxy=None, datacenter=None, status_callback=None, transfer_concurrency=None, resume_key=None, adaptive_transfer=None, pipelined=None, priority=None, bandwidth_limit=None, trace=None):
+    if httpx is None:
+        raise RuntimeError("The async upload engine requires httpx: pip install 'httpx>=0.27'")
+
+    _report_status = _status_reporter(status_callback)
+
+    # Cookie file, journal directory and msToken store are read and written on a thread.
+    started = await asyncio.to_thread(_begin_upload, session_file_path, video, title, schedule_time, visibility_type, datacenter, resume_key, _report_status)
+    if started is None:
+        return False
+    user_agent, session_id, dc_id, dc_from_cookie, journal = started
+    processed_video = None
+    resolver = await asyncio.to_thread(get_mention_resolver)
+
+    async with create_async_client(proxy) as client:
+        client.cookies.set("sessionid", session_id, domain=".tiktok.com")
+        client.cookies.set("tt-target-idc", dc_id, domain=".tiktok.com")
+        client.headers.update({
+            "User-Agent": user_agent,
+            "Accept": "application/json, text/plain, */*",
+        })
+        # Mention lookups only need the client, so they run while the video is transferred.
+        mentions = asyncio.ensure_future(
+            resolver.resolve_async(client, extract_mentions(title), network_errors=(httpx.HTTPError,))
+        )
+
+        try:
+            upload_info = None
+            if await asyncio.to_thread(journal.is_resumable):
+                processed_video = journal.processed_video
+                creation_id = journal.get("creation_id")
+                trace.set(resumed=True)
+                _report_status(f"[INFO]: Resuming interrupted upload ({len(journal.confirmed_parts)} parts already confirmed)")
+                upload_info = await upload_to_tiktok_async(processed_video, client, status_callback=_report_status, concurrency=transfer_concurrency, journal=journal, adaptive=adaptive_transfer, priority=priority, bandwidth_limit=bandwidth_limit, trace=trace)
+                if not upload_info:
+                    if not await asyncio.to_thread(_abandon_resume, journal, processed_video, _report_status):
+                        return False
+                    processed_video = None
+            else:
+                await asyncio.to_thread(journal.discard)
+
+            if not upload_info:
+                credentials = None
+                if _pipelined_preupload(pipelined):
+                    # ApplyUploadInner needs the processed file size, so only it waits for ffmpeg.
+                    preprocessing = asyncio.ensure_future(asyncio.to_thread(_preprocess_video, video, trace))
+                    try:
+                        project = await _create_project(client, datacenter, dc_from_cookie, _report_status, trace)
+                        if project:
+                            credentials = await _fetch_upload_credentials(client, _report_status, trace)
+                    finally:
+                        processed_video = await preprocessing
+                    if not project or not credentials:
+                        return False
+                else:
+                    processed_video = await asyncio.to_thread(_preprocess_video, video, trace)
+                    project = await _create_project(client, datacenter, dc_from_cookie, _report_status, trace)
+                    if not project:
+                        return False
+                creation_id, project_id = project
+                await asyncio.to_thread(journal.start, processed_video, creation_id, project_id)
+
+                upload_info = await upload_to_tiktok_async(processed_video, client, status_callback=_report_status, concurrency=transfer_concurrency, journal=journal, adaptive=adaptive_transfer, priority=priority, bandwidth_limit=bandwidth_limit, trace=trace, credentials=credentials)
+                if not upload_info:
+                    _report_status("[-] Failed to initialize TikTok upload session.")
+                    return False
+            video_id, session_key, upload_id, crcs, upload_host, store_uri, video_auth, aws_auth = upload_info
+
+            url, headers, data = _finish_request(upload_host, store_uri, upload_id, video_auth, crcs)
+            trace.begin("finish")
+            r = await client.post(url, headers=headers, content=data)
+            if not _step_succeeded("finish", url, r, trace, _report_status):
+                return False
+
+            url = _COMMIT_UPLOAD_URL
+            trace.begin("commit_upload")
+            r = await _aws_request(client, "POST", url, aws_auth, _commit_upload_data(session_key))
+            if not _step_succeeded("commit_upload", url, r, trace, _report_status):
+                return False
+
+            url = "https://www.tiktok.com"
+            headers = {
+                "user-agent": user_agent
+            }
+            trace.begin("preflight")
+            r = await client.head(url, headers=headers)
+            if not _step_succeeded("preflight", url, r, trace, _report_status):
+                return False
+
+            headers = {
+                "content-type": "application/json",
+                "user-agent": user_agent
+            }
+            with trace.phase("mentions"):
+                user_ids = await _resolve_mentions(client, mentions, title)
+                markup_text, text_extra = convert_tags(title, None, user_ids=user_ids)
+            data = _build_publish_payload(
+                creation_id,
+                video_id,
+                title,
+                text_extra,
+                schedule_time=schedule_time,
+                visibility_type=visibility_type,
+                allow_comment=allow_comment,
+                allow_duet=allow_duet,
+                allow_stitch=allow_stitch,
+                brand_organic_type=brand_organic_type,
+                branded_content_type=branded_content_type,
+                ai_label=ai_label,
+            )
+
+            mstoken_store, stored_mstoken = await asyncio.to_thread(_stored_mstoken, session_file_path, session_id, client.cookies.get("msToken"))
+            if stored_mstoken:
+                client.cookies.set("msToken", stored_mstoken, domain=".tiktok.com")
+
+            while True:
+                trace.begin("sign")
+                mstoken = client.cookies.get("msToken")
+                if not mstoken:
+                    # TikTok expects msToken from visiting the main site; perform a lightweight GET if it's missing
+                    bootstrap_url = "https://www.tiktok.com/"
+                    bootstrap_resp = await client.get(bootstrap_url, headers=headers)
+                    if not assert_success(bootstrap_url, bootstrap_resp, _report_status):
+                        _report_status("[-] Failed to obtain msToken from TikTok bootstrap endpoint.")
+                        return False
+                    mstoken = client.cookies.get("msToken")
+                    if not mstoken:
+                        _report_status("[-] TikTok did not issue an msToken cookie; aborting publish.")
+                        return False
+                    await asyncio.to_thread(mstoken_store.save, mstoken)
+
+                project_post_dict = await asyncio.to_thread(_sign_publish, user_agent, mstoken, _report_status)
+                if project_post_dict is None:
+                    return False
+                trace.end("sign")
+
+                # Encode the query the way requests does so signatures are sent verbatim.
+                url = _PUBLISH_URL
+                trace.begin("publish")
+                r = await client.post(f"{url}?{urlencode(project_post_dict, doseq=True)}", content=json.dumps(data), headers=headers)
+                published = _publish_result(url, r, stored_mstoken, schedule_time, _report_status)
+                if published is None:
+                    await asyncio.to_thread(mstoken_store.clear)
+                    client.cookies.delete("msToken", domain=".tiktok.com")
+                    stored_mstoken = None
+                    continue
+                if not published:
+                    return False
+                trace.end("publish")
+                break
+
+            await asyncio.to_thread(_record_published, mstoken_store, client.cookies.get("msToken") or mstoken, journal, title)
+            return True
+        finally:
+            mentions.cancel()
+            await asyncio.to_thread(_release_upload_files, journal, processed_video)
+
+
+async def upload_to_tiktok_async(video_file, client, status_callback=None, concurrency=None, journal=None, adaptive=None, credentials=None, priority=None, bandwidth_limit=None, trace=None):
+    trace = trace if trace is not None else UploadTrace(str(video_file))
+    video_path, file_size = await asyncio.to_thread(_video_file_and_size, video_file)
+    adaptive = ADAPTIVE_TRANSFER_ENABLED if adaptive is None else adaptive
+
+    if journal is not None and await asyncio.to_thread(journal.is_resumable):
+        upload, aws_auth, chunk_size, completed = await asyncio.to_thread(_resumed_upload_session, journal)
+    else:
+        if credentials is None:
+            credentials = await _fetch_upload_credentials(client, status_callback, trace)
+            if credentials is None:
+                return False
+        aws_auth = _build_aws_auth(credentials)
+        url = _apply_upload_url(file_size)
+
+        trace.begin("apply_upload")
+        r = await _aws_request(client, "GET", url, aws_auth)
+        if is_auth_failure(r.status_code, r.content):
+            # Cached credentials were revoked or expired early: fetch fresh ones once.
+            credentials = await _fetch_upload_credentials(client, status_callback, trace, refresh=True)
+            if credentials is None:
+                trace.end("apply_upload", ok=False)
+                return False
+            aws_auth = _build_aws_auth(credentials)
+            r = await _aws_request(client, "GET", url, aws_auth)
+        if not assert_success(url, r, status_callback):
+            trace.end("apply_upload", ok=False)
+            return False
+        trace.end("apply_upload")
+
+        upload, chunk_size = await asyncio.to_thread(_new_upload_session, r.json(), credentials, adaptive, journal)
+        completed = {}
+
+    upload_host = upload["upload_host"]
+    throttle = None
+
+    async def send_part(part_number, chunk, crc):
+        url, headers = _part_request(upload_host, upload["store_uri"], upload["upload_id"], upload["video_auth"], part_number, crc)
+        # An explicit length keeps httpx from switching the streamed body to chunked encoding.
+        headers["Content-Length"] = str(chunk.nbytes)
+        body = throttle.aiter_blocks(chunk) if throttle else iter_view_blocks(chunk)
+        return await client.post(url, headers=headers, content=body)
+
+    part_results = []
+
+    def on_part_done(result):
+        part_results.append(result)
+        trace.record_part(result)
+        if journal is not None:
+            journal.confirm_part(result.part_number, result.crc)
+
+    settings, concurrency = await asyncio.to_thread(_transfer_settings, upload_host, chunk_size, concurrency, adaptive, status_callback)
+
+    trace.set(upload_host=upload_host, file_size=file_size, chunk_size=chunk_size, concurrency=concurrency, parts_resumed=len(completed))
+    transfer_started = time.monotonic()
+    transfer_failed = True
+    transfer_error = None
+    trace.begin("transfer")
+    try:
+        with get_limiter().throttle(priority, bandwidth_limit) as throttle, VideoChunkReader(video_path, chunk_size) as reader:
+            crcs = await transfer_parts_async(
+                reader,
+                send_part,
+                concurrency=concurrency,
+                completed=completed,
+                on_part_done=on_part_done,
+                retry_exceptions=(httpx.TransportError,),
+            )
+        transfer_failed = False
+    except UploadTransferError as exc:
+        transfer_error = exc
+        await asyncio.to_thread(_transfer_failed, exc, journal, status_callback)
+        return False
+    finally:
+        trace.end("transfer", ok=not transfer_failed)
+        if adaptive:
+            await asyncio.to_thread(get_tuner().record, upload_host, settings, part_results, time.monotonic() - transfer_started, failed=transfer_failed, error=transfer_error)
+
+    return _upload_info(upload, crcs, aws_auth)
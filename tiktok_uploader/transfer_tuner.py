@@ -0,0 +1,147 @@
+import json
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+from .Config import Config
+from .basics import write_json_atomic
+from .upload_auth import is_auth_failure
+from .upload_transfer import DEFAULT_CHUNK_SIZE, DEFAULT_TRANSFER_CONCURRENCY, PartResult, UploadSessionRejected
+
+
+_MIB = 1024 * 1024
+
+ADAPTIVE_TRANSFER_ENABLED = os.getenv("TIKTOK_UPLOAD_ADAPTIVE", "0").lower() in ("1", "true", "yes")
+# Bounds kept well inside what the upload host accepts for multipart uploads.
+MIN_CHUNK_SIZE = int(os.getenv("TIKTOK_UPLOAD_MIN_CHUNK_BYTES", str(1 * _MIB)))
+MAX_CHUNK_SIZE = int(os.getenv("TIKTOK_UPLOAD_MAX_CHUNK_BYTES", str(16 * _MIB)))
+MIN_CONCURRENCY = 1
+MAX_CONCURRENCY = int(os.getenv("TIKTOK_UPLOAD_MAX_CONCURRENCY", "12"))
+
+# A transfer with more retries than this (per attempt) is treated as congested.
+_ERROR_RATE_THRESHOLD = 0.05
+# Throughput may dip this much below the best seen before growth stops.
+_THROUGHPUT_TOLERANCE = 0.9
+_CHUNK_STEP = 1 * _MIB
+
+
+@dataclass
+class TransferSettings:
+    """Chunk size and in-flight part count used for one upload."""
+
+    chunk_size: int = DEFAULT_CHUNK_SIZE
+    concurrency: int = DEFAULT_TRANSFER_CONCURRENCY
+
+    def clamped(self) -> "TransferSettings":
+        chunk_size = min(MAX_CHUNK_SIZE, max(MIN_CHUNK_SIZE, self.chunk_size))
+        # Keep parts page aligned so the mmap reader can drop them cleanly.
+        chunk_size -= chunk_size % (64 * 1024)
+        concurrency = min(MAX_CONCURRENCY, max(MIN_CONCURRENCY, self.concurrency))
+        return TransferSettings(chunk_size, concurrency)
+
+
+def _tuning_path() -> Path:
+    base_dir = Path(Config.get().state_dir)
+    if not base_dir.is_absolute():
+        base_dir = Path.cwd() / base_dir
+    base_dir.mkdir(parents=True, exist_ok=True)
+    return base_dir / "transfer_tuning.json"
+
+
+def _is_rejection(error: Optional[BaseException]) -> bool:
+    if isinstance(error, UploadSessionRejected):
+        return True
+    status_code = getattr(error, "status_code", None)
+    return status_code is not None and is_auth_failure(status_code, b"")
+
+
+class TransferTuner:
+    """
+    AIMD tuner for chunk size and concurrency, remembered per upload host.
+
+    After each upload the measured throughput and retry rate decide the settings
+    for the next upload to the same host: clean transfers that keep up with the
+    best throughput grow both values additively, while retries or failures halve
+    them. A transfer the host refused (expired session or credentials) says
+    nothing about the link and leaves the settings as they are.
+    """
+
+    def __init__(self, path: Optional[Path] = None) -> None:
+        self.path = path or _tuning_path()
+        self._lock = threading.Lock()
+        self._hosts: Dict[str, Dict] = {}
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+            if isinstance(data, dict):
+                self._hosts = data
+        except (OSError, ValueError):
+            pass
+
+    def settings_for(self, upload_host: str) -> TransferSettings:
+        with self._lock:
+            entry = self._hosts.get(upload_host)
+        if not entry:
+            return TransferSettings().clamped()
+        return TransferSettings(entry["chunk_size"], entry["concurrency"]).clamped()
+
+    def record(
+        self,
+        upload_host: str,
+        settings: TransferSettings,
+        results: Iterable[PartResult],
+        elapsed: float,
+        failed: bool = False,
+        error: Optional[BaseException] = None,
+    ) -> TransferSettings:
+        """Feed the outcome of one transfer (``error``: what made it fail) and return the settings for the next one."""
+        results = list(results)
+        sent_bytes = sum(result.size for result in results)
+        attempts = sum(result.attempts for result in results)
+        retries = sum(result.retries for result in results)
+        error_rate = retries / attempts if attempts else (1.0 if failed else 0.0)
+        throughput = sent_bytes / elapsed if elapsed > 0 else 0.0
+
+        with self._lock:
+            entry = self._hosts.get(upload_host, {})
+            best = entry.get("best_throughput", 0.0)
+            if failed and _is_rejection(error):
+                next_settings = settings
+            elif failed or error_rate > _ERROR_RATE_THRESHOLD:
+                next_settings = TransferSettings(settings.chunk_size // 2, settings.concurrency // 2)
+            elif not results:
+                next_settings = settings
+            elif throughput >= best * _THROUGHPUT_TOLERANCE:
+                next_settings = TransferSettings(settings.chunk_size + _CHUNK_STEP, settings.concurrency + 1)
+            else:
+                # Slower than before without errors: the link is saturated, stop growing.
+                next_settings = TransferSettings(settings.chunk_size, settings.concurrency - 1)
+            next_settings = next_settings.clamped()
+
+            entry = dict(asdict(next_settings))
+            entry["best_throughput"] = max(best, throughput) if not failed else best
+            entry["last_throughput"] = throughput
+            entry["last_error_rate"] = error_rate
+            entry["updated_at"] = time.time()
+            self._hosts[upload_host] = entry
+            try:
+                write_json_atomic(self.path, self._hosts, mode=0o644)
+            except OSError:
+                pass
+        return next_settings
+
+
+_tuner: Optional[TransferTuner] = None
+_tuner_lock = threading.Lock()
+
+
+def get_tuner() -> TransferTuner:
+    """Return the process-wide tuner backed by ``STATE_DIR/transfer_tuning.json``."""
+    global _tuner
+    with _tuner_lock:
+        if _tuner is None:
+            _tuner = TransferTuner()
+        return _tuner
@@ -0,0 +1,100 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+
+# How long fetched upload credentials are reused when TikTok does not say when they expire.
+DEFAULT_CREDENTIAL_TTL_SECONDS = int(os.getenv("TIKTOK_UPLOAD_AUTH_TTL_SECONDS", "600"))
+# Stop handing out credentials this long before they expire so in-flight uploads can finish.
+_EXPIRY_MARGIN_SECONDS = 60
+
+_EXPIRY_FIELDS = ("expired_time", "expire_time", "expiration", "ExpiredTime")
+_AUTH_FAILURE_STATUSES = (401, 403)
+_AUTH_FAILURE_CODES = ("SignatureDoesNotMatch", "InvalidAccessKeyId", "InvalidSecurityToken", "ExpiredToken", "AccessDenied")
+
+
+def _credential_expiry(credentials: Dict, now: float, ttl: int) -> float:
+    for field in _EXPIRY_FIELDS:
+        value = credentials.get(field)
+        try:
+            expires_at = float(value)
+        except (TypeError, ValueError):
+            continue
+        if expires_at > 1e12:
+            # Milliseconds since the epoch.
+            expires_at /= 1000
+        if expires_at > now:
+            return min(expires_at, now + ttl)
+    return now + ttl
+
+
+def _cache_key(session_id: str) -> str:
+    return hashlib.sha256(session_id.encode("utf-8")).hexdigest()
+
+
+class UploadCredentialCache:
+    """
+    Per-session cache of the ``video_token_v5`` credentials used to sign upload calls.
+
+    Credentials are identical for every upload of an account until they
+    expire, so a batch only needs one ``/video/upload/auth/`` round trip. Only
+    the credential dict is cached; callers build their own ``AWSSigV4`` from it
+    because the signer keeps per-request state and is not thread-safe.
+    """
+
+    def __init__(self, ttl_seconds: int = DEFAULT_CREDENTIAL_TTL_SECONDS) -> None:
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Tuple[Dict, float]] = {}
+
+    def get(self, session_id: Optional[str]) -> Optional[Dict]:
+        if not session_id:
+            return None
+        key = _cache_key(session_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            credentials, expires_at = entry
+            if time.time() >= expires_at - _EXPIRY_MARGIN_SECONDS:
+                del self._entries[key]
+                return None
+            return credentials
+
+    def put(self, session_id: Optional[str], credentials: Dict) -> None:
+        if not session_id:
+            return
+        now = time.time()
+        with self._lock:
+            self._entries[_cache_key(session_id)] = (credentials, _credential_expiry(credentials, now, self.ttl_seconds))
+
+    def invalidate(self, session_id: Optional[str]) -> None:
+        if not session_id:
+            return
+        with self._lock:
+            self._entries.pop(_cache_key(session_id), None)
+
+
+def is_auth_failure(status_code: int, body: bytes) -> bool:
+    """True when a signed top/v1 call was rejected because of its credentials."""
+    if status_code in _AUTH_FAILURE_STATUSES:
+        return True
+    try:
+        payload = json.loads(body) if body else None
+    except (ValueError, UnicodeDecodeError):
+        return False
+    if not isinstance(payload, dict):
+        return False
+    error = (payload.get("ResponseMetadata") or {}).get("Error") or {}
+    return isinstance(error, dict) and error.get("Code") in _AUTH_FAILURE_CODES
+
+
+_cache = UploadCredentialCache()
+
+
+def credential_cache() -> UploadCredentialCache:
+    """Return the process-wide upload credential cache."""
+    return _cache
@@ -0,0 +1,173 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional, Set
+
+from .Config import Config
+from .basics import write_json_atomic
+
+
+DEFAULT_RESUME_TTL_SECONDS = int(os.getenv("TIKTOK_UPLOAD_RESUME_TTL_SECONDS", "3600"))
+
+_JOURNAL_VERSION = 1
+
+
+def _journal_directory() -> Path:
+    base_dir = Path(Config.get().state_dir)
+    if not base_dir.is_absolute():
+        base_dir = Path.cwd() / base_dir
+    target_dir = base_dir / "journals"
+    target_dir.mkdir(parents=True, exist_ok=True)
+    return target_dir
+
+
+def _source_fingerprint(video_path: str) -> str:
+    """Identify a source video by location, size and mtime without reading it."""
+    path = Path(video_path)
+    try:
+        stat = path.stat()
+    except OSError:
+        return str(path.resolve())
+    return f"{path.resolve()}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+class TransferJournal:
+    """
+    On-disk record of an in-progress upload so an interrupted transfer can resume.
+
+    The journal holds the TikTok project, the upload session returned by
+    ApplyUploadInner (including its credentials) and the CRC of every part the
+    upload host confirmed. It is rewritten atomically after each confirmed part.
+    """
+
+    def __init__(self, path: Path, ttl_seconds: int = DEFAULT_RESUME_TTL_SECONDS) -> None:
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._data: Dict = {}
+        self._load()
+
+    @classmethod
+    def for_upload(cls, session_id: str, video_path: str, resume_key: Optional[str] = None) -> "TransferJournal":
+        """Return the journal for uploading ``video_path`` with the account ``session_id``."""
+        identity = resume_key or _source_fingerprint(video_path)
+        key = hashlib.sha256(f"{session_id}\0{identity}".encode("utf-8")).hexdigest()[:32]
+        prune_expired_journals()
+        return cls(_journal_directory() / f"{key}.json")
+
+    def _load(self) -> None:
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if isinstance(data, dict) and data.get("version") == _JOURNAL_VERSION:
+            self._data = data
+
+    def _save(self) -> None:
+        write_json_atomic(self.path, self._data)
+
+    def get(self, name: str, default=None):
+        return self._data.get(name, default)
+
+    @property
+    def has_upload_session(self) -> bool:
+        return bool(self._data.get("upload_id") and self._data.get("store_uri"))
+
+    @property
+    def processed_video(self) -> Optional[str]:
+        return self._data.get("processed_video")
+
+    @property
+    def confirmed_parts(self) -> Dict[int, str]:
+        with self._lock:
+            return {int(number): crc for number, crc in self._data.get("parts", {}).items()}
+
+    def is_expired(self) -> bool:
+        created_at = self._data.get("created_at", 0)
+        return time.time() - created_at > self.ttl_seconds
+
+    def is_resumable(self) -> bool:
+        """True when the stored upload session can still be continued."""
+        if not self.has_upload_session or self.is_expired():
+            return False
+        processed = self.processed_video
+        if not processed or not os.path.exists(processed):
+            return False
+        return os.path.getsize(processed) == self._data.get("file_size")
+
+    def start(self, processed_video: str, creation_id: str, project_id: str) -> None:
+        """Reset the journal for a fresh upload of ``processed_video``."""
+        with self._lock:
+            self._data = {
+                "version": _JOURNAL_VERSION,
+                "created_at": time.time(),
+                "processed_video": processed_video,
+                "file_size": os.path.getsize(processed_video),
+                "creation_id": creation_id,
+                "project_id": project_id,
+                "parts": {},
+            }
+            self._save()
+
+    def record_upload_session(self, **fields) -> None:
+        """Store the upload session fields (upload_id, store_uri, auth data, ...)."""
+        with self._lock:
+            self._data.update(fields)
+            self._data["parts"] = {}
+            self._save()
+
+    def confirm_part(self, part_number: int, crc: str) -> None:
+        with self._lock:
+            self._data.setdefault("parts", {})[str(part_number)] = crc
+            self._save()
+
+    def discard(self) -> None:
+        with self._lock:
+            self._data = {}
+            try:
+                self.path.unlink()
+            except FileNotFoundError:
+                pass
+
+
+def _read_journal_file(path: Path) -> Dict:
+    try:
+        with open(path, "r") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def journaled_videos() -> Set[str]:
+    """Absolute paths of the videos that journals keep for resuming their uploads."""
+    videos = set()
+    for path in _journal_directory().glob("*.json"):
+        processed = _read_journal_file(path).get("processed_video")
+        if processed:
+            videos.add(os.path.abspath(processed))
+    return videos
+
+
+def prune_expired_journals(ttl_seconds: int = DEFAULT_RESUME_TTL_SECONDS) -> None:
+    """Delete stale journals together with the sanitized videos they kept alive."""
+    directory = _journal_directory()
+    now = time.time()
+    for path in directory.glob("*.json"):
+        data = _read_journal_file(path)
+        if now - data.get("created_at", 0) <= ttl_seconds:
+            continue
+        processed = data.get("processed_video")
+        if processed and Path(processed).parent.name == "sanitized":
+            try:
+                os.unlink(processed)
+            except OSError:
+                pass
+        try:
+            path.unlink()
+        except OSError:
+            pass
@@ -0,0 +1,153 @@
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+from .upload_transfer import PartResult
+
+
+# Append one JSON line per finished upload to this file when set.
+TRACE_FILE = os.getenv("TIKTOK_UPLOAD_TRACE_FILE", "")
+
+_write_lock = threading.Lock()
+
+
+class UploadTrace:
+    """
+    Structured timing record of one upload.
+
+    Phases (``preprocess``, ``project_create``, ``upload_auth``, ``apply_upload``,
+    ``transfer``, ``finish``, ``commit_upload``, ``publish``, ...) are recorded as
+    spans with wall-clock start/end and a success flag; they may overlap when
+    steps run concurrently. Every confirmed part adds its size, latency and
+    retry count. Pass an instance to ``upload_video`` to read it afterwards.
+    """
+
+    def __init__(self, video: Optional[str] = None, trace_file: Optional[str] = None) -> None:
+        self.trace_id = uuid.uuid4().hex
+        self.video = video
+        self.trace_file = TRACE_FILE if trace_file is None else trace_file
+        self.started_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.success: Optional[bool] = None
+        self.error: Optional[str] = None
+        self.attributes: Dict[str, object] = {}
+        self.phases: List[Dict] = []
+        self.parts: List[Dict] = []
+        self._open: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def begin(self, name: str) -> None:
+        with self._lock:
+            self._open[name] = {"name": name, "start": time.time(), "_started": time.monotonic()}
+
+    def end(self, name: str, ok: bool = True) -> None:
+        with self._lock:
+            span = self._open.pop(name, None)
+            if span is None:
+                return
+            started = span.pop("_started")
+            span["end"] = time.time()
+            span["duration_ms"] = round((time.monotonic() - started) * 1000, 1)
+            span["ok"] = ok
+            self.phases.append(span)
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        self.begin(name)
+        ok = False
+        try:
+            yield
+            ok = True
+        finally:
+            self.end(name, ok)
+
+    def set(self, **attributes) -> None:
+        """Attach upload details such as ``upload_host`` or ``chunk_size``."""
+        with self._lock:
+            self.attributes.update(attributes)
+
+    def record_part(self, result: PartResult) -> None:
+        with self._lock:
+            self.parts.append({
+                "part_number": result.part_number,
+                "size": result.size,
+                "latency_ms": round(result.elapsed * 1000, 1),
+                "retries": result.retries,
+            })
+
+    @property
+    def bytes_sent(self) -> int:
+        """Part bytes put on the wire, counting every retried attempt."""
+        return sum(part["size"] * (part["retries"] + 1) for part in self.parts)
+
+    @property
+    def duration_ms(self) -> Optional[float]:
+        if self.finished_at is None:
+            return None
+        return round((self.finished_at - self.started_at) * 1000, 1)
+
+    def slowest_phase(self) -> Optional[Dict]:
+        return max(self.phases, key=lambda span: span["duration_ms"], default=None)
+
+    def finish(self, success: bool, error: Optional[str] = None) -> None:
+        # Phases left open were interrupted by an early return or an exception.
+        for name in list(self._open):
+            self.end(name, ok=False)
+        self.success = success
+        self.error = error
+        self.finished_at = time.time()
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            return {
+                "trace_id": self.trace_id,
+                "video": self.video,
+                "success": self.success,
+                "error": self.error,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+                "duration_ms": self.duration_ms,
+                **self.attributes,
+                "bytes_sent": self.bytes_sent,
+                "part_retries": sum(part["retries"] for part in self.parts),
+                "phases": sorted(self.phases, key=lambda span: span["start"]),
+                "parts": sorted(self.parts, key=lambda part: part["part_number"]),
+            }
+
+    def write_jsonl(self, path: Optional[str] = None) -> None:
+        path = path or self.trace_file
+        if not path:
+            return
+        line = json.dumps(self.to_dict(), separators=(",", ":")) + "\n"
+        with _write_lock:
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(line)
+
+
+@contextmanager
+def traced_upload(trace: Optional[UploadTrace], video) -> Iterator[UploadTrace]:
+    """
+    Provide the trace for one ``upload_video`` call and finalize it afterwards.
+
+    The caller stores the outcome in ``trace.success``; an exception marks the
+    trace as failed. The finished trace is appended to the JSONL trace file.
+    """
+    trace = trace if trace is not None else UploadTrace()
+    if trace.video is None:
+        trace.video = str(video)
+    error = None
+    try:
+        yield trace
+    except BaseException as exc:
+        error = str(exc) or type(exc).__name__
+        raise
+    finally:
+        trace.finish(bool(trace.success) and error is None, error)
+        try:
+            trace.write_jsonl()
+        except OSError:
+            pass
@@ -0,0 +1,366 @@
+import asyncio
+import json
+import mmap
+import os
+import random
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from pathlib import Path
+from typing import AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple, Type
+
+from .bot_utils import crc32
+
+
+DEFAULT_CHUNK_SIZE = 5242880
+DEFAULT_TRANSFER_CONCURRENCY = int(os.getenv("TIKTOK_UPLOAD_CONCURRENCY", "4"))
+DEFAULT_PART_RETRIES = int(os.getenv("TIKTOK_UPLOAD_PART_RETRIES", "4"))
+DEFAULT_RETRY_BASE_DELAY = float(os.getenv("TIKTOK_UPLOAD_RETRY_BASE_DELAY_SECONDS", "0.5"))
+DEFAULT_RETRY_MAX_DELAY = float(os.getenv("TIKTOK_UPLOAD_RETRY_MAX_DELAY_SECONDS", "20"))
+
+# The upload host answers part transfers with {"code": 2000, "data": {"crc32": ...}}.
+_PART_SUCCESS_CODES = (0, 2000)
+_SESSION_REJECTED_STATUSES = (401, 403, 404)
+
+# Block size used when a part is streamed to an async HTTP client.
+_STREAM_BLOCK_SIZE = 256 * 1024
+
+_MADV_SEQUENTIAL = getattr(mmap, "MADV_SEQUENTIAL", None)
+_MADV_DONTNEED = getattr(mmap, "MADV_DONTNEED", None)
+
+
+@dataclass
+class PartResult:
+    """Outcome of one confirmed part, used for journaling and transfer statistics."""
+
+    part_number: int
+    size: int
+    crc: str
+    attempts: int
+    elapsed: float
+
+    @property
+    def retries(self) -> int:
+        return self.attempts - 1
+
+
+class UploadTransferError(RuntimeError):
+    """Raised when a part cannot be delivered to the upload host."""
+
+    def __init__(self, message: str, status_code: Optional[int] = None) -> None:
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class UploadSessionRejected(UploadTransferError):
+    """Raised when the upload host no longer accepts the upload session."""
+
+
+class VideoChunkReader:
+    """
+    Expose a video file as fixed-size upload parts without loading it into memory.
+
+    Parts are zero-copy ``memoryview`` slices of a read-only ``mmap``, so the
+    resident memory of an upload stays close to the part that is currently being
+    sent regardless of the file size.
+    """
+
+    def __init__(self, path, chunk_size: int = DEFAULT_CHUNK_SIZE) -> None:
+        if chunk_size <= 0:
+            raise ValueError("chunk_size must be positive")
+        self.path = Path(path)
+        self.chunk_size = chunk_size
+        self.size = 0
+        self._file = None
+        self._mmap: Optional[mmap.mmap] = None
+        self._view: Optional[memoryview] = None
+
+    def __enter__(self) -> "VideoChunkReader":
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    def open(self) -> None:
+        self._file = open(self.path, "rb")
+        self.size = os.fstat(self._file.fileno()).st_size
+        if self.size == 0:
+            # mmap refuses empty files; an empty video simply has no parts.
+            return
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if _MADV_SEQUENTIAL is not None:
+            try:
+                self._mmap.madvise(_MADV_SEQUENTIAL)
+            except OSError:
+                pass
+        self._view = memoryview(self._mmap)
+
+    def close(self) -> None:
+        if self._view is not None:
+            self._view.release()
+            self._view = None
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                # A caller still holds a part; the mapping goes away with it.
+                pass
+            self._mmap = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    @property
+    def part_count(self) -> int:
+        return (self.size + self.chunk_size - 1) // self.chunk_size
+
+    def part_bounds(self, index: int) -> Tuple[int, int]:
+        """Return the ``[start, end)`` byte range of the zero-based part ``index``."""
+        if index < 0 or index >= self.part_count:
+            raise IndexError(f"part index {index} out of range")
+        start = index * self.chunk_size
+        return start, min(start + self.chunk_size, self.size)
+
+    def part(self, index: int) -> memoryview:
+        """Return a zero-copy view over the zero-based part ``index``."""
+        if self._view is None:
+            raise RuntimeError("VideoChunkReader is not open")
+        start, end = self.part_bounds(index)
+        return self._view[start:end]
+
+    def drop_part(self, index: int) -> None:
+        """Hint the kernel that the pages backing ``index`` are no longer needed."""
+        if self._mmap is None or _MADV_DONTNEED is None:
+            return
+        start, end = self.part_bounds(index)
+        # madvise needs a page-aligned start; dropping a few extra pages is harmless
+        # because they are faulted back in from the page cache on demand.
+        start -= start % mmap.PAGESIZE
+        try:
+            self._mmap.madvise(_MADV_DONTNEED, start, end - start)
+        except (OSError, ValueError):
+            pass
+
+    def iter_parts(self) -> Iterator[Tuple[int, memoryview]]:
+        """Yield ``(part_number, view)`` pairs; part numbers start at 1."""
+        for index in range(self.part_count):
+            view = self.part(index)
+            try:
+                yield index + 1, view
+            finally:
+                view.release()
+                self.drop_part(index)
+
+
+def backoff_delay(attempt: int, base: float = DEFAULT_RETRY_BASE_DELAY, cap: float = DEFAULT_RETRY_MAX_DELAY) -> float:
+    """Exponential backoff with full jitter for the zero-based retry ``attempt``."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def check_part_response(part_number: int, status_code: int, body: bytes, crc: str) -> None:
+    """
+    Validate the upload host's answer to one part.
+
+    Raises ``UploadSessionRejected`` when the session itself is no longer accepted
+    and ``UploadTransferError`` for failures worth retrying, including a CRC that
+    differs from the one computed locally.
+    """
+    if status_code in _SESSION_REJECTED_STATUSES:
+        raise UploadSessionRejected(f"Upload host rejected part {part_number} with HTTP {status_code}", status_code)
+    if status_code != 200:
+        raise UploadTransferError(f"Part {part_number} failed with HTTP {status_code}", status_code)
+
+    try:
+        payload = json.loads(body) if body else None
+    except (ValueError, UnicodeDecodeError):
+        payload = None
+    if not isinstance(payload, dict):
+        return
+
+    code = payload.get("code")
+    if code is not None and code not in _PART_SUCCESS_CODES:
+        message = payload.get("message") or "unknown error"
+        raise UploadTransferError(f"Part {part_number} failed with code {code}: {message}", status_code)
+
+    data = payload.get("data")
+    reported = (data.get("crc32") if isinstance(data, dict) else None) or payload.get("crc32")
+    if reported and str(reported).lower().zfill(8) != crc:
+        raise UploadTransferError(f"Part {part_number} CRC mismatch: sent {crc}, upload host stored {reported}", status_code)
+
+
+def _send_with_retry(send_part: Callable, part_number: int, view: memoryview, crc: str, retries: int) -> int:
+    for attempt in range(retries + 1):
+        try:
+            response = send_part(part_number, view, crc)
+            check_part_response(part_number, response.status_code, response.content, crc)
+            return attempt + 1
+        except UploadSessionRejected:
+            raise
+        except (UploadTransferError, OSError) as exc:
+            # requests' exceptions derive from OSError, so network errors land here too.
+            if attempt >= retries:
+                raise UploadTransferError(
+                    f"Part {part_number} failed after {attempt + 1} attempts: {exc}",
+                    getattr(exc, "status_code", None),
+                ) from exc
+            time.sleep(backoff_delay(attempt))
+
+
+def _transfer_one(reader: VideoChunkReader, index: int, send_part: Callable, retries: int) -> PartResult:
+    view = reader.part(index)
+    try:
+        started = time.monotonic()
+        # zlib releases the GIL, so checksums overlap with sends on other workers.
+        crc = crc32(view)
+        attempts = _send_with_retry(send_part, index + 1, view, crc, retries)
+        return PartResult(index + 1, view.nbytes, crc, attempts, time.monotonic() - started)
+    finally:
+        view.release()
+        reader.drop_part(index)
+
+
+def transfer_parts(
+    reader: VideoChunkReader,
+    send_part: Callable[[int, memoryview, str], object],
+    concurrency: Optional[int] = None,
+    completed: Optional[Dict[int, str]] = None,
+    on_part_done: Optional[Callable[[PartResult], None]] = None,
+    retries: Optional[int] = None,
+) -> List[str]:
+    """
+    Checksum and send every part of ``reader`` with at most ``concurrency`` in flight.
+
+    ``send_part(part_number, view, crc)`` performs the network call for one part
+    and returns the response. Each response is validated and a failed part is
+    retried on its own with exponential backoff; ``on_part_done`` receives a
+    ``PartResult`` once the upload host accepted it. Parts listed in ``completed`` (part number
+    -> CRC) were confirmed by an earlier attempt and are skipped. The returned CRC
+    list is ordered by part number whatever the completion order, so it can be
+    committed as-is in the ``phase=finish`` call.
+    """
+    concurrency = max(1, concurrency or DEFAULT_TRANSFER_CONCURRENCY)
+    retries = DEFAULT_PART_RETRIES if retries is None else max(0, retries)
+
+    def run(index: int) -> Tuple[int, str]:
+        result = _transfer_one(reader, index, send_part, retries)
+        if on_part_done is not None:
+            on_part_done(result)
+        return index, result.crc
+
+    crcs: List[Optional[str]] = [None] * reader.part_count
+    remaining = []
+    for index in range(reader.part_count):
+        if completed and index + 1 in completed:
+            crcs[index] = completed[index + 1]
+        else:
+            remaining.append(index)
+
+    if concurrency == 1 or len(remaining) <= 1:
+        for index in remaining:
+            _, crcs[index] = run(index)
+        return crcs
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="tiktok-part") as pool:
+        pending = set()
+        try:
+            for index in remaining:
+                if len(pending) >= concurrency:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        part_index, crc = future.result()
+                        crcs[part_index] = crc
+                pending.add(pool.submit(run, index))
+            for future in wait(pending).done:
+                part_index, crc = future.result()
+                crcs[part_index] = crc
+        except BaseException:
+            for future in pending:
+                future.cancel()
+            raise
+    return crcs
+
+
+async def iter_view_blocks(view: memoryview, block_size: int = _STREAM_BLOCK_SIZE) -> AsyncIterator[bytes]:
+    """Stream a part as ``bytes`` blocks for async clients that cannot send a memoryview."""
+    for start in range(0, view.nbytes, block_size):
+        yield bytes(view[start:start + block_size])
+
+
+async def _send_with_retry_async(
+    send_part: Callable,
+    part_number: int,
+    view: memoryview,
+    crc: str,
+    retries: int,
+    retry_exceptions: Tuple[Type[BaseException], ...],
+) -> int:
+    for attempt in range(retries + 1):
+        try:
+            response = await send_part(part_number, view, crc)
+            check_part_response(part_number, response.status_code, response.content, crc)
+            return attempt + 1
+        except UploadSessionRejected:
+            raise
+        except (UploadTransferError, OSError) + retry_exceptions as exc:
+            if attempt >= retries:
+                raise UploadTransferError(
+                    f"Part {part_number} failed after {attempt + 1} attempts: {exc}",
+                    getattr(exc, "status_code", None),
+                ) from exc
+            await asyncio.sleep(backoff_delay(attempt))
+
+
+async def transfer_parts_async(
+    reader: VideoChunkReader,
+    send_part: Callable[[int, memoryview, str], Awaitable[object]],
+    concurrency: Optional[int] = None,
+    completed: Optional[Dict[int, str]] = None,
+    on_part_done: Optional[Callable[[PartResult], None]] = None,
+    retries: Optional[int] = None,
+    retry_exceptions: Tuple[Type[BaseException], ...] = (),
+) -> List[str]:
+    """
+    Coroutine version of ``transfer_parts`` for the asyncio upload engine.
+
+    ``send_part`` is awaited instead of run on a worker thread; checksums and
+    ``on_part_done`` (which usually writes the journal) still run on threads so
+    they never stall the event loop. ``retry_exceptions`` adds the client's
+    network errors to the ones retried with backoff.
+    """
+    concurrency = max(1, concurrency or DEFAULT_TRANSFER_CONCURRENCY)
+    retries = DEFAULT_PART_RETRIES if retries is None else max(0, retries)
+    in_flight = asyncio.Semaphore(concurrency)
+
+    crcs: List[Optional[str]] = [None] * reader.part_count
+    remaining = []
+    for index in range(reader.part_count):
+        if completed and index + 1 in completed:
+            crcs[index] = completed[index + 1]
+        else:
+            remaining.append(index)
+
+    async def run(index: int) -> None:
+        async with in_flight:
+            view = reader.part(index)
+            try:
+                started = time.monotonic()
+                crc = await asyncio.to_thread(crc32, view)
+                attempts = await _send_with_retry_async(send_part, index + 1, view, crc, retries, retry_exceptions)
+                result = PartResult(index + 1, view.nbytes, crc, attempts, time.monotonic() - started)
+            finally:
+                view.release()
+                reader.drop_part(index)
+        crcs[index] = result.crc
+        if on_part_done is not None:
+            await asyncio.to_thread(on_part_done, result)
+
+    tasks = [asyncio.ensure_future(run(index)) for index in remaining]
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+    return crcs